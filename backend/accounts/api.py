@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 from django.contrib.auth import authenticate, login, logout
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework import permissions, serializers, status
+from rest_framework import exceptions, permissions, serializers, status
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from accounts.models import Contractor
+from accounts.authentication import forget_tokens
+from accounts.models import Contractor, RefreshToken
+from accounts.throttling import ThrottledBasicAuthentication, claim_login_attempt, record_login_success
+from accounts.tokens import access_token_ttl, issue_access_token, token_pair
 from shared.tenant import Tenant
 
 
@@ -32,9 +36,13 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
+        wait = claim_login_attempt(request, data["email"])
+        if wait:
+            raise exceptions.Throttled(wait)
         user = authenticate(request, email=data["email"], password=data["password"])
         if user is None:
             return Response({"detail": "Invalid email or password", "status": "error"}, status=status.HTTP_400_BAD_REQUEST)
+        record_login_success(request, data["email"])
         login(request, user)
         token, _ = Token.objects.get_or_create(user=user)
         return Response(
@@ -46,6 +54,7 @@ class LoginView(APIView):
                 "tenant_id": str(user.tenant_id),
                 "is_superuser": user.is_superuser,
                 "token": token.key,
+                **token_pair(user),
             }
         )
 
@@ -59,16 +68,15 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
-        tenant, _ = Tenant.objects.get_or_create(
-            slug=data["tenant_name"].lower().replace(" ", "-"),
-            defaults={"name": data["tenant_name"]},
-        )
-        user = Contractor.objects.create_user(
-            email=data["email"],
-            password=data["password"],
-            full_name=data["full_name"],
-            tenant=tenant,
-        )
+        # Always a fresh tenant: joining an existing one by name would hand its data to a stranger.
+        with transaction.atomic():
+            tenant = Tenant.objects.create_with_unique_slug(data["tenant_name"])
+            user = Contractor.objects.create_user(
+                email=data["email"],
+                password=data["password"],
+                full_name=data["full_name"],
+                tenant=tenant,
+            )
         login(request, user)
         token, _ = Token.objects.get_or_create(user=user)
         return Response(
@@ -78,16 +86,52 @@ class RegisterView(APIView):
                 "tenant_id": str(user.tenant_id),
                 "is_superuser": user.is_superuser,
                 "token": token.key,
+                **token_pair(user),
             },
             status=status.HTTP_201_CREATED,
         )
 
 
+class TokenExchangeView(APIView):
+    """
+    One throttled password check over HTTP Basic in exchange for tokens, so scripted
+    clients stop paying for a hash on every call.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [ThrottledBasicAuthentication]
+
+    def post(self, request, *args, **kwargs):
+        token, _ = Token.objects.get_or_create(user=request.user)
+        return Response({"token": token.key, **token_pair(request.user)})
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+
+class TokenRefreshView(APIView):
+    """Trade a refresh token for a new access token and a replacement refresh token."""
+
+    permission_classes = [permissions.AllowAny]
+    authentication_classes: list = []
+
+    def post(self, request, *args, **kwargs):
+        serializer = TokenRefreshSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rotated = RefreshToken.objects.rotate(serializer.validated_data["refresh"])
+        if rotated is None:
+            return Response({"detail": "Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+        user, refresh = rotated
+        return Response({"access": issue_access_token(user), "refresh": refresh, "expires_in": access_token_ttl()})
+
+
 class MeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        user: Contractor = request.user
+        # Works for both Contractor and the query-free TokenUser built from a bearer token.
+        user = request.user
         return Response(
             {
                 "email": user.email,
@@ -102,6 +146,9 @@ class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        Token.objects.filter(user=request.user).delete()
+        tokens = Token.objects.filter(user_id=request.user.pk)
+        forget_tokens(tokens.values_list("key", flat=True))
+        tokens.delete()
+        RefreshToken.objects.revoke_for(request.user)
         logout(request)
         return Response(status=status.HTTP_204_NO_CONTENT)
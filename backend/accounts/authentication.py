@@ -0,0 +1,51 @@
+"""
+DRF token authentication without a database round trip on warm requests.
+
+Resolved users live in the ``authtoken`` ``TieredCache`` namespace in the shared Django
+cache (Redis in deployment). Only the access-token claims are cached (ids, role, flags,
+email, name; never the password hash), and each request gets a fresh ``TokenUser``
+built from them, with the claims as ``request.auth``. Logging out, deactivating and
+saving a Contractor drop the entries for that user's tokens, which every process sees
+on its next request. The per-process LRU is off (``LOCAL_TTL`` 0): a process can't be
+told to drop an entry from it, so turning it on lets other workers keep accepting a
+logged-out token for up to ``LOCAL_TTL`` seconds.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from accounts.tokens import TokenUser, user_claims
+from shared.cache import TieredCache
+
+DEFAULTS = {"LOCAL_SIZE": 1024, "LOCAL_TTL": 0.0, "SHARED_TTL": 300}
+
+
+def _setting(name: str):
+    return getattr(settings, "AUTH_TOKEN_CACHE", {}).get(name, DEFAULTS[name])
+
+
+token_cache = TieredCache(
+    "authtoken", ttl=_setting("SHARED_TTL"), local_size=_setting("LOCAL_SIZE"), local_ttl=_setting("LOCAL_TTL")
+)
+
+
+def forget_tokens(keys) -> None:
+    """Drop cached users for the given token keys (logout, deactivation, profile change)."""
+    keys = list(keys)
+    if keys:
+        token_cache.delete(*keys)
+
+
+def forget_user(user) -> None:
+    forget_tokens(Token.objects.filter(user_id=user.pk).values_list("key", flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        # DRF's lookup rejects unknown keys and inactive users, so only active users are cached.
+        claims = token_cache.get_or_set(
+            key, lambda: user_claims(super(CachedTokenAuthentication, self).authenticate_credentials(key)[0])
+        )
+        return TokenUser(claims), claims
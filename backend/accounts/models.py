@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import hashlib
+import secrets
 import uuid
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.models import PermissionsMixin
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 from shared.tenant import Tenant, TenantScopedModel
 
@@ -66,5 +71,101 @@ class Contractor(TenantScopedModel, AbstractBaseUser, PermissionsMixin):
             models.Index(fields=["tenant", "email"]),
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_password = self.__dict__.get("password")
+
     def __str__(self) -> str:  # pragma: no cover - repr convenience
         return self.email
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        password_changed = (
+            not creating
+            and (update_fields is None or "password" in update_fields)
+            and self.__dict__.get("password") != self._loaded_password
+        )
+        super().save(*args, **kwargs)
+        self._loaded_password = self.__dict__.get("password")
+        # login() only stamps last_login; anything else may change what a cached token resolves to.
+        if not creating and set(kwargs.get("update_fields") or ()) != {"last_login"}:
+            from accounts.authentication import forget_user
+
+            # After commit, so a concurrent request can't re-cache the old row in between.
+            transaction.on_commit(lambda: forget_user(self))
+            # A new password has to end the sessions the old one started.
+            if not self.is_active or password_changed:
+                RefreshToken.objects.revoke_for(self)
+
+    def delete(self, *args, **kwargs):
+        from rest_framework.authtoken.models import Token
+
+        from accounts.authentication import forget_tokens
+
+        # Read the keys now: the tokens are gone with the row by the time the commit hook runs.
+        keys = list(Token.objects.filter(user_id=self.pk).values_list("key", flat=True))
+        transaction.on_commit(lambda: forget_tokens(keys))
+        return super().delete(*args, **kwargs)
+
+
+def _hash_token(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class RefreshTokenManager(models.Manager):
+    def issue(self, user: Contractor, family: uuid.UUID | None = None) -> str:
+        """Store a new refresh token for ``user`` and return its raw value (only the hash is kept)."""
+        raw = secrets.token_urlsafe(32)
+        ttl = int(getattr(settings, "REFRESH_TOKEN_TTL", 60 * 60 * 24 * 30))
+        self.create(
+            user=user,
+            token_hash=_hash_token(raw),
+            family=family or uuid.uuid4(),
+            expires_at=timezone.now() + timedelta(seconds=ttl),
+        )
+        return raw
+
+    def rotate(self, raw: str) -> tuple[Contractor, str] | None:
+        """
+        Spend ``raw`` and hand back (user, new raw token) in the same family. Presenting a
+        token that was already spent means it leaked, so the whole family is revoked.
+        """
+        with transaction.atomic():
+            token = (
+                self.select_for_update().select_related("user").filter(token_hash=_hash_token(raw or "")).first()
+            )
+            if token is None:
+                return None
+            if token.revoked_at is not None:
+                self.filter(family=token.family, revoked_at__isnull=True).update(revoked_at=timezone.now())
+                return None
+            if token.expires_at <= timezone.now() or not token.user.is_active:
+                return None
+            token.revoked_at = timezone.now()
+            token.save(update_fields=["revoked_at"])
+            return token.user, self.issue(token.user, family=token.family)
+
+    def revoke_for(self, user) -> int:
+        return self.filter(user_id=user.pk, revoked_at__isnull=True).update(revoked_at=timezone.now())
+
+
+class RefreshToken(models.Model):
+    """Server-side half of the access/refresh pair; one row per issued refresh token."""
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(Contractor, on_delete=models.CASCADE, related_name="refresh_tokens")
+    token_hash = models.CharField(max_length=64, unique=True)
+    family = models.UUIDField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    objects = RefreshTokenManager()
+
+    class Meta:
+        verbose_name = "Refresh Token"
+        verbose_name_plural = "Refresh Tokens"
+
+    def __str__(self) -> str:  # pragma: no cover - repr convenience
+        return f"{self.user_id} ({self.family})"
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import base64
+import threading
+import time
+from unittest import mock
+
+from django.core import signing
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+
+from accounts.authentication import CachedTokenAuthentication, token_cache
+from accounts.models import Contractor, RefreshToken
+from accounts.tokens import access_token_ttl, issue_access_token
+from marketplace.models import Tool, WidgetLead
+from shared.cache import clear_local_caches
+from shared.ratelimit import SlidingWindowLimiter
+from shared.tenant import Tenant
+
+
+@override_settings(LOGIN_THROTTLE={"IP_LIMIT": 100, "EMAIL_LIMIT": 2, "WINDOW_SECONDS": 300})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tenant = Tenant.objects.create(slug="acme", name="Acme")
+        self.user = Contractor.objects.create_user("pat@example.com", "right-password", tenant=tenant, full_name="Pat")
+        self.client = APIClient()
+
+    def _login(self, password: str):
+        return self.client.post("/api/auth/login", {"email": "pat@example.com", "password": password}, format="json")
+
+    def test_attempts_over_the_limit_are_rejected_before_hashing(self):
+        self.assertEqual(self._login("wrong").status_code, 400)
+        self.assertEqual(self._login("wrong").status_code, 400)
+        response = self._login("right-password")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_success_gives_the_attempt_back(self):
+        for _ in range(3):
+            self.assertEqual(self._login("right-password").status_code, 200)
+
+    def test_basic_auth_is_only_accepted_for_token_exchange(self):
+        credentials = base64.b64encode(b"pat@example.com:right-password").decode()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Basic {credentials}")
+        self.assertIn(self.client.get("/api/auth/me").status_code, (401, 403))
+        self.assertEqual(self.client.post("/api/auth/token").status_code, 200)
+
+
+class SlidingWindowLimiterTests(TestCase):
+    def test_concurrent_hits_admit_exactly_the_limit(self):
+        cache.clear()
+        limiter = SlidingWindowLimiter("test", limit=5, window=300)
+        barrier = threading.Barrier(20)
+        admitted = []
+
+        def attempt():
+            barrier.wait()
+            if limiter.hit("ident") <= limiter.limit:
+                admitted.append(True)
+
+        threads = [threading.Thread(target=attempt) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(admitted), 5)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_caches()
+        tenant = Tenant.objects.create(slug="acme", name="Acme")
+        self.user = Contractor.objects.create_user("pat@example.com", "pw", tenant=tenant, full_name="Pat")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_caches_claims_not_the_user_row(self):
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 200)
+        cached = token_cache.get(self.token.key)
+        self.assertIsInstance(cached, dict)
+        self.assertNotIn(self.user.password, repr(cached))
+        with self.assertNumQueries(0):  # tenant lookup is cached too; no token or user query
+            response = self.client.get("/api/auth/me")
+        self.assertEqual(response.data["email"], "pat@example.com")
+
+    def test_profile_change_is_forgotten_after_commit(self):
+        self.client.get("/api/auth/me")
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.user.full_name = "Pat Doe"
+            self.user.save()
+        self.assertIsNotNone(token_cache.get(self.token.key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.get("/api/auth/me").data["full_name"], "Pat Doe")
+
+    def test_logout_on_another_worker_is_seen_at_once(self):
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 200)
+        # What LogoutView does in another process: this process's memory is never told.
+        key = self.token.key
+        self.token.delete()
+        cache.delete(f"authtoken:{key}")
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 401)
+
+    def test_auth_is_the_claims_not_an_unsaved_token(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        user, auth = CachedTokenAuthentication().authenticate(request)
+        self.assertEqual(auth["sub"], str(self.user.pk))
+        self.assertNotIsInstance(auth, Token)
+
+    def test_deleted_user_tokens_are_forgotten(self):
+        self.client.get("/api/auth/me")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 401)
+
+
+class AccessTokenTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(slug="acme", name="Acme")
+        self.user = Contractor.objects.create_user("pat@example.com", "pw", tenant=tenant, full_name="Pat")
+        self.client = APIClient()
+
+    def _me(self, token: str):
+        return self.client.get("/api/auth/me", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_valid_token_is_accepted(self):
+        self.assertEqual(self._me(issue_access_token(self.user)).data["email"], "pat@example.com")
+
+    def test_tampered_token_is_refused(self):
+        payload, signature = issue_access_token(self.user).rsplit(":", 1)
+        flipped = signature[:-1] + ("A" if signature[-1] != "A" else "B")
+        self.assertEqual(self._me(f"{payload}:{flipped}").status_code, 401)
+        claims = {"sub": str(self.user.pk), "tid": None, "su": True}
+        forged = signing.dumps(claims, key="not-the-secret-key", salt="accounts.access", compress=True)
+        self.assertEqual(self._me(forged).status_code, 401)
+
+    def test_expired_token_is_refused(self):
+        token = issue_access_token(self.user)
+        later = mock.Mock(time=lambda: time.time() + access_token_ttl() + 1)
+        with mock.patch("django.core.signing.time", later):
+            response = self._me(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("expired", str(response.data["detail"]))
+
+
+class RefreshTokenTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(slug="acme", name="Acme")
+        self.user = Contractor.objects.create_user("pat@example.com", "pw", tenant=tenant, full_name="Pat")
+        self.client = APIClient()
+
+    def _refresh(self, raw: str):
+        return self.client.post("/api/auth/token/refresh", {"refresh": raw}, format="json")
+
+    def _me(self, access: str):
+        return self.client.get("/api/auth/me", HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_rotation_spends_the_token(self):
+        first = RefreshToken.objects.issue(self.user)
+        response = self._refresh(first)
+        self.assertEqual(response.status_code, 200)
+        second = response.data["refresh"]
+        self.assertNotEqual(second, first)
+        self.assertEqual(self._me(response.data["access"]).status_code, 200)
+        self.assertEqual(self._refresh(second).status_code, 200)
+
+    def test_replayed_token_revokes_its_family(self):
+        first = RefreshToken.objects.issue(self.user)
+        other_family = RefreshToken.objects.issue(self.user)
+        second = self._refresh(first).data["refresh"]
+
+        self.assertEqual(self._refresh(first).status_code, 401)
+        self.assertEqual(self._refresh(second).status_code, 401)
+        self.assertEqual(self._refresh(other_family).status_code, 200)
+
+    def test_deactivated_user_is_refused(self):
+        raw = RefreshToken.objects.issue(self.user)
+        token = Token.objects.create(user=self.user)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._refresh(raw).status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 401)
+
+    def test_password_change_revokes_refresh_tokens(self):
+        raw = RefreshToken.objects.issue(self.user)
+        user = Contractor.objects.get(pk=self.user.pk)
+        user.full_name = "Pat Doe"
+        user.save()
+        self.assertFalse(RefreshToken.objects.filter(revoked_at__isnull=False).exists())
+
+        user.set_password("new-password")
+        user.save()
+        self.assertEqual(self._refresh(raw).status_code, 401)
+
+
+class TenantBindingTests(TestCase):
+    """Tenant-scoped views act on the caller's tenant, whatever X-Tenant-ID says."""
+
+    def setUp(self):
+        tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=100)
+        self.own = Tenant.objects.create(slug="own", name="Own")
+        self.other = Tenant.objects.create(slug="other", name="Other")
+        WidgetLead.objects.create(tenant=self.own, tool=tool, full_name="Own Lead", email="a@example.com", address="1 A")
+        WidgetLead.objects.create(tenant=self.other, tool=tool, full_name="Their Lead", email="b@example.com", address="1 B")
+        user = Contractor.objects.create_user("pat@example.com", "pw", tenant=self.own, full_name="Pat")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {issue_access_token(user)}")
+
+    def test_another_tenants_header_is_refused(self):
+        response = self.client.get("/api/leads/widget", HTTP_X_TENANT_ID=str(self.other.pk))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post("/api/tenant/origin", {"domain": "evil.example.com"}, HTTP_X_TENANT_ID=str(self.other.pk))
+        self.assertEqual(response.status_code, 403)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.domain, "")
+
+    def test_requests_without_a_tenant_are_bound_to_the_callers(self):
+        response = self.client.get("/api/leads/widget")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([lead["full_name"] for lead in response.data["results"]], ["Own Lead"])
@@ -0,0 +1,65 @@
+"""
+Throttling for everything that verifies a password.
+
+Each check of a password costs a full PBKDF2 run, so failed attempts are limited per
+client IP and per email before the hasher is reached. Every attempt is counted before
+the check, atomically, so a burst of parallel guesses can't all slip past a stale
+count; a successful login gives its attempt back. HTTP Basic is only accepted at
+``/api/auth/token``, which trades the credentials for tokens once.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import BasicAuthentication
+
+from shared.ratelimit import SlidingWindowLimiter
+
+DEFAULTS = {"IP_LIMIT": 30, "EMAIL_LIMIT": 5, "WINDOW_SECONDS": 300}
+
+
+def _setting(name: str) -> int:
+    return int(getattr(settings, "LOGIN_THROTTLE", {}).get(name, DEFAULTS[name]))
+
+
+def _limiters() -> tuple[SlidingWindowLimiter, SlidingWindowLimiter]:
+    window = _setting("WINDOW_SECONDS")
+    return (
+        SlidingWindowLimiter("login-ip", _setting("IP_LIMIT"), window),
+        SlidingWindowLimiter("login-email", _setting("EMAIL_LIMIT"), window),
+    )
+
+
+def client_ip(request) -> str:
+    return request.META.get("REMOTE_ADDR") or "unknown"
+
+
+def claim_login_attempt(request, email: str) -> int | None:
+    """
+    Count a password check against the IP and email limits before it runs. Returns the
+    seconds to wait when either is now over its limit (the check must not run), or None.
+    """
+    by_ip, by_email = _limiters()
+    keys = ((by_ip, client_ip(request)), (by_email, email.strip().lower()))
+    over = [(limiter, key) for limiter, key in keys if limiter.hit(key) > limiter.limit]
+    if not over:
+        return None
+    return max(limiter.retry_after(key) or 1 for limiter, key in over)
+
+
+def record_login_success(request, email: str) -> None:
+    by_ip, by_email = _limiters()
+    by_ip.undo(client_ip(request))
+    by_email.reset(email.strip().lower())
+
+
+class ThrottledBasicAuthentication(BasicAuthentication):
+    """``BasicAuthentication`` that refuses to hash once the IP or email is over its limit."""
+
+    def authenticate_credentials(self, userid, password, request=None):
+        wait = claim_login_attempt(request, userid)
+        if wait:
+            raise exceptions.Throttled(wait)
+        result = super().authenticate_credentials(userid, password, request)
+        record_login_success(request, userid)
+        return result
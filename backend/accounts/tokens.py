@@ -0,0 +1,94 @@
+"""
+Short-lived signed access tokens.
+
+An access token is the contractor's identity claims signed with SECRET_KEY (Django's
+``signing`` module, timestamped), so verifying one is an HMAC check with no query.
+Longer sessions come from rotating refresh tokens, see ``accounts.models.RefreshToken``.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core import signing
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+SALT = "accounts.access"
+
+
+def access_token_ttl() -> int:
+    return int(getattr(settings, "ACCESS_TOKEN_TTL", 900))
+
+
+def user_claims(user) -> dict:
+    """What a ``TokenUser`` is rebuilt from: ids, role, flags, email and name, nothing secret."""
+    return {
+        "sub": str(user.pk),
+        "tid": str(user.tenant_id) if user.tenant_id else None,
+        "role": user.role,
+        "su": user.is_superuser,
+        "st": user.is_staff,
+        "email": user.email,
+        "name": user.full_name,
+    }
+
+
+def issue_access_token(user) -> str:
+    return signing.dumps(user_claims(user), salt=SALT, compress=True)
+
+
+def token_pair(user) -> dict:
+    """Response fragment handed out by login, registration and refresh."""
+    from accounts.models import RefreshToken
+
+    return {
+        "access": issue_access_token(user),
+        "refresh": RefreshToken.objects.issue(user),
+        "expires_in": access_token_ttl(),
+    }
+
+
+class TokenUser:
+    """
+    Request user rebuilt from access-token claims. Carries what views and permissions
+    read (ids, role, flags, email, name) without loading the Contractor row.
+    """
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims: dict):
+        self.pk = self.id = claims["sub"]
+        self.tenant_id = claims.get("tid")
+        self.role = claims.get("role")
+        self.is_superuser = bool(claims.get("su"))
+        self.is_staff = bool(claims.get("st"))
+        self.email = claims.get("email", "")
+        self.full_name = claims.get("name", "")
+
+    def __str__(self) -> str:  # pragma: no cover - repr convenience
+        return self.email
+
+    def get_username(self) -> str:
+        return self.email
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid bearer header.")
+        try:
+            claims = signing.loads(auth[1].decode(), salt=SALT, max_age=access_token_ttl())
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed("Access token expired.")
+        except (signing.BadSignature, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed("Invalid access token.")
+        return TokenUser(claims), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -1,21 +1,25 @@
 from __future__ import annotations
 
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from datetime import timedelta
 
-from django.db.models import Count, Sum, Q
+from django.db import transaction
+from django.db.models import Q, Sum
 from django.db.models.functions import TruncMonth
 from django.utils.timezone import now
 from rest_framework import permissions, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from marketplace.models import License, MarketplaceLead, Tool, WidgetLead
-from adminpanel.models import Ticket, Credit
+from marketplace.api import CouponFieldsMixin
+from marketplace.models import CouponRedemption, License, LicenseEvent, Tool, prefetch_active_coupons
+from adminpanel.models import Ticket, Credit, DailyRollup
+from shared.api import SparseFieldsetMixin, ViewOrderedCursorPagination
+from shared.db import ReplicaReadMixin
 from shared.tenant import Tenant
 
 
-class ToolAdminSerializer(serializers.ModelSerializer):
+class ToolAdminSerializer(CouponFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tool
         fields = [
@@ -41,14 +45,26 @@ class ToolAdminSerializer(serializers.ModelSerializer):
 class TenantSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tenant
-        fields = ["id", "name", "slug", "plan", "active_licenses", "trial_licenses", "canceled_licenses"]
+        fields = [
+            "id",
+            "name",
+            "slug",
+            "plan",
+            "active_licenses",
+            "trial_licenses",
+            "canceled_licenses",
+            "total_licenses",
+        ]
 
 
-class AdminToolViewSet(viewsets.ModelViewSet):
-    queryset = Tool.objects.all()
+class AdminToolViewSet(ReplicaReadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Tool.objects.prefetch_related(prefetch_active_coupons())
     serializer_class = ToolAdminSerializer
     permission_classes = [permissions.IsAdminUser]
     lookup_field = "slug"
+    pagination_class = ViewOrderedCursorPagination
+    cursor_ordering = ("name", "id")
+    list_fields = tuple(name for name in ToolAdminSerializer.Meta.fields if name != "bento_features")
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -60,18 +76,16 @@ class AdminToolViewSet(viewsets.ModelViewSet):
             qs = qs.filter(is_active=True)
         if active == "false":
             qs = qs.filter(is_active=False)
-        return qs.order_by("name")
+        return qs
 
 
-class AdminTenantViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Tenant.objects.all().annotate(
-        tool_count=Count("licenses"),
-        active_licenses=Count("licenses", filter=Q(licenses__status=License.Status.ACTIVE)),
-        trial_licenses=Count("licenses", filter=Q(licenses__status=License.Status.TRIAL)),
-        canceled_licenses=Count("licenses", filter=Q(licenses__status=License.Status.CANCELED)),
-    )
+class AdminTenantViewSet(ReplicaReadMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
+    # License counts are denormalized columns on Tenant, so filters stay plain indexed predicates.
+    queryset = Tenant.objects.all()
     serializer_class = TenantSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = ViewOrderedCursorPagination
+    cursor_ordering = ("name", "id")
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -112,11 +126,27 @@ class LicenseSerializer(serializers.ModelSerializer):
         ]
 
 
-class AdminLicenseViewSet(viewsets.ModelViewSet):
-    queryset = License.objects.select_related("tenant", "tool").all().order_by("-updated_at")
+class AdminLicenseViewSet(ReplicaReadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = License.objects.select_related("tenant", "tool").all()
     serializer_class = LicenseSerializer
     permission_classes = [permissions.IsAdminUser]
     http_method_names = ["get", "patch", "head", "options"]
+    pagination_class = ViewOrderedCursorPagination
+    cursor_ordering = ("-created_at", "-id")
+    list_fields = tuple(name for name in LicenseSerializer.Meta.fields if name != "metadata")
+
+    def perform_update(self, serializer):
+        new_status = serializer.validated_data.get("status")
+        with transaction.atomic():
+            if new_status and new_status != serializer.instance.status:
+                LicenseEvent.objects.record(
+                    License.objects.filter(pk=serializer.instance.pk), new_status, source=LicenseEvent.Source.ADMIN
+                )
+                if new_status == License.Status.CANCELED:
+                    CouponRedemption.objects.release(License.objects.filter(pk=serializer.instance.pk))
+                elif new_status == License.Status.ACTIVE:
+                    CouponRedemption.objects.confirm(License.objects.filter(pk=serializer.instance.pk))
+            serializer.save()
 
 
 class TicketSerializer(serializers.ModelSerializer):
@@ -162,64 +192,102 @@ class CreditSerializer(serializers.ModelSerializer):
         ]
 
 
-class AdminMetricsViewSet(viewsets.ViewSet):
+def _parse_date(value: str | None) -> date | None:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _fill_months(rows):
+    """Yield (month, delta) for every month between the first and last row, zero-filling gaps."""
+    cursor = None
+    for month, delta in rows:
+        month = month.date().replace(day=1) if isinstance(month, datetime) else month.replace(day=1)
+        while cursor is not None and cursor < month:
+            yield cursor, Decimal("0.00")
+            cursor = (cursor + timedelta(days=32)).replace(day=1)
+        yield month, delta or Decimal("0.00")
+        cursor = (month + timedelta(days=32)).replace(day=1)
+
+
+class AdminMetricsViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    Platform dashboard. Lead activity is read from ``DailyRollup`` (kept fresh by the
+    ``refresh_daily_rollups`` beat task) so any date range costs the same handful of
+    aggregate queries no matter how large the raw lead tables grow.
+    """
+
     permission_classes = [permissions.IsAdminUser]
+    default_window_days = 7
 
-    def _effective_price(self, lic: License) -> Decimal:
-        price = lic.tool.price_monthly or Decimal("0.00")
-        code = lic.metadata.get("coupon_code") if isinstance(lic.metadata, dict) else None
-        tool = lic.tool
-        if (
-            code
-            and tool.coupon_code
-            and code == tool.coupon_code
-            and (not tool.coupon_usage_limit or (tool.coupon_usage_count or 0) < tool.coupon_usage_limit)
-        ):
-            discount = price * (tool.coupon_percent_off or Decimal("0.00")) / 100
-            price = max(Decimal("0.00"), price - discount)
-        return price
+    def _window(self, request) -> tuple[date, date, bool]:
+        """Resolve ?from/?to into an inclusive day range; flag whether either was given."""
+        from_date = _parse_date(request.query_params.get("from"))
+        to_date = _parse_date(request.query_params.get("to"))
+        end = to_date or now().date()
+        start = from_date or end - timedelta(days=self.default_window_days - 1)
+        if start > end:
+            start, end = end, start
+        return start, end, bool(from_date or to_date)
 
     def list(self, request):
-        from_date = request.query_params.get("from")
-        to_date = request.query_params.get("to")
-        active_licenses = License.objects.select_related("tool").filter(status=License.Status.ACTIVE)
-        pending_licenses = License.objects.select_related("tool").filter(status=License.Status.PENDING)
-        mrr = sum(self._effective_price(lic) for lic in active_licenses)
-        pending = sum(self._effective_price(lic) for lic in pending_licenses)
-        coupons = 0  # TODO: wire real coupons/discounts
-        demo_clicks = MarketplaceLead.objects.count()
-        widget_uses = WidgetLead.objects.count()
-        # Revenue trend by month
-        revenue_series = (
-            License.objects.filter(status=License.Status.ACTIVE)
-            .annotate(month=TruncMonth("created_at"))
+        start, end, has_range = self._window(request)
+
+        revenue = (
+            License.objects.filter(status__in=[License.Status.ACTIVE, License.Status.PENDING])
+            .with_effective_price()
+            .aggregate(
+                mrr=Sum("effective_price", filter=Q(status=License.Status.ACTIVE)),
+                pending=Sum("effective_price", filter=Q(status=License.Status.PENDING)),
+            )
+        )
+        mrr = revenue["mrr"] or Decimal("0.00")
+        pending = revenue["pending"] or Decimal("0.00")
+        redemptions = CouponRedemption.objects.filter(released_at__isnull=True)
+        if has_range:
+            redemptions = redemptions.filter(redeemed_at__date__gte=start, redeemed_at__date__lte=end)
+        coupons = redemptions.count()
+
+        rollups = DailyRollup.objects.all()
+        if has_range:
+            rollups = rollups.filter(day__gte=start, day__lte=end)
+        totals = rollups.aggregate(demo=Sum("marketplace_leads"), widget=Sum("widget_leads"))
+        demo_clicks = totals["demo"] or 0
+        widget_uses = totals["widget"] or 0
+
+        # MRR at the end of each month: running sum of the ledger's monthly deltas
+        monthly_deltas = (
+            LicenseEvent.objects.exclude(mrr_delta=0)
+            .annotate(month=TruncMonth("occurred_at"))
             .values("month")
-            .annotate(value=Sum("tool__price_monthly"))
+            .annotate(delta=Sum("mrr_delta"))
             .order_by("month")
         )
-        revenue_series_list = [
-            {"month": r["month"].strftime("%Y-%m") if r["month"] else "", "value": float(r["value"] or 0)}
-            for r in revenue_series
-        ]
-        # Usage series last 7 days
-        today = now().date()
-        demo_series = []
-        widget_series = []
-        for i in range(6, -1, -1):
-            day = today - timedelta(days=i)
-            demo_qs = MarketplaceLead.objects.filter(created_at__date=day)
-            widget_qs = WidgetLead.objects.filter(created_at__date=day)
-            if from_date:
-                demo_qs = demo_qs.filter(created_at__date__gte=from_date)
-                widget_qs = widget_qs.filter(created_at__date__gte=from_date)
-            if to_date:
-                demo_qs = demo_qs.filter(created_at__date__lte=to_date)
-                widget_qs = widget_qs.filter(created_at__date__lte=to_date)
-            demo_series.append({"date": day.isoformat(), "count": demo_qs.count()})
-            widget_series.append({"date": day.isoformat(), "count": widget_qs.count()})
+        revenue_series_list = []
+        running = Decimal("0.00")
+        for month, delta in _fill_months((r["month"], r["delta"]) for r in monthly_deltas):
+            running += delta
+            revenue_series_list.append({"month": month.strftime("%Y-%m"), "value": float(running)})
+
+        # Usage series over the window from the daily rollups, gaps filled with zero
+        daily = {
+            row["day"]: row
+            for row in DailyRollup.objects.filter(day__gte=start, day__lte=end)
+            .values("day")
+            .annotate(demo=Sum("marketplace_leads"), widget=Sum("widget_leads"))
+            .order_by()
+        }
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        demo_series = [{"date": day.isoformat(), "count": daily[day]["demo"] if day in daily else 0} for day in days]
+        widget_series = [{"date": day.isoformat(), "count": daily[day]["widget"] if day in daily else 0} for day in days]
+
         top_tools = (
-            WidgetLead.objects.values("tool__slug")
-            .annotate(count=Count("id"))
+            rollups.filter(tool__isnull=False, widget_leads__gt=0)
+            .values("tool__slug")
+            .annotate(count=Sum("widget_leads"))
             .order_by("-count")[:5]
         )
         return Response(
@@ -237,11 +305,14 @@ class AdminMetricsViewSet(viewsets.ViewSet):
         )
 
 
-class AdminTicketsViewSet(viewsets.ModelViewSet):
-    queryset = Ticket.objects.select_related("tenant", "tool").all().order_by("-updated_at")
+class AdminTicketsViewSet(ReplicaReadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Ticket.objects.select_related("tenant", "tool").all()
     serializer_class = TicketSerializer
     permission_classes = [permissions.IsAdminUser]
     http_method_names = ["get", "post", "patch", "head", "options"]
+    pagination_class = ViewOrderedCursorPagination
+    cursor_ordering = ("-created_at", "-id")
+    list_fields = tuple(name for name in TicketSerializer.Meta.fields if name != "description")
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -5,3 +5,12 @@ class AdminpanelConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "adminpanel"
     verbose_name = "Admin Panel"
+
+    def ready(self):
+        from django.db.models.signals import post_delete
+
+        from adminpanel.rollups import mark_stale_day
+        from marketplace.models import LicenseEvent, MarketplaceLead, WidgetLead
+
+        for model in (WidgetLead, MarketplaceLead, LicenseEvent):
+            post_delete.connect(mark_stale_day, sender=model, dispatch_uid=f"rollups:{model.__name__}")
@@ -0,0 +1,156 @@
+"""
+Resized, re-encoded variants of uploaded images.
+
+Icons and logos are often multi-megabyte PNGs shown at a few dozen pixels. After an
+image ``MediaAsset`` is stored, ``adminpanel.tasks.build_image_variants`` fans out a chord
+of ``render_image_variants`` tasks, one per width, so the Celery worker pool encodes them
+in parallel. Each writes AVIF/WebP/PNG copies next to the original
+(``tool_media/aa/<sha256>.w256.webp``) and records ``MediaVariant`` rows, which
+``srcset()`` turns into a per-format ``srcset`` string for clients. The chord's
+callback then calls ``refresh_references`` once, re-rendering the catalog and widget
+configs that embed them.
+"""
+from __future__ import annotations
+
+import io
+import re
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from adminpanel.models import MediaAsset, MediaVariant
+
+WIDTHS = (64, 128, 256, 512, 1024)
+# Best compression first; PNG stays as the universally supported fallback.
+FORMATS = ("avif", "webp", "png")
+ENCODE_OPTIONS = {
+    "avif": {"quality": 60},
+    "webp": {"quality": 80, "method": 6},
+    "png": {"optimize": True},
+}
+# Guards against decompression bombs; icons and logos are nowhere near this.
+MAX_PIXELS = 40_000_000
+ASSET_URL_RE = re.compile(r"tool_media/[0-9a-f]{2}/([0-9a-f]{64})\.")
+
+
+def is_image(asset: MediaAsset) -> bool:
+    return asset.content_type.startswith("image/") and asset.content_type not in ("image/svg+xml", "image/gif")
+
+
+def formats() -> tuple[str, ...]:
+    return tuple(fmt for fmt in FORMATS if fmt == "png" or features.check(fmt))
+
+
+def _open(asset: MediaAsset) -> Image.Image:
+    with default_storage.open(asset.path, "rb") as fh:
+        image = Image.open(fh)
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(f"{asset.path} is {image.width}x{image.height}; too large to resize.")
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def plan_widths(asset: MediaAsset) -> list[int]:
+    """Standard widths below the original; a small image is just re-encoded at its own size."""
+    image = _open(asset)
+    MediaAsset.objects.filter(pk=asset.pk).update(width=image.width, height=image.height)
+    return [width for width in WIDTHS if width < image.width] or [image.width]
+
+
+def variant_path(asset: MediaAsset, width: int, fmt: str) -> str:
+    base = asset.path.rsplit(".", 1)[0] if "." in asset.path.rsplit("/", 1)[-1] else asset.path
+    return f"{base}.w{width}.{fmt}"
+
+
+def render(asset: MediaAsset, width: int) -> list[MediaVariant]:
+    """Encode ``asset`` at ``width`` in every supported format and record the results."""
+    image = _open(asset)
+    height = max(1, round(image.height * width / image.width))
+    resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+    variants = []
+    for fmt in formats():
+        buffer = io.BytesIO()
+        resized.save(buffer, format=fmt.upper(), **ENCODE_OPTIONS[fmt])
+        path = variant_path(asset, width, fmt)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        path = default_storage.save(path, ContentFile(buffer.getvalue()))
+        variants.append(
+            MediaVariant(asset=asset, format=fmt, width=width, height=height, path=path, size=buffer.getbuffer().nbytes)
+        )
+    with transaction.atomic():
+        MediaVariant.objects.filter(asset=asset, width=width).delete()
+        MediaVariant.objects.bulk_create(variants)
+    return variants
+
+
+def _srcset_map(variants: Iterable) -> dict:
+    by_format: dict = defaultdict(list)
+    for fmt, width, path in sorted(variants, key=lambda v: (v[0], v[1])):
+        by_format[fmt].append(f"{default_storage.url(path)} {width}w")
+    return {fmt: ", ".join(entries) for fmt, entries in by_format.items()}
+
+
+def srcset(asset: MediaAsset) -> dict:
+    """``{"webp": "<url> 64w, <url> 128w", ...}``; empty until the variants are rendered."""
+    return _srcset_map(asset.variants.values_list("format", "width", "path"))
+
+
+def sha256_from_url(url: str) -> Optional[str]:
+    match = ASSET_URL_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+def srcsets_for_urls(urls: Iterable[str]) -> dict:
+    """``{url: srcset map}`` for the given media URLs, in one query."""
+    by_sha: dict = defaultdict(list)
+    for url in set(urls):
+        sha = sha256_from_url(url)
+        if sha:
+            by_sha[sha].append(url)
+    if not by_sha:
+        return {}
+    rows: dict = defaultdict(list)
+    for sha, fmt, width, path in MediaVariant.objects.filter(asset__sha256__in=by_sha).values_list(
+        "asset__sha256", "format", "width", "path"
+    ):
+        rows[sha].append((fmt, width, path))
+    return {url: _srcset_map(variants) for sha, variants in rows.items() for url in by_sha[sha]}
+
+
+def srcset_for_url(url: str) -> dict:
+    return srcsets_for_urls([url]).get(url, {}) if url else {}
+
+
+def refresh_references(asset: MediaAsset) -> None:
+    """Re-render cached payloads that embed srcsets for ``asset``: the catalog and widget configs."""
+    from marketplace.catalog import bump_catalog_version
+    from marketplace.models import WidgetConfig
+    from marketplace.widget import bump_widget_generation, store_config_blob
+    from shared.tenant import Tenant
+
+    bump_catalog_version()
+    configs = [
+        (config.tenant, config)
+        for config in WidgetConfig.objects.filter(logo_url__contains=asset.sha256).select_related("tenant")
+    ]
+    # Tenants without a WidgetConfig row fall back to their brand logo.
+    configs += [
+        (tenant, None)
+        for tenant in Tenant.objects.filter(brand_logo_url__contains=asset.sha256, widgetconfigs__isnull=True)
+    ]
+    if configs:
+        # Retire the tenant tag first: it covers the config blobs stored below.
+        bump_widget_generation([tenant.pk for tenant, _ in configs])
+
+        def store() -> None:
+            for tenant, config in configs:
+                store_config_blob(tenant, config)
+
+        transaction.on_commit(store)
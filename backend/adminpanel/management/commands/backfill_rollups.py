@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from adminpanel import rollups
+from adminpanel.models import RollupCheckpoint
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyRollup rows from the raw lead tables and the license event ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First day to rebuild (YYYY-MM-DD). Defaults to the earliest activity.")
+        parser.add_argument("--to", dest="end", help="Last day to rebuild (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument("--chunk-days", type=int, default=31, help="Days rebuilt per transaction.")
+
+    def handle(self, *args, **options):
+        started = now()
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else rollups.earliest_day()
+            end = date.fromisoformat(options["end"]) if options["end"] else started.date()
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}") from exc
+        if start is None:
+            self.stdout.write("No activity to roll up.")
+            return
+        if start > end:
+            raise CommandError("--from must not be after --to")
+        written = rollups.backfill(start, end, chunk_days=max(1, options["chunk_days"]))
+        if not options["start"] and not options["end"]:
+            # A full rebuild supersedes any incremental progress.
+            RollupCheckpoint.objects.update_or_create(
+                name=rollups.CHECKPOINT_NAME, defaults={"processed_until": started}
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {start}..{end}: {written} rollup rows."))
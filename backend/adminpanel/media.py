@@ -0,0 +1,215 @@
+"""
+Content-addressed storage for admin media uploads.
+
+Files are hashed while streaming in fixed-size chunks and saved to ``default_storage``
+as ``tool_media/<aa>/<sha256>.<ext>``; a ``MediaAsset`` row per digest turns a repeat
+upload into a lookup. Large files go through an ``UploadSession``: the client appends
+chunks at ``Upload-Offset`` and can ask for the offset to resume after a dropped
+connection. Nothing here holds more than one chunk in memory, or a database lock
+while a chunk streams in.
+"""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import mimetypes
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from adminpanel.models import MediaAsset, UploadSession
+
+DEFAULTS = {
+    "CHUNK_SIZE": 8 * 1024 * 1024,
+    "MAX_SIZE": 2 * 1024 * 1024 * 1024,
+    "SESSION_TTL": 60 * 60 * 24,
+}
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_EXT_RE = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+class OffsetMismatch(Exception):
+    """A chunk was sent for a different offset than the session has reached."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}.")
+        self.offset = offset
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def _setting(name: str) -> int:
+    return int(getattr(settings, "MEDIA_UPLOAD", {}).get(name, DEFAULTS[name]))
+
+
+def chunk_size() -> int:
+    return _setting("CHUNK_SIZE")
+
+
+def max_size() -> int:
+    return _setting("MAX_SIZE")
+
+
+def parts_dir() -> Path:
+    path = Path(getattr(settings, "MEDIA_UPLOAD", {}).get("PARTS_DIR") or Path(settings.MEDIA_ROOT) / ".uploads")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def asset_path(sha256: str, name: str) -> str:
+    ext = os.path.splitext(name)[1].lower()
+    return f"tool_media/{sha256[:2]}/{sha256}{ext if _EXT_RE.match(ext) else ''}"
+
+
+def digest(fileobj: BinaryIO) -> tuple[str, int]:
+    """SHA-256 and length of ``fileobj`` from its current position, one chunk at a time."""
+    sha, size, step = hashlib.sha256(), 0, chunk_size()
+    while True:
+        block = fileobj.read(step)
+        if not block:
+            return sha.hexdigest(), size
+        sha.update(block)
+        size += len(block)
+
+
+def find(sha256: str) -> Optional[MediaAsset]:
+    if not SHA256_RE.match(sha256 or ""):
+        return None
+    return MediaAsset.objects.filter(sha256=sha256).first()
+
+
+def store(fileobj: BinaryIO, name: str, content_type: str = "") -> tuple[MediaAsset, bool]:
+    """
+    Save ``fileobj`` under its digest unless those bytes are already stored.
+    Returns ``(asset, created)``.
+    """
+    fileobj.seek(0)
+    sha256, size = digest(fileobj)
+    return _store_digested(fileobj, sha256, size, name, content_type)
+
+
+def _store_digested(fileobj: BinaryIO, sha256: str, size: int, name: str, content_type: str) -> tuple[MediaAsset, bool]:
+    existing = find(sha256)
+    if existing:
+        return existing, False
+    path = asset_path(sha256, name)
+    if not default_storage.exists(path):
+        fileobj.seek(0)
+        path = default_storage.save(path, fileobj if isinstance(fileobj, File) else File(fileobj))
+    try:
+        with transaction.atomic():
+            asset = MediaAsset.objects.create(
+                sha256=sha256,
+                path=path,
+                size=size,
+                content_type=content_type or mimetypes.guess_type(name)[0] or "",
+                original_name=name[:255],
+            )
+    except IntegrityError:
+        # A concurrent upload of the same bytes won; drop our copy if it landed elsewhere.
+        asset = MediaAsset.objects.get(sha256=sha256)
+        if asset.path != path:
+            default_storage.delete(path)
+        return asset, False
+    if asset.content_type.startswith("image/"):
+        from adminpanel.tasks import build_image_variants
+
+        transaction.on_commit(lambda: build_image_variants.delay(asset.pk))
+    return asset, True
+
+
+def part_path(session: UploadSession) -> Path:
+    return parts_dir() / f"{session.pk}.part"
+
+
+def append_chunk(session_id, stream: BinaryIO, offset: int, length: int) -> UploadSession:
+    """
+    Write ``length`` bytes from ``stream`` at ``offset`` of the session's part file. A
+    chunk cut short by the client still advances the offset by what actually arrived.
+
+    Nothing in the database is held while the body streams in: writers of one session
+    take turns on an exclusive lock on its part file (a second one gets
+    ``OffsetMismatch`` at once), and the offset moves with a conditional UPDATE after
+    the bytes are on disk. Raises ``UploadSession.DoesNotExist`` if the session is
+    completed or discarded meanwhile.
+    """
+    session = UploadSession.objects.get(pk=session_id)
+    _check_chunk(session, offset, length)
+    fd = os.open(part_path(session), os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+b") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OffsetMismatch(session.offset)
+        # The previous holder may have moved the offset, or completed the upload.
+        session.refresh_from_db(fields=["offset"])
+        _check_chunk(session, offset, length)
+        # Drop bytes from an earlier chunk that was written but never recorded.
+        fh.truncate(offset)
+        fh.seek(offset)
+        remaining, step = length, chunk_size()
+        while remaining:
+            block = stream.read(min(step, remaining))
+            if not block:
+                break
+            fh.write(block)
+            remaining -= len(block)
+        fh.flush()
+        received = length - remaining
+        moved = UploadSession.objects.filter(pk=session.pk, offset=offset).update(
+            offset=offset + received, updated_at=timezone.now()
+        )
+        if not moved:
+            session.refresh_from_db(fields=["offset"])
+            raise OffsetMismatch(session.offset)
+    session.offset = offset + received
+    return session
+
+
+def _check_chunk(session: UploadSession, offset: int, length: int) -> None:
+    if offset != session.offset:
+        raise OffsetMismatch(session.offset)
+    if offset + length > session.size:
+        raise ValueError("Chunk runs past the declared upload size.")
+
+
+def complete(session: UploadSession) -> tuple[MediaAsset, bool]:
+    """
+    Move a fully received session into content-addressed storage and discard it.
+    Deleting the row first claims the part file, so of two requests finishing the same
+    upload one gets ``UploadSession.DoesNotExist`` instead of storing it twice.
+    """
+    if not UploadSession.objects.filter(pk=session.pk).delete()[0]:
+        raise UploadSession.DoesNotExist("The upload was already completed or discarded.")
+    path = part_path(session)
+    try:
+        with open(path, "rb") as fh:
+            sha256, size = digest(fh)
+            if session.sha256 and session.sha256 != sha256:
+                raise ChecksumMismatch(f"Received bytes hash to {sha256}, expected {session.sha256}.")
+            return _store_digested(File(fh, name=session.filename), sha256, size, session.filename, session.content_type)
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def discard(session: UploadSession) -> None:
+    part_path(session).unlink(missing_ok=True)
+    session.delete()
+
+
+def purge_stale_sessions() -> int:
+    cutoff = timezone.now() - timedelta(seconds=_setting("SESSION_TTL"))
+    stale = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    for session in stale:
+        discard(session)
+    return len(stale)
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0001_initial'),
+        ('marketplace', '0002_tool_coupon_code_tool_coupon_end_and_more'),
+        ('shared', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('processed_until', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('widget_leads', models.PositiveIntegerField(default=0)),
+                ('marketplace_leads', models.PositiveIntegerField(default=0)),
+                ('estimates', models.PositiveIntegerField(default=0)),
+                ('new_licenses', models.PositiveIntegerField(default=0)),
+                ('active_licenses', models.PositiveIntegerField(default=0)),
+                ('canceled_licenses', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='shared.tenant')),
+                ('tool', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='marketplace.tool')),
+            ],
+            options={
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['day'], name='adminpanel__day_74a6c8_idx'), models.Index(fields=['tool', 'day'], name='adminpanel__tool_id_6a0737_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'tenant', 'tool'), name='uniq_daily_rollup', nulls_distinct=False)],
+            },
+        ),
+    ]
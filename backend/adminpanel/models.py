@@ -4,6 +4,7 @@ import uuid
 
 from django.db import models
 
+from accounts.models import Contractor
 from marketplace.models import Tool
 from shared.tenant import Tenant
 
@@ -64,3 +65,116 @@ class Credit(models.Model):
 
     def __str__(self) -> str:  # pragma: no cover
         return f"{self.amount} {self.currency} ({self.status})"
+
+
+class DailyRollup(models.Model):
+    """
+    Pre-aggregated platform activity, one row per (day, tenant, tool).
+    Rebuilt per day by adminpanel.rollups so the dashboard never scans raw lead tables.
+    """
+
+    day = models.DateField()
+    tenant = models.ForeignKey(Tenant, null=True, blank=True, on_delete=models.CASCADE, related_name="daily_rollups")
+    tool = models.ForeignKey(Tool, null=True, blank=True, on_delete=models.CASCADE, related_name="daily_rollups")
+    widget_leads = models.PositiveIntegerField(default=0)
+    marketplace_leads = models.PositiveIntegerField(default=0)
+    estimates = models.PositiveIntegerField(default=0)
+    new_licenses = models.PositiveIntegerField(default=0)
+    active_licenses = models.PositiveIntegerField(default=0)
+    canceled_licenses = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "tenant", "tool"], name="uniq_daily_rollup", nulls_distinct=False
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["day"]),
+            models.Index(fields=["tool", "day"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.day} {self.tenant_id} {self.tool_id}"
+
+
+class RollupCheckpoint(models.Model):
+    """High-water mark of the last incremental rollup pass."""
+
+    name = models.CharField(max_length=64, unique=True)
+    processed_until = models.DateTimeField()
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.name} @ {self.processed_until}"
+
+
+class StaleRollupDay(models.Model):
+    """
+    A day that lost source rows to a delete. Deleted rows leave no timestamp for the
+    incremental pass to find, so ``adminpanel.rollups`` queues the day here instead.
+    """
+
+    day = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return str(self.day)
+
+
+class MediaAsset(models.Model):
+    """
+    An uploaded file stored once under its SHA-256 (``adminpanel.media``), so uploading
+    the same bytes again returns the existing row instead of another copy.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=127, blank=True)
+    original_name = models.CharField(max_length=255, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return self.path
+
+
+class MediaVariant(models.Model):
+    """A resized/re-encoded copy of an image ``MediaAsset``, stored next to the original (``adminpanel.images``)."""
+
+    asset = models.ForeignKey(MediaAsset, on_delete=models.CASCADE, related_name="variants")
+    format = models.CharField(max_length=8)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    path = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["asset", "format", "width"], name="uniq_media_variant"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return self.path
+
+
+class UploadSession(models.Model):
+    """A resumable upload in progress; chunks are appended to a local part file until ``size`` is reached."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=127, blank=True)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Expected digest, checked when the upload completes")
+    created_by = models.ForeignKey(
+        Contractor, null=True, blank=True, on_delete=models.SET_NULL, related_name="upload_sessions"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.filename} ({self.offset}/{self.size})"
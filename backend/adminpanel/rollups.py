@@ -0,0 +1,209 @@
+"""
+Incremental maintenance of ``DailyRollup``.
+
+Each pass asks the raw tables which days were touched since the last checkpoint
+and rebuilds only those days; ``rebuild_days`` is idempotent, and passes that
+overlap (the beat task and a ``backfill_rollups`` run) take turns on a row lock.
+A pass rescans ``ROLLUP_OVERLAP_SECONDS`` before its checkpoint, because a row stamped
+before the checkpoint may belong to a transaction that committed after the previous
+pass read. Deletes leave nothing to scan, so ``mark_stale_day`` (a ``post_delete``
+receiver) queues the deleted row's day as a ``StaleRollupDay``.
+License columns are daily flows read from the append-only ``LicenseEvent`` ledger,
+so a later edit to a license never moves an earlier day: ``new_licenses`` counts
+opening events, ``active_licenses``/``canceled_licenses`` count transitions into
+that status, and ``revenue`` is the effective monthly price of the activations.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils.timezone import localtime, now
+
+from adminpanel.models import DailyRollup, RollupCheckpoint, StaleRollupDay
+from marketplace.models import License, LicenseEvent, MarketplaceLead, WidgetLead
+
+CHECKPOINT_NAME = "daily_rollup"
+# RollupCheckpoint row locked while a rebuild replaces rows.
+LOCK_NAME = "daily_rollup:lock"
+COUNTERS = (
+    "widget_leads",
+    "marketplace_leads",
+    "estimates",
+    "new_licenses",
+    "active_licenses",
+    "canceled_licenses",
+)
+
+
+def _day_bounds(start: date, end: date) -> tuple[datetime, datetime]:
+    return (
+        datetime.combine(start, time.min, tzinfo=dt_timezone.utc),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=dt_timezone.utc),
+    )
+
+
+def _as_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def changed_days(since: datetime) -> set[date]:
+    """Days whose rollup rows may differ because a source row was written after ``since``."""
+    days: set[date] = set()
+    for model in (WidgetLead, MarketplaceLead):
+        days.update(
+            model.objects.filter(updated_at__gte=since)
+            .annotate(day=TruncDate("created_at"))
+            .values_list("day", flat=True)
+            .distinct()
+        )
+    # Events are never edited, so the days they touch are the days they occurred on.
+    days.update(
+        LicenseEvent.objects.filter(occurred_at__gte=since)
+        .annotate(day=TruncDate("occurred_at"))
+        .values_list("day", flat=True)
+        .distinct()
+    )
+    return {_as_date(day) for day in days}
+
+
+def _collect(start: date, end: date) -> dict[tuple, dict]:
+    lower, upper = _day_bounds(start, end)
+    created = {"created_at__gte": lower, "created_at__lt": upper}
+    rows: dict[tuple, dict] = defaultdict(lambda: {name: 0 for name in COUNTERS} | {"revenue": Decimal("0.00")})
+
+    widget = (
+        WidgetLead.objects.filter(**created)
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "tenant_id", "tool_id")
+        .annotate(total=Count("id"), estimates=Count("id", filter=Q(estimate_amount__gt=0)))
+        .order_by()
+    )
+    for r in widget:
+        row = rows[(_as_date(r["day"]), r["tenant_id"], r["tool_id"])]
+        row["widget_leads"] = r["total"]
+        row["estimates"] = r["estimates"]
+
+    marketplace = (
+        MarketplaceLead.objects.filter(**created)
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "tenant_id", "tool_id")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    for r in marketplace:
+        rows[(_as_date(r["day"]), r["tenant_id"], r["tool_id"])]["marketplace_leads"] = r["total"]
+
+    flows = (
+        LicenseEvent.objects.filter(occurred_at__gte=lower, occurred_at__lt=upper)
+        .annotate(day=TruncDate("occurred_at"))
+        .values("day", "tenant_id", "tool_id")
+        .annotate(
+            new=Count("id", filter=Q(from_status="")),
+            active=Count("id", filter=Q(to_status=License.Status.ACTIVE)),
+            canceled=Count("id", filter=Q(to_status=License.Status.CANCELED)),
+            revenue=Sum("price", filter=Q(to_status=License.Status.ACTIVE)),
+        )
+        .order_by()
+    )
+    for r in flows:
+        row = rows[(_as_date(r["day"]), r["tenant_id"], r["tool_id"])]
+        row["new_licenses"] = r["new"]
+        row["active_licenses"] = r["active"]
+        row["canceled_licenses"] = r["canceled"]
+        row["revenue"] = r["revenue"] or Decimal("0.00")
+    return rows
+
+
+def _runs(days: list[date]) -> Iterable[tuple[date, date]]:
+    """Split sorted days into contiguous ranges so sparse updates don't scan the gaps."""
+    start = prev = days[0]
+    for day in days[1:]:
+        if day != prev + timedelta(days=1):
+            yield start, prev
+            start = day
+        prev = day
+    yield start, prev
+
+
+def rebuild_days(days: Iterable[date]) -> int:
+    """Recompute the rollup rows for ``days`` from the raw tables. Returns rows written."""
+    days = sorted(set(days))
+    if not days:
+        return 0
+    RollupCheckpoint.objects.get_or_create(name=LOCK_NAME, defaults={"processed_until": now()})
+    with transaction.atomic():
+        # Without the lock two passes could both delete and then both insert the same
+        # keys into uniq_daily_rollup. Collecting under it means the last pass to
+        # finish also wrote from the freshest reads.
+        RollupCheckpoint.objects.select_for_update().get(name=LOCK_NAME)
+        objs = []
+        for start, end in _runs(days):
+            for (day, tenant_id, tool_id), values in _collect(start, end).items():
+                if any(values[name] for name in COUNTERS) or values["revenue"]:
+                    objs.append(DailyRollup(day=day, tenant_id=tenant_id, tool_id=tool_id, **values))
+        DailyRollup.objects.filter(day__in=days).delete()
+        DailyRollup.objects.bulk_create(objs, batch_size=1000)
+    return len(objs)
+
+
+def backfill(start: date, end: date, chunk_days: int = 31) -> int:
+    """Rebuild every day in ``[start, end]`` in bounded chunks."""
+    written = 0
+    cursor = start
+    while cursor <= end:
+        chunk_end = min(end, cursor + timedelta(days=chunk_days - 1))
+        written += rebuild_days(cursor + timedelta(days=i) for i in range((chunk_end - cursor).days + 1))
+        cursor = chunk_end + timedelta(days=1)
+    return written
+
+
+def earliest_day() -> date | None:
+    """First day with any source activity, i.e. where a full backfill should start."""
+    firsts = [
+        model.objects.order_by(field).values_list(field, flat=True).first()
+        for model, field in (
+            (LicenseEvent, "occurred_at"),
+            (WidgetLead, "created_at"),
+            (MarketplaceLead, "created_at"),
+        )
+    ]
+    firsts = [value for value in firsts if value is not None]
+    return min(firsts).date() if firsts else None
+
+
+def mark_stale_day(sender, instance, **kwargs) -> None:
+    """``post_delete`` receiver for the rollup sources: queue the deleted row's day."""
+    stamp = instance.occurred_at if isinstance(instance, LicenseEvent) else instance.created_at
+    StaleRollupDay.objects.create(day=localtime(stamp).date())
+
+
+def refresh() -> int:
+    """
+    Incremental pass used by the beat task. The checkpoint moves to the time the pass
+    started, and each pass rescans ``ROLLUP_OVERLAP_SECONDS`` before it, so rows written
+    while a pass runs, or committed late, are picked up next time.
+    """
+    started = now()
+    checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    # Read before rebuilding: a day queued after this is left for the next pass.
+    stale = dict(StaleRollupDay.objects.values_list("pk", "day"))
+    if checkpoint is None:
+        first = earliest_day()
+        written = backfill(first, started.date()) if first else 0
+    else:
+        overlap = timedelta(seconds=getattr(settings, "ROLLUP_OVERLAP_SECONDS", 15 * 60))
+        days = changed_days(checkpoint.processed_until - overlap)
+        days.add(started.date())
+        days.update(stale.values())
+        written = rebuild_days(days)
+    StaleRollupDay.objects.filter(pk__in=stale).delete()
+    RollupCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={"processed_until": started})
+    return written
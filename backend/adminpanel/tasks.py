@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from celery import chord, shared_task
+from PIL import UnidentifiedImageError
+
+from adminpanel import images, media, rollups
+from adminpanel.models import MediaAsset
+
+
+@shared_task
+def refresh_daily_rollups() -> int:
+    """Beat entry point: rebuild only the rollup days touched since the last pass."""
+    return rollups.refresh()
+
+
+@shared_task
+def purge_stale_uploads() -> int:
+    """Beat entry point: drop resumable uploads nobody has touched within ``SESSION_TTL``."""
+    return media.purge_stale_sessions()
+
+
+@shared_task
+def build_image_variants(asset_id: int) -> int:
+    """
+    Fan out one render task per width so the worker pool encodes them in parallel; the
+    chord's callback re-renders the payloads that embed the srcsets once, after the last.
+    """
+    asset = MediaAsset.objects.filter(pk=asset_id).first()
+    if asset is None or not images.is_image(asset):
+        return 0
+    widths = images.plan_widths(asset)
+    chord(render_image_variants.si(asset_id, width) for width in widths)(refresh_image_references.si(asset_id))
+    return len(widths)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def render_image_variants(self, asset_id: int, width: int) -> int:
+    asset = MediaAsset.objects.filter(pk=asset_id).first()
+    if asset is None:
+        return 0
+    try:
+        variants = images.render(asset, width)
+    except UnidentifiedImageError:
+        raise  # not an image Pillow can read; a retry won't change that
+    except OSError as exc:  # storage hiccup
+        raise self.retry(exc=exc)
+    return len(variants)
+
+
+@shared_task
+def refresh_image_references(asset_id: int) -> None:
+    """Chord callback of ``build_image_variants``: every width is recorded."""
+    asset = MediaAsset.objects.filter(pk=asset_id).first()
+    if asset is not None:
+        images.refresh_references(asset)
@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import base64
+import fcntl
+import hashlib
+import io
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from PIL import Image, UnidentifiedImageError
+from rest_framework.test import APIClient
+
+from accounts.models import Contractor
+from adminpanel import media, rollups, tasks
+from adminpanel.models import DailyRollup, MediaAsset, MediaVariant, RollupCheckpoint, StaleRollupDay, UploadSession
+from marketplace.models import License, LicenseEvent, Tool, WidgetLead
+from shared import profiling
+from shared.cache import clear_local_caches
+from shared.tenant import Tenant
+
+
+# Reads stay on "default" so assertNumQueries sees them even when a replica is configured.
+@override_settings(DATABASE_ROUTERS=[])
+class AdminMetricsQueryCountTests(TestCase):
+    """The dashboard reads rollups and the ledger, so its query count must not depend on history size."""
+
+    def setUp(self):
+        self.admin = Contractor.objects.create_superuser("admin@example.com", "pw", full_name="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=Decimal("99.00"))
+
+    def _add_history(self, tenants: int) -> None:
+        today = now()
+        for i in range(tenants):
+            tenant = Tenant.objects.create(slug=f"t-{Tenant.objects.count()}", name=f"Tenant {i}")
+            license = License.objects.create(tenant=tenant, tool=self.tool, status=License.Status.ACTIVE)
+            LicenseEvent.objects.create(
+                license=license,
+                tenant=tenant,
+                tool=self.tool,
+                to_status=License.Status.ACTIVE,
+                price=self.tool.price_monthly,
+                mrr_delta=self.tool.price_monthly,
+                source=LicenseEvent.Source.BACKFILL,
+                occurred_at=today - timedelta(days=31 * i),
+            )
+            DailyRollup.objects.create(
+                day=(today - timedelta(days=i)).date(), tenant=tenant, tool=self.tool, widget_leads=2, marketplace_leads=1
+            )
+
+    def _get(self):
+        cache.clear()
+        clear_local_caches()
+        return self.client.get("/api/admin/metrics/", {"from": "2020-01-01"})
+
+    def test_query_count_is_fixed(self):
+        # Tenant lookup, MRR, coupon redemptions, lead totals, revenue series, lead series, top tools.
+        self._add_history(2)
+        with self.assertNumQueries(7):
+            response = self._get()
+        self.assertEqual(response.status_code, 200)
+
+        self._add_history(40)
+        with self.assertNumQueries(7):
+            response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["top_tools"]), 1)
+
+
+class LicenseRollupTests(TestCase):
+    """License columns come from the event ledger, so incremental passes and backfills agree."""
+
+    def setUp(self):
+        self.tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=Decimal("50.00"))
+        self.tenant = Tenant.objects.create(slug="acme", name="Acme")
+        self.license = License.objects.create(tenant=self.tenant, tool=self.tool, status=License.Status.PENDING)
+        LicenseEvent.objects.record(
+            License.objects.filter(pk=self.license.pk), License.Status.PENDING, source=LicenseEvent.Source.ONBOARDING,
+            from_status="",
+        )
+        self.yesterday = now() - timedelta(days=1)
+        LicenseEvent.objects.filter(license=self.license).update(occurred_at=self.yesterday)
+
+    def _rows(self):
+        return list(
+            DailyRollup.objects.order_by("day").values_list(
+                "day", "new_licenses", "active_licenses", "canceled_licenses", "revenue"
+            )
+        )
+
+    def test_later_edit_does_not_move_earlier_flows(self):
+        rollups.refresh()
+        # An edit that records no transition (e.g. a note or a re-save) must not restate yesterday.
+        License.objects.filter(pk=self.license.pk).update(updated_at=now())
+        with transaction.atomic():
+            LicenseEvent.objects.record(
+                License.objects.filter(pk=self.license.pk), License.Status.ACTIVE, source=LicenseEvent.Source.WEBHOOK
+            )
+            License.objects.filter(pk=self.license.pk).update(status=License.Status.ACTIVE)
+        rollups.refresh()
+        incremental = self._rows()
+
+        DailyRollup.objects.all().delete()
+        rollups.backfill(self.yesterday.date(), now().date())
+        self.assertEqual(self._rows(), incremental)
+        self.assertEqual(
+            incremental,
+            [
+                (self.yesterday.date(), 1, 0, 0, Decimal("0.00")),
+                (now().date(), 0, 1, 0, Decimal("50.00")),
+            ],
+        )
+
+    def test_rebuild_is_repeatable(self):
+        rollups.rebuild_days([self.yesterday.date()])
+        rollups.rebuild_days([self.yesterday.date()])
+        self.assertEqual(DailyRollup.objects.count(), 1)
+
+
+@override_settings(ROLLUP_OVERLAP_SECONDS=600)
+class RollupRefreshTests(TestCase):
+    """Incremental passes pick up late commits and deletes, not just rows newer than the checkpoint."""
+
+    def setUp(self):
+        self.tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=Decimal("50.00"))
+        self.tenant = Tenant.objects.create(slug="acme", name="Acme")
+
+    def _lead(self, name: str) -> WidgetLead:
+        return WidgetLead.objects.create(
+            tenant=self.tenant, tool=self.tool, full_name=name, email="lead@example.com", address="1 Main St"
+        )
+
+    def _stamp(self, lead: WidgetLead, when) -> None:
+        WidgetLead.objects.filter(pk=lead.pk).update(created_at=when, updated_at=when)
+
+    def _leads_on(self, day) -> int:
+        row = DailyRollup.objects.filter(day=day, tenant=self.tenant).first()
+        return row.widget_leads if row else 0
+
+    def test_new_rows_are_added(self):
+        self._lead("First")
+        rollups.refresh()
+        self._lead("Second")
+        rollups.refresh()
+        self.assertEqual(self._leads_on(now().date()), 2)
+
+    def test_rows_committed_after_the_previous_pass_read_are_counted(self):
+        # Days other than today are only rebuilt when a scan finds them.
+        checkpoint = now() - timedelta(days=3)
+        RollupCheckpoint.objects.create(name=rollups.CHECKPOINT_NAME, processed_until=checkpoint)
+        # Stamped before the checkpoint, as a row from a transaction still open during that pass.
+        self._stamp(self._lead("Late"), checkpoint - timedelta(seconds=60))
+        rollups.refresh()
+        self.assertEqual(self._leads_on((checkpoint - timedelta(seconds=60)).date()), 1)
+
+    def test_deleted_rows_are_taken_out(self):
+        day = now() - timedelta(days=3)
+        first, second = self._lead("First"), self._lead("Second")
+        self._stamp(first, day)
+        self._stamp(second, day)
+        rollups.refresh()
+        self.assertEqual(self._leads_on(day.date()), 2)
+
+        WidgetLead.objects.get(pk=first.pk).delete()
+        self.assertEqual(StaleRollupDay.objects.count(), 1)
+        rollups.refresh()
+        self.assertEqual(self._leads_on(day.date()), 1)
+        self.assertFalse(StaleRollupDay.objects.exists())
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class AdminCursorPaginationTests(TestCase):
+    def setUp(self):
+        admin = Contractor.objects.create_superuser("admin@example.com", "pw", full_name="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def _walk(self, url: str, key: str, link: str = "next", between=None) -> list:
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row[key] for row in response.data["results"]]
+            # Every cursor is a full keyset position; DRF's offset fallback never kicks in.
+            cursor = parse_qs(urlsplit(url).query).get("cursor")
+            if cursor:
+                self.assertNotIn("o=", base64.b64decode(cursor[0]).decode())
+            if between:
+                between()
+            url = response.data[link]
+        return seen
+
+    def test_repeated_names_page_on_the_tie_breaker(self):
+        for i in range(7):
+            Tool.objects.create(slug=f"tool-{i}", name="Same" if i % 3 else f"Tool {i}", price_monthly=10)
+        expected = list(Tool.objects.order_by("name", "id").values_list("slug", flat=True))
+        self.assertEqual(self._walk("/api/admin/tools/?page_size=2", "slug"), expected)
+
+        # And back again from the last page through the previous links.
+        last = self.client.get("/api/admin/tools/?page_size=2")
+        while last.data["next"]:
+            last = self.client.get(last.data["next"])
+        pages = self._pages_back(last.data["previous"])
+        earlier = [slug for page in reversed(pages) for slug in page]
+        self.assertEqual(earlier + [row["slug"] for row in last.data["results"]], expected)
+
+    def _pages_back(self, url: str) -> list:
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append([row["slug"] for row in response.data["results"]])
+            url = response.data["previous"]
+        return pages
+
+    def test_updates_while_paging_neither_skip_nor_repeat(self):
+        tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=10)
+        for i in range(6):
+            License.objects.create(tenant=Tenant.objects.create(slug=f"t{i}", name=f"T{i}"), tool=tool)
+        ids = [str(pk) for pk in License.objects.order_by("-created_at", "-id").values_list("pk", flat=True)]
+
+        def touch_oldest():
+            License.objects.filter(pk=ids[-1]).update(updated_at=now(), status=License.Status.ACTIVE)
+
+        seen = self._walk("/api/admin/licenses/?page_size=2", "id", between=touch_oldest)
+        self.assertEqual([str(pk) for pk in seen], ids)
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        admin = Contractor.objects.create_superuser("admin@example.com", "pw", full_name="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        Tool.objects.create(slug="estimator", name="Estimator", price_monthly=10, summary="Long copy")
+
+    def test_fields_narrow_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/admin/tools/?fields=slug,name")
+        self.assertEqual(list(response.data["results"][0]), ["slug", "name"])
+        tool_select = next(q["sql"] for q in queries.captured_queries if 'FROM "marketplace_tool"' in q["sql"])
+        self.assertIn('"marketplace_tool"."slug"', tool_select)
+        self.assertNotIn('"marketplace_tool"."summary"', tool_select)
+        self.assertNotIn('"marketplace_tool"."bento_features"', tool_select)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get("/api/admin/tools/?fields=slug,no_such_field")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("no_such_field", str(response.data["fields"]))
+
+    def test_list_fields_leave_out_heavy_columns(self):
+        row = self.client.get("/api/admin/tools/").data["results"][0]
+        self.assertIn("summary", row)
+        self.assertNotIn("bento_features", row)
+
+
+class ResumableUploadTests(TestCase):
+    BODY = b"0123456789abcdefghij"
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root.name))
+        admin = Contractor.objects.create_superuser("admin@example.com", "pw", full_name="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def _start(self, **extra) -> dict:
+        data = {"filename": "notes.bin", "size": len(self.BODY), "content_type": "application/octet-stream"} | extra
+        return self.client.post("/api/admin/uploads", data, format="json")
+
+    def _patch(self, session_id: str, offset: int, body: bytes):
+        return self.client.generic(
+            "PATCH", f"/api/admin/uploads/{session_id}", body, content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_resume_from_the_reported_offset(self):
+        session_id = self._start().data["id"]
+        self.assertEqual(self._patch(session_id, 0, self.BODY[:8]).data["offset"], 8)
+        self.assertEqual(self.client.get(f"/api/admin/uploads/{session_id}").data["offset"], 8)
+        response = self._patch(session_id, 8, self.BODY[8:])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["sha256"], hashlib.sha256(self.BODY).hexdigest())
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_wrong_offset_is_a_conflict(self):
+        session_id = self._start().data["id"]
+        self._patch(session_id, 0, self.BODY[:8])
+        response = self._patch(session_id, 4, self.BODY[4:12])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["offset"], 8)
+
+    def test_short_chunk_advances_by_what_arrived(self):
+        session = UploadSession.objects.create(filename="notes.bin", size=len(self.BODY))
+        session = media.append_chunk(session.pk, io.BytesIO(self.BODY[:5]), 0, 10)
+        self.assertEqual(session.offset, 5)
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).offset, 5)
+        self.assertEqual(media.part_path(session).read_bytes(), self.BODY[:5])
+
+    def test_a_chunk_in_flight_turns_away_a_second_writer(self):
+        session = UploadSession.objects.create(filename="notes.bin", size=len(self.BODY))
+        with open(media.part_path(session), "wb") as held:
+            fcntl.flock(held, fcntl.LOCK_EX)
+            with self.assertRaises(media.OffsetMismatch):
+                media.append_chunk(session.pk, io.BytesIO(self.BODY), 0, len(self.BODY))
+        self.assertEqual(media.append_chunk(session.pk, io.BytesIO(self.BODY), 0, len(self.BODY)).offset, 20)
+
+    def test_finished_upload_answers_404(self):
+        session_id = self._start().data["id"]
+        self._patch(session_id, 0, self.BODY)
+        self.assertEqual(self._patch(session_id, len(self.BODY), b"").status_code, 404)
+
+    def test_completing_twice_stores_once(self):
+        session = UploadSession.objects.create(filename="notes.bin", size=len(self.BODY))
+        session = media.append_chunk(session.pk, io.BytesIO(self.BODY), 0, len(self.BODY))
+        media.complete(session)
+        with self.assertRaises(UploadSession.DoesNotExist):
+            media.complete(session)
+        self.assertEqual(MediaAsset.objects.count(), 1)
+
+    def test_same_bytes_are_deduplicated(self):
+        first = self._start().data["id"]
+        self.assertEqual(self._patch(first, 0, self.BODY).status_code, 201)
+        second = self._start().data["id"]
+        response = self._patch(second, 0, self.BODY)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["deduplicated"])
+        known = self._start(sha256=hashlib.sha256(self.BODY).hexdigest())
+        self.assertEqual((known.status_code, known.data["deduplicated"]), (200, True))
+        self.assertEqual(MediaAsset.objects.count(), 1)
+
+
+class ImageVariantTaskTests(TestCase):
+    """Widths render as a chord whose callback refreshes references once; unreadable files fail at once."""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root.name))
+
+    def _store(self, body: bytes) -> MediaAsset:
+        asset, _ = media.store(io.BytesIO(body), "icon.png", "image/png")
+        return asset
+
+    def test_every_width_is_rendered_then_references_refresh_once(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (200, 100), "red").save(buffer, format="PNG")
+        asset = self._store(buffer.getvalue())
+        with mock.patch("adminpanel.tasks.chord") as chord:
+            self.assertEqual(tasks.build_image_variants(asset.pk), 2)
+        header = list(chord.call_args.args[0])
+        callback = chord.return_value.call_args.args[0]
+        self.assertEqual([signature.args for signature in header], [(asset.pk, 64), (asset.pk, 128)])
+        self.assertEqual((callback.task, callback.args), (tasks.refresh_image_references.name, (asset.pk,)))
+
+        with mock.patch("adminpanel.images.refresh_references") as refresh:
+            for signature in header:
+                signature.apply()
+            refresh.assert_not_called()
+            callback.apply()
+        refresh.assert_called_once_with(asset)
+        self.assertEqual(set(MediaVariant.objects.filter(asset=asset).values_list("width", flat=True)), {64, 128})
+
+    def test_unreadable_image_fails_without_retrying(self):
+        asset = self._store(b"not an image at all")
+        with mock.patch.object(tasks.render_image_variants, "retry") as retry:
+            result = tasks.render_image_variants.apply(args=(asset.pk, 64))
+        self.assertIsInstance(result.result, UnidentifiedImageError)
+        retry.assert_not_called()
+        self.assertFalse(MediaVariant.objects.exists())
+
+
+@override_settings(REQUEST_PROFILING={"BUFFER_SIZE": 10})
+class RequestProfileViewTests(TestCase):
+    """The profile buffer is admin-only; the worst samples and a per-view rollup come back sorted."""
+
+    def setUp(self):
+        cache.clear()
+        samples = [("tool-list", 3, 40.0), ("widget-config", 12, 10.0), ("tool-list", 30, 90.0)]
+        for n, (view, queries, duration) in enumerate(samples):
+            repeated = [{"sql": "SELECT ?", "count": queries}] if queries > 10 else []
+            profiling.store(
+                {"at": float(n), "view": view, "queries": queries, "duration_ms": duration, "db_ms": 1.0, "repeated": repeated}
+            )
+        self.client = APIClient()
+
+    def test_anonymous_and_non_admin_callers_are_refused(self):
+        self.assertIn(self.client.get("/api/admin/profiles").status_code, (401, 403))
+        tenant = Tenant.objects.create(slug="acme", name="Acme")
+        self.client.force_authenticate(Contractor.objects.create_user("pat@example.com", "pw", tenant=tenant, full_name="Pat"))
+        self.assertEqual(self.client.get("/api/admin/profiles").status_code, 403)
+        self.assertEqual(self.client.delete("/api/admin/profiles").status_code, 403)
+        self.assertEqual(len(profiling.samples()), 3)
+
+    def test_admin_sees_worst_samples_and_the_rollup(self):
+        self.client.force_authenticate(Contractor.objects.create_superuser("admin@example.com", "pw", full_name="Admin"))
+        data = self.client.get("/api/admin/profiles?sort=duration_ms&limit=2").data
+        self.assertEqual(data["sampled"], 3)
+        self.assertEqual([sample["duration_ms"] for sample in data["worst"]], [90.0, 40.0])
+        self.assertEqual(
+            data["views"][0],
+            {"view": "tool-list", "samples": 2, "max_queries": 30, "avg_queries": 16.5, "max_duration_ms": 90.0, "n_plus_one": 1},
+        )
+        self.assertEqual(self.client.get("/api/admin/profiles?view=widget-config").data["sampled"], 1)
+        self.assertEqual(self.client.get("/api/admin/profiles?sort=nope").status_code, 400)
+
+        self.assertEqual(self.client.delete("/api/admin/profiles").status_code, 204)
+        self.assertEqual(profiling.samples(), [])
@@ -1,20 +1,206 @@
 from __future__ import annotations
 
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from rest_framework import permissions, status
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions, serializers, status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from adminpanel import images, media
+from adminpanel.models import MediaAsset, UploadSession
+from shared import profiling
+
+
+def asset_payload(asset: MediaAsset, created: bool) -> dict:
+    return {
+        "url": default_storage.url(asset.path),
+        "sha256": asset.sha256,
+        "size": asset.size,
+        "content_type": asset.content_type,
+        "deduplicated": not created,
+        # Filled in by the background derivative pipeline; poll /api/admin/media/<sha256>.
+        "srcset": images.srcset(asset) if images.is_image(asset) else {},
+    }
+
+
+def asset_response(asset: MediaAsset, created: bool) -> Response:
+    return Response(asset_payload(asset, created), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
 
 class MediaUploadView(APIView):
+    """
+    Single-request upload. A known ``X-Content-SHA256`` header short-circuits before the
+    body is parsed; otherwise the file is hashed and stored chunk by chunk.
+    """
+
     permission_classes = [permissions.IsAdminUser]
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request, *args, **kwargs):
+        known = media.find(request.headers.get("X-Content-SHA256", "").lower())
+        if known:
+            return asset_response(known, created=False)
         file_obj = request.FILES.get("file")
         if not file_obj:
             return Response({"detail": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
-        path = default_storage.save(f"tool_media/{file_obj.name}", ContentFile(file_obj.read()))
-        return Response({"url": default_storage.url(path)}, status=status.HTTP_201_CREATED)
+        asset, created = media.store(file_obj, file_obj.name, file_obj.content_type or "")
+        return asset_response(asset, created)
+
+
+class MediaAssetView(APIView):
+    """An uploaded asset by digest, with the ``srcset`` map of its image variants."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, sha256, *args, **kwargs):
+        asset = media.find(sha256.lower())
+        if asset is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(asset_payload(asset, created=False) | {"width": asset.width, "height": asset.height})
+
+
+class UploadSessionSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=127, required=False, allow_blank=True, default="")
+    sha256 = serializers.RegexField(media.SHA256_RE, required=False, allow_blank=True, default="")
+
+    def validate_size(self, value):
+        if value > media.max_size():
+            raise serializers.ValidationError(f"Uploads are limited to {media.max_size()} bytes.")
+        return value
+
+
+def session_payload(session: UploadSession) -> dict:
+    return {"id": str(session.pk), "offset": session.offset, "size": session.size, "chunk_size": media.chunk_size()}
+
+
+class UploadSessionCreateView(APIView):
+    """
+    Start a resumable upload. Sending the file's ``sha256`` lets an already stored asset
+    come back immediately (200) instead of a new session (201).
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        known = media.find(data["sha256"].lower())
+        if known:
+            return asset_response(known, created=False)
+        session = UploadSession.objects.create(
+            filename=data["filename"],
+            content_type=data["content_type"],
+            size=data["size"],
+            sha256=data["sha256"].lower(),
+            # pk rather than the object: a bearer-token user is a TokenUser, not a Contractor.
+            created_by_id=request.user.pk if request.user.is_authenticated else None,
+        )
+        response = Response(session_payload(session), status=status.HTTP_201_CREATED)
+        response["Location"] = request.build_absolute_uri(f"/api/admin/uploads/{session.pk}")
+        return response
+
+
+class UploadSessionView(APIView):
+    """
+    ``GET`` reports the offset to resume from. ``PATCH`` appends the raw request body at
+    the ``Upload-Offset`` header; the chunk that completes the file returns the asset.
+    ``DELETE`` abandons the upload.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk, *args, **kwargs):
+        return Response(session_payload(get_object_or_404(UploadSession, pk=pk)))
+
+    def patch(self, request, pk, *args, **kwargs):
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Upload-Offset and Content-Length headers are required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            session = media.append_chunk(pk, request.stream, offset, length)
+            if session.offset < session.size:
+                return Response(session_payload(session))
+            asset, created = media.complete(session)
+        except UploadSession.DoesNotExist:
+            # Unknown, or completed/discarded by a request that raced this one.
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        except media.OffsetMismatch as exc:
+            return Response({"detail": str(exc), "offset": exc.offset}, status=status.HTTP_409_CONFLICT)
+        except (ValueError, media.ChecksumMismatch) as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return asset_response(asset, created)
+
+    def delete(self, request, pk, *args, **kwargs):
+        media.discard(get_object_or_404(UploadSession, pk=pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+PROFILE_SORTS = ("queries", "duration_ms", "db_ms")
+
+
+class RequestProfileView(APIView):
+    """
+    Worst sampled requests from the profiling ring buffer (``shared.profiling``), plus a
+    per-view rollup. ``?sort=queries|duration_ms|db_ms``, ``?view=<url name>`` and
+    ``?limit=`` narrow the sample list; ``DELETE`` empties the buffer.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        sort = request.query_params.get("sort", "queries")
+        if sort not in PROFILE_SORTS:
+            return Response(
+                {"detail": f"sort must be one of {', '.join(PROFILE_SORTS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 20)), 200))
+        except ValueError:
+            limit = 20
+        samples = profiling.samples()
+        view = request.query_params.get("view")
+        if view:
+            samples = [sample for sample in samples if sample["view"] == view]
+
+        by_view: dict = {}
+        for sample in samples:
+            row = by_view.setdefault(
+                sample["view"],
+                {
+                    "view": sample["view"],
+                    "samples": 0,
+                    "max_queries": 0,
+                    "total_queries": 0,
+                    "max_duration_ms": 0.0,
+                    "n_plus_one": 0,
+                },
+            )
+            row["samples"] += 1
+            row["total_queries"] += sample["queries"]
+            row["max_queries"] = max(row["max_queries"], sample["queries"])
+            row["max_duration_ms"] = max(row["max_duration_ms"], sample["duration_ms"])
+            row["n_plus_one"] += bool(sample["repeated"])
+        views = []
+        for row in by_view.values():
+            row["avg_queries"] = round(row.pop("total_queries") / row["samples"], 1)
+            views.append(row)
+
+        return Response(
+            {
+                "sampled": len(samples),
+                "views": sorted(views, key=lambda row: (-row["max_queries"], -row["max_duration_ms"])),
+                "worst": sorted(samples, key=lambda sample: -sample[sort])[:limit],
+            }
+        )
+
+    def delete(self, request, *args, **kwargs):
+        profiling.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,5 +1,8 @@
 """
 ASGI config for roofing SaaS project.
+
+Django's handler only speaks HTTP, so lifespan events are answered here: startup pools
+``shared.http.outbound``'s async clients on the worker's loop and shutdown closes them.
 """
 import os
 
@@ -7,4 +10,25 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from shared.http import outbound  # noqa: E402  (needs the app registry loaded)
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            outbound.pool_async_clients()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await outbound.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    else:
+        await django_application(scope, receive, send)
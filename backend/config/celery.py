@@ -7,3 +7,6 @@ app = Celery("config")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
+# Task duration metrics and the worker's exporter hook up through Celery signals.
+import shared.metrics  # noqa: E402,F401
+
@@ -0,0 +1,89 @@
+"""
+Query budgets for every URL name in ``config/urls.py``; checked by
+``manage.py check_query_budgets`` (see ``shared.query_budgets``).
+
+Counts are for a cold request (empty caches) and must not change between 10 and 1000
+rows per table, and include the cold tenant lookup in ``TenantResolverMiddleware``. A
+change that adds queries to an endpoint has to raise its number here.
+"""
+from __future__ import annotations
+
+from shared.query_budgets import Case
+
+BUDGETS = [
+    # route                     method   path                                       user    budget  status
+    Case("admin-tools-list",    "GET",   "/api/admin/tools/",                       "admin",   3),
+    Case("admin-tools-list",    "POST",  "/api/admin/tools/",                       "admin",  14,  201,
+         data={"slug": "new-tool", "name": "New Tool", "price_monthly": "10.00", "coupon_code": "LAUNCH",
+               "coupon_percent_off": "20.00"}),
+    Case("admin-tools-detail",  "GET",   "/api/admin/tools/{tool}/",                "admin",   3),
+    Case("admin-tools-detail",  "PATCH", "/api/admin/tools/{tool}/",                "admin",   4,
+         data={"summary": "Updated"}),
+    Case("admin-tenants-list",  "GET",   "/api/admin/tenants/?license_status=active", "admin",  2),
+    Case("admin-tenants-detail", "GET",  "/api/admin/tenants/{tenant}/",            "admin",   2),
+    Case("admin-metrics-list",  "GET",   "/api/admin/metrics/",                     "admin",   7),
+    Case("admin-tickets-list",  "GET",   "/api/admin/tickets/",                     "admin",   2),
+    Case("admin-tickets-list",  "POST",  "/api/admin/tickets/",                     "admin",   4,  201,
+         data={"tenant": "{tenant}", "tool": "{tool_id}", "subject": "Widget is slow"}),
+    Case("admin-tickets-detail", "GET",  "/api/admin/tickets/{ticket}/",            "admin",   2),
+    Case("admin-tickets-detail", "PATCH", "/api/admin/tickets/{ticket}/",           "admin",   3,
+         data={"status": "resolved"}),
+    Case("admin-licenses-list", "GET",   "/api/admin/licenses/",                    "admin",   2),
+    Case("admin-licenses-detail", "GET", "/api/admin/licenses/{license}/",          "admin",   2),
+    Case("admin-licenses-detail", "PATCH", "/api/admin/licenses/{license}/",        "admin",   7,
+         data={"status": "canceled"}),
+    Case("api-root",            "GET",   "/",                                       "admin",   1),
+    Case("admin-media-upload",  "POST",  "/api/admin/upload",                       "admin",   2,
+         headers={"X-Content-SHA256": "{sha256}"}),
+    Case("admin-media-asset",   "GET",   "/api/admin/media/{sha256}",               "admin",   2),
+    Case("admin-upload-sessions", "POST", "/api/admin/uploads",                     "admin",   2,  201,
+         data={"filename": "hero.mp4", "size": 1048576}),
+    Case("admin-upload-session", "GET",  "/api/admin/uploads/{upload}",             "admin",   2),
+    Case("admin-request-profiles", "GET", "/api/admin/profiles",                    "admin",   1),
+    Case("tool-list",           "GET",   "/api/marketplace/tools",                  "anon",    3),
+    Case("tool-create",         "POST",  "/api/marketplace/tools/new",              "admin",  11,  201,
+         data={"slug": "another-tool", "name": "Another Tool", "price_monthly": "15.00"}),
+    Case("tool-detail",         "GET",   "/api/marketplace/tools/{tool}",           "anon",    3),
+    Case("marketplace-lead-create", "POST", "/api/leads/marketplace",               "anon",    3,  201,
+         data={"tool": "{tool_id}", "full_name": "Pat Doe", "email": "pat@example.com", "address": "1 Main St"}),
+    Case("widget-lead-create",  "GET",   "/api/leads/widget?tool={tool}",           "owner",   4),
+    Case("widget-lead-create",  "POST",  "/api/leads/widget",                       "owner",   4,  201,
+         data={"tool": "{tool_id}", "full_name": "Pat Doe", "email": "pat@example.com", "address": "1 Main St",
+               "ground_area": "1800", "pitch": "6"}),
+    Case("widget-bootstrap",    "GET",   "/api/widget/bootstrap?tool={tool}",       "anon",    5,
+         headers={"X-Tenant-ID": "{tenant}"}),
+    Case("widget-config",       "GET",   "/api/widget/config",                      "anon",    3,
+         headers={"X-Tenant-ID": "{tenant}"}),
+    Case("widget-config",       "PUT",   "/api/widget/config",                      "owner",   4,
+         data={"theme": "smoked"}),
+    Case("license-check",       "GET",   "/api/license/check?tool={tool}",          "anon",    3,
+         headers={"X-Tenant-ID": "{tenant}"}),
+    Case("pricing-estimate",    "POST",  "/api/pricing/estimate?tool={tool}&material=Material%200", "anon",  4,
+         data={"tool": "{tool}", "ground_area": "1800", "pitch": "6"}, headers={"X-Tenant-ID": "{tenant}"}),
+    Case("onboarding-start",    "POST",  "/api/onboarding/start",                   "anon",   13,  201,
+         data={"tool": "{tool}", "tenant_name": "New Roofing", "full_name": "New Owner", "email": "new@example.com",
+               "coupon_code": "SAVE0"}),
+    Case("auth-login",          "POST",  "/api/auth/login",                         "anon",    8,
+         data={"email": "owner@budget.invalid", "password": "budget-password"}),
+    Case("auth-register",       "POST",  "/api/auth/register",                      "anon",   11,  201,
+         data={"tenant_name": "Fresh Roofing", "full_name": "Fresh Owner", "email": "fresh@example.com",
+               "password": "fresh-password"}),
+    Case("auth-token",          "POST",  "/api/auth/token",                         "basic",   4),
+    Case("auth-token-refresh",  "POST",  "/api/auth/token/refresh",                 "anon",    4,
+         data={"refresh": "{refresh}"}),
+    Case("auth-me",             "GET",   "/api/auth/me",                            "owner",   2),
+    Case("auth-logout",         "POST",  "/api/auth/logout",                        "owner",   5,  204),
+    Case("materials-bulk",      "GET",   "/api/materials?tool={tool}",              "owner",   3),
+    Case("materials-bulk",      "POST",  "/api/materials",                          "owner",   5,  201,
+         data={"tool": "{tool}", "materials": [{"name": "Slate", "material_rate": "9.00", "labor_rate": "4.00"}]}),
+    Case("flw-webhook",         "POST",  "/api/payments/flutterwave/webhook",       "anon",    2,
+         data={"event": "charge.completed", "data": {"id": 1, "tx_ref": "budget-tx", "status": "successful"}}),
+    Case("tenant-origin",       "POST",  "/api/tenant/origin",                      "owner",   3,
+         data={"domain": "roofing.example.com"}),
+    # 404 without METRICS_TOKEN, 401 with one; the check runs without DEBUG.
+    Case("metrics",             "GET",   "/metrics",                                "anon",    1,  (401, 404)),
+    # The widget asset views read the build manifest; 404 until assets are built.
+    Case("widget-latest-js",    "GET",   "/widget/latest.js",                       "anon",    1,  (302, 404)),
+    Case("widget-latest-css",   "GET",   "/widget/latest.css",                      "anon",    1,  (302, 404)),
+    Case("widget-asset",        "GET",   "/widget/nex-widget.missing.js",           "anon",    1,  404),
+]
@@ -37,12 +37,17 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "accounts.Contractor"
 
 MIDDLEWARE = [
+    # Prometheus request latency/query histograms (shared.metrics); first so it times everything
+    "shared.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Sampled SQL/latency profiling; removes itself unless REQUEST_PROFILING["ENABLED"]
+    "shared.profiling.QueryProfilerMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "shared.db.ReplicaStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "shared.middleware.TenantResolverMiddleware",
@@ -80,6 +85,18 @@ DATABASES = {
     }
 }
 
+# Optional read replica for opted-in admin/list views (shared.db); only used when a host is configured.
+if os.getenv("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["shared.db.ReplicaRouter"]
+# How long a user who just wrote keeps reading from the primary.
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -97,18 +114,130 @@ USE_TZ = True
 STATIC_URL = "/static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# Admin media uploads (adminpanel.media): streamed, content-addressed, resumable above CHUNK_SIZE
+MEDIA_UPLOAD = {
+    "CHUNK_SIZE": int(os.getenv("MEDIA_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024))),
+    "MAX_SIZE": int(os.getenv("MEDIA_UPLOAD_MAX_SIZE", str(2 * 1024 * 1024 * 1024))),
+    "SESSION_TTL": int(os.getenv("MEDIA_UPLOAD_SESSION_TTL", str(60 * 60 * 24))),
+    "PARTS_DIR": os.getenv("MEDIA_UPLOAD_PARTS_DIR", ""),
+}
+
+# Widget bundle served at /widget/ (marketplace.assets; filled by `manage.py build_widget_assets`)
+WIDGET_DIST_DIR = Path(os.getenv("WIDGET_DIST_DIR", BASE_DIR.parent / "widget" / "dist"))
+WIDGET_ASSETS_ROOT = Path(os.getenv("WIDGET_ASSETS_ROOT", BASE_DIR / "widget_assets"))
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Shared cache (coupon lookups etc.); falls back to per-process memory when Redis isn't configured
+CACHE_URL = os.getenv("CACHE_URL", os.getenv("REDIS_URL", ""))
+if CACHE_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Two-tier caches (shared.cache.TieredCache): per-process LRU in front of CACHES
+TIERED_CACHE = {
+    "LOCAL_SIZE": int(os.getenv("TIERED_CACHE_LOCAL_SIZE", "1024")),
+    # How long a process may serve an entry (or a version) another process has since invalidated
+    "LOCAL_TTL": float(os.getenv("TIERED_CACHE_LOCAL_TTL", "5")),
+    # Longest a miss waits for another process's build of the same key
+    "LOCK_TIMEOUT": float(os.getenv("TIERED_CACHE_LOCK_TIMEOUT", "5")),
+}
+
+# Prometheus exposition at /metrics (shared.metrics). Under gunicorn/Celery prefork also set
+# PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py defaults it) so all processes are aggregated.
+METRICS = {
+    # Scrapers send "Authorization: Bearer <token>"; /metrics is a 404 while unset (unless DEBUG)
+    "TOKEN": os.getenv("METRICS_TOKEN", ""),
+    # Hosts reported under their own `service` label; every other outbound host is "webhook"
+    "OUTBOUND_SERVICES": {"api.flutterwave.com": "flutterwave"},
+    # Port the Celery worker's main process serves its pool's metrics on (0: off)
+    "CELERY_PORT": int(os.getenv("METRICS_CELERY_PORT", "0")),
+}
+
+# Sampled request profiling (shared.profiling), read back at /api/admin/profiles
+REQUEST_PROFILING = {
+    "ENABLED": os.getenv("REQUEST_PROFILING", "false").lower() == "true",
+    "SAMPLE_RATE": float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0.01")),
+    "BUFFER_SIZE": int(os.getenv("REQUEST_PROFILING_BUFFER_SIZE", "500")),
+    # Same statement this many times in one request is reported as a likely N+1
+    "REPEAT_THRESHOLD": int(os.getenv("REQUEST_PROFILING_REPEAT_THRESHOLD", "5")),
+}
+
+# Outbound HTTP (shared.http): pooled sessions, timeouts and per-host circuit breakers
+OUTBOUND_HTTP = {
+    "CONNECT_TIMEOUT": float(os.getenv("OUTBOUND_CONNECT_TIMEOUT", "3.05")),
+    "READ_TIMEOUT": float(os.getenv("OUTBOUND_READ_TIMEOUT", "10")),
+    "POOL_MAXSIZE": int(os.getenv("OUTBOUND_POOL_MAXSIZE", "10")),
+    "BREAKER_FAILURES": int(os.getenv("OUTBOUND_BREAKER_FAILURES", "5")),
+    "BREAKER_RESET_SECONDS": float(os.getenv("OUTBOUND_BREAKER_RESET_SECONDS", "30")),
+    # Per-host sessions/breakers kept in an LRU; webhook hosts are tenant-supplied.
+    "MAX_HOSTS": int(os.getenv("OUTBOUND_MAX_HOSTS", "256")),
+}
+
+# Token auth cache (accounts.authentication). Off by default, the per-process LRU in front
+# of CACHES keeps accepting a logged-out token in other workers for up to LOCAL_TTL seconds.
+AUTH_TOKEN_CACHE = {
+    "LOCAL_SIZE": int(os.getenv("AUTH_TOKEN_LOCAL_SIZE", "1024")),
+    "LOCAL_TTL": float(os.getenv("AUTH_TOKEN_LOCAL_TTL", "0")),
+    "SHARED_TTL": int(os.getenv("AUTH_TOKEN_SHARED_TTL", "300")),
+}
+
+# Signed access tokens (accounts.tokens) and rotating refresh tokens (accounts.models.RefreshToken)
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", "900"))
+REFRESH_TOKEN_TTL = int(os.getenv("REFRESH_TOKEN_TTL", str(60 * 60 * 24 * 30)))
+
+# Failed password checks allowed per sliding window (accounts.throttling)
+LOGIN_THROTTLE = {
+    "IP_LIMIT": int(os.getenv("LOGIN_THROTTLE_IP_LIMIT", "30")),
+    "EMAIL_LIMIT": int(os.getenv("LOGIN_THROTTLE_EMAIL_LIMIT", "5")),
+    "WINDOW_SECONDS": int(os.getenv("LOGIN_THROTTLE_WINDOW_SECONDS", "300")),
+}
+
+# Seconds an onboarding checkout holds its coupon use before an unpaid hold is released
+COUPON_RESERVATION_SECONDS = int(os.getenv("COUPON_RESERVATION_SECONDS", str(60 * 60)))
+
+# How far behind its checkpoint each rollup pass rescans, so rows from transactions
+# that committed after the previous pass read are still counted (adminpanel.rollups).
+# Keep it above the longest transaction that writes leads or license events.
+ROLLUP_OVERLAP_SECONDS = int(os.getenv("ROLLUP_OVERLAP_SECONDS", str(15 * 60)))
+
+# Tries a payment webhook gets before it is dead-lettered (marketplace.tasks)
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "10"))
+
 # Celery / worker defaults (use Redis unless overridden)
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://redis:6379/0"))
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+CELERY_BEAT_SCHEDULE = {
+    # Incremental analytics rollups; only days touched since the last pass are rebuilt.
+    "refresh-daily-rollups": {
+        "task": "adminpanel.tasks.refresh_daily_rollups",
+        "schedule": float(os.getenv("ROLLUP_REFRESH_SECONDS", "300")),
+    },
+    # Abandoned resumable media uploads and their part files.
+    "purge-stale-uploads": {
+        "task": "adminpanel.tasks.purge_stale_uploads",
+        "schedule": 60.0 * 60,
+    },
+    # Coupon uses held by unpaid onboarding checkouts.
+    "release-expired-coupon-reservations": {
+        "task": "marketplace.tasks.release_expired_coupon_reservations",
+        "schedule": 60.0 * 5,
+    },
+    # Safety net for payment webhooks whose processing task was never delivered.
+    "sweep-unprocessed-webhooks": {
+        "task": "marketplace.tasks.sweep_unprocessed_webhooks",
+        "schedule": 60.0,
+    },
+}
 
 # API defaults
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "accounts.tokens.SignedTokenAuthentication",
+        "accounts.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.BasicAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -2,11 +2,13 @@ from django.contrib import admin
 from django.urls import path
 
 from marketplace import api as marketplace_api
+from marketplace import views as marketplace_views
 from accounts import api as accounts_api
 from adminpanel import api as admin_api
 from adminpanel import views as admin_views
 from rest_framework.routers import DefaultRouter
 from pricing import api as pricing_api
+from shared.metrics import metrics_view
 
 router = DefaultRouter()
 router.register("api/admin/tools", admin_api.AdminToolViewSet, basename="admin-tools")
@@ -19,6 +21,10 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     *router.urls,
     path("api/admin/upload", admin_views.MediaUploadView.as_view(), name="admin-media-upload"),
+    path("api/admin/media/<str:sha256>", admin_views.MediaAssetView.as_view(), name="admin-media-asset"),
+    path("api/admin/uploads", admin_views.UploadSessionCreateView.as_view(), name="admin-upload-sessions"),
+    path("api/admin/uploads/<uuid:pk>", admin_views.UploadSessionView.as_view(), name="admin-upload-session"),
+    path("api/admin/profiles", admin_views.RequestProfileView.as_view(), name="admin-request-profiles"),
     path("api/marketplace/tools", marketplace_api.ToolListView.as_view(), name="tool-list"),
     path("api/marketplace/tools/new", marketplace_api.ToolCreateView.as_view(), name="tool-create"),
     path(
@@ -36,15 +42,22 @@ urlpatterns = [
         marketplace_api.WidgetLeadCreateView.as_view(),
         name="widget-lead-create",
     ),
+    path("api/widget/bootstrap", marketplace_api.WidgetBootstrapView.as_view(), name="widget-bootstrap"),
     path("api/widget/config", marketplace_api.WidgetConfigView.as_view(), name="widget-config"),
     path("api/license/check", marketplace_api.LicenseCheckView.as_view(), name="license-check"),
     path("api/pricing/estimate", marketplace_api.PricingEstimateView.as_view(), name="pricing-estimate"),
     path("api/onboarding/start", marketplace_api.OnboardingStartView.as_view(), name="onboarding-start"),
     path("api/auth/login", accounts_api.LoginView.as_view(), name="auth-login"),
     path("api/auth/register", accounts_api.RegisterView.as_view(), name="auth-register"),
+    path("api/auth/token", accounts_api.TokenExchangeView.as_view(), name="auth-token"),
+    path("api/auth/token/refresh", accounts_api.TokenRefreshView.as_view(), name="auth-token-refresh"),
     path("api/auth/me", accounts_api.MeView.as_view(), name="auth-me"),
     path("api/auth/logout", accounts_api.LogoutView.as_view(), name="auth-logout"),
     path("api/materials", pricing_api.MaterialSettingBulkView.as_view(), name="materials-bulk"),
     path("api/payments/flutterwave/webhook", marketplace_api.FlutterwaveWebhookView.as_view(), name="flw-webhook"),
     path("api/tenant/origin", marketplace_api.TenantOriginView.as_view(), name="tenant-origin"),
+    path("metrics", metrics_view, name="metrics"),
+    path("widget/latest.js", marketplace_views.widget_latest_js, name="widget-latest-js"),
+    path("widget/latest.css", marketplace_views.widget_latest_css, name="widget-latest-css"),
+    path("widget/<str:name>", marketplace_views.widget_asset, name="widget-asset"),
 ]
@@ -0,0 +1,49 @@
+"""
+Production server settings.
+
+ASGI (default): uvicorn workers under gunicorn, so async views (onboarding, widget leads)
+await Flutterwave/webhook calls instead of holding a thread each:
+
+    gunicorn config.asgi:application -c gunicorn.conf.py
+
+WSGI fallback (``SERVER_MODE=wsgi``): threaded sync workers.
+
+    SERVER_MODE=wsgi gunicorn config.wsgi:application -c gunicorn.conf.py
+"""
+import multiprocessing
+import os
+
+# Workers write Prometheus samples here and /metrics adds them up (shared.metrics). Set
+# before any worker imports prometheus_client.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-web")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+
+if os.getenv("SERVER_MODE", "asgi") == "asgi":
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Recycle workers now and then so slow leaks can't accumulate; jitter avoids restarting all at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+accesslog = "-"
+# Restart workers when code changes; for local development only (GUNICORN_RELOAD=true docker compose up).
+reload = os.getenv("GUNICORN_RELOAD", "false").lower() == "true"
+
+
+def on_starting(server):
+    from shared.metrics import reset_multiprocess_dir
+
+    reset_multiprocess_dir()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
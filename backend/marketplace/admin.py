@@ -1,6 +1,22 @@
+from collections import Counter
+
 from django.contrib import admin
+from django.db import transaction
 
-from marketplace.models import License, MarketplaceLead, Tool, WidgetConfig, WidgetLead
+from marketplace.models import (
+    Coupon,
+    CouponRedemption,
+    CouponShard,
+    License,
+    LicenseEvent,
+    MarketplaceLead,
+    Tool,
+    WebhookEvent,
+    WidgetConfig,
+    WidgetLead,
+    drop_tenant_license_counters,
+)
+from marketplace.tasks import enqueue_webhook_events
 
 
 @admin.register(Tool)
@@ -13,10 +29,96 @@ class ToolAdmin(admin.ModelAdmin):
 
 @admin.register(License)
 class LicenseAdmin(admin.ModelAdmin):
+    """Status changes, creations and deletions are recorded in the ledger like any other transition."""
+
     list_display = ("tenant", "tool", "status", "plan", "starts_at", "expires_at")
     list_filter = ("status", "plan")
     search_fields = ("tenant__name", "tool__name")
 
+    def save_model(self, request, obj, form, change):
+        licenses = License.objects.filter(pk=obj.pk)
+        with transaction.atomic():
+            if not change:
+                super().save_model(request, obj, form, change)
+                LicenseEvent.objects.record(licenses, obj.status, source=LicenseEvent.Source.ADMIN, from_status="")
+                return
+            if "status" in form.changed_data:
+                LicenseEvent.objects.record(licenses, obj.status, source=LicenseEvent.Source.ADMIN)
+                if obj.status == License.Status.CANCELED:
+                    CouponRedemption.objects.release(licenses)
+                elif obj.status == License.Status.ACTIVE:
+                    CouponRedemption.objects.confirm(licenses)
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, License.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        # Cancel first so MRR and the status counters move, then drop the licenses from the totals.
+        with transaction.atomic():
+            licenses = License.objects.filter(pk__in=list(queryset.values_list("pk", flat=True)))
+            LicenseEvent.objects.record(licenses, License.Status.CANCELED, source=LicenseEvent.Source.ADMIN)
+            CouponRedemption.objects.release(licenses)
+            per_tenant = Counter(licenses.values_list("tenant_id", flat=True))
+            licenses.delete()
+            drop_tenant_license_counters(per_tenant)
+
+
+@admin.register(LicenseEvent)
+class LicenseEventAdmin(admin.ModelAdmin):
+    list_display = ("license", "from_status", "to_status", "price", "mrr_delta", "source", "occurred_at")
+    list_filter = ("to_status", "source")
+    search_fields = ("tenant__name", "tool__name")
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class CouponShardInline(admin.TabularInline):
+    model = CouponShard
+    extra = 0
+    readonly_fields = ("index", "used", "capacity")
+    can_delete = False
+
+
+@admin.register(Coupon)
+class CouponAdmin(admin.ModelAdmin):
+    list_display = ("code", "tool", "percent_off", "usage_limit", "starts_on", "ends_on", "is_active")
+    list_filter = ("is_active",)
+    search_fields = ("code", "tool__name")
+    inlines = [CouponShardInline]
+
+
+@admin.register(CouponRedemption)
+class CouponRedemptionAdmin(admin.ModelAdmin):
+    list_display = ("coupon", "license", "tenant", "percent_off", "redeemed_at", "released_at")
+    search_fields = ("coupon__code", "tenant__name")
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "provider", "event_key", "tx_ref", "status", "received_at", "processed_at", "attempts", "dead_lettered_at"
+    )
+    list_filter = ("provider", "status", ("dead_lettered_at", admin.EmptyFieldListFilter))
+    search_fields = ("event_key", "tx_ref")
+    readonly_fields = ("payload",)
+    actions = ["requeue"]
+
+    @admin.action(description="Requeue dead-lettered events")
+    def requeue(self, request, queryset):
+        events = queryset.filter(processed_at__isnull=True, dead_lettered_at__isnull=False)
+        ids = list(events.values_list("pk", flat=True))
+        events.update(dead_lettered_at=None, attempts=0, last_error="")
+        enqueue_webhook_events(ids)
+        self.message_user(request, f"Requeued {len(ids)} event(s).")
+
 
 @admin.register(WidgetConfig)
 class WidgetConfigAdmin(admin.ModelAdmin):
@@ -5,33 +5,104 @@ import uuid
 from decimal import Decimal
 from typing import Any
 
-import requests
-from django.http import Http404
-from django.utils.text import slugify
+from asgiref.sync import sync_to_async
+from django.core.validators import slug_re
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, HttpResponseNotModified
 from rest_framework import generics, permissions, serializers, status
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from datetime import datetime
 
+from adminpanel.images import srcset_for_url, srcsets_for_urls
+from marketplace.catalog import HEAVY_FIELDS, cached_blob, parse_expand
 from marketplace.models import (
+    Coupon,
+    CouponRedemption,
     License,
+    LicenseEvent,
     MarketplaceLead,
     Tool,
+    WebhookEvent,
     WidgetConfig,
     WidgetLead,
+    prefetch_active_coupons,
 )
 from django.conf import settings
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
+from django.utils.timezone import now
 from django.views.decorators.csrf import csrf_exempt
 
-from marketplace.permissions import HasActiveLicense
+from marketplace.permissions import HasActiveLicense, IsTenantMember
+from marketplace.tasks import process_flutterwave_event
+from marketplace.webhooks import flutterwave_fields
+from marketplace.widget import CACHE_CONTROL, bootstrap_blob, config_blob, tenant_defaults
 from pricing.models import MaterialSetting
+from shared.api import AsyncAPIView
+from shared.db import ReplicaReadMixin
+from shared.http import outbound
 from shared.tenant import Tenant
-from shared.utils import apply_rate_from_settings, calculate_actual_area
+from shared.utils import apply_rate_from_settings, calculate_actual_area, etag_matches
 
 
-class ToolSerializer(serializers.ModelSerializer):
+class CouponFieldsMixin(serializers.Serializer):
+    """
+    Keeps the flat ``coupon_*`` keys of the tool payload on top of ``Coupon``: reads come
+    from ``Tool.primary_coupon`` and writes upsert it. Clearing ``coupon_code`` retires it.
+    """
+
+    coupon_code = serializers.CharField(source="primary_coupon.code", required=False, allow_blank=True, allow_null=True)
+    coupon_percent_off = serializers.DecimalField(
+        source="primary_coupon.percent_off", max_digits=5, decimal_places=2, required=False, allow_null=True
+    )
+    coupon_start = serializers.DateField(source="primary_coupon.starts_on", required=False, allow_null=True)
+    coupon_end = serializers.DateField(source="primary_coupon.ends_on", required=False, allow_null=True)
+    coupon_usage_limit = serializers.IntegerField(
+        source="primary_coupon.usage_limit", min_value=0, required=False, allow_null=True
+    )
+    coupon_usage_count = serializers.IntegerField(source="primary_coupon.redeemed", read_only=True, allow_null=True)
+    coupon_tenant = serializers.PrimaryKeyRelatedField(
+        source="primary_coupon.tenant", queryset=Tenant.objects.all(), required=False, allow_null=True
+    )
+
+    def create(self, validated_data):
+        coupon_data = validated_data.pop("primary_coupon", None)
+        tool = super().create(validated_data)
+        self._save_coupon(tool, coupon_data)
+        return tool
+
+    def update(self, instance, validated_data):
+        coupon_data = validated_data.pop("primary_coupon", None)
+        tool = super().update(instance, validated_data)
+        self._save_coupon(tool, coupon_data)
+        return tool
+
+    def _save_coupon(self, tool: Tool, data: dict | None) -> None:
+        if data is None:
+            return
+        current = tool.primary_coupon
+        code = data.get("code", current.code if current else "") or ""
+        if current and current.code != code:
+            current.is_active = False
+            current.save()
+        if code:
+            coupon = current if current and current.code == code else None
+            coupon = coupon or Coupon.objects.filter(tool=tool, code=code).first() or Coupon(tool=tool, code=code)
+            blank = {"percent_off": Decimal("0.00"), "usage_limit": 0}
+            for field, value in data.items():
+                if field != "code":
+                    setattr(coupon, field, blank.get(field) if value is None else value)
+            coupon.is_active = True
+            coupon.save()
+        tool.__dict__.pop("active_coupons", None)
+
+
+class ToolSerializer(CouponFieldsMixin, serializers.ModelSerializer):
+    icon_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Tool
         fields = [
@@ -40,6 +111,7 @@ class ToolSerializer(serializers.ModelSerializer):
             "name",
             "summary",
             "icon_url",
+            "icon_srcset",
             "media_url",
             "price_monthly",
             "config_schema",
@@ -53,6 +125,13 @@ class ToolSerializer(serializers.ModelSerializer):
             "coupon_tenant",
         ]
 
+    def get_icon_srcset(self, obj: Tool) -> dict:
+        """Per-format srcset of the icon's resized variants; list views batch these into ``context["srcsets"]``."""
+        srcsets = self.context.get("srcsets")
+        if srcsets is not None:
+            return srcsets.get(obj.icon_url, {})
+        return srcset_for_url(obj.icon_url)
+
 
 class MarketplaceLeadSerializer(serializers.ModelSerializer):
     class Meta:
@@ -94,18 +173,61 @@ class PricingRequestSerializer(serializers.Serializer):
     )
 
 
+def _blob_response(request, blob) -> HttpResponse:
+    if etag_matches(request.headers.get("If-None-Match", ""), blob.etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(blob.body, content_type="application/json")
+    response["ETag"] = blob.etag
+    response["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
 class ToolListView(generics.ListAPIView):
-    queryset = Tool.objects.filter(is_active=True)
+    """
+    The catalog, rendered once per catalog version (``marketplace.catalog``). The list
+    leaves out ``config_schema``/``bento_features`` unless named in ``?expand=`` (or ``all``).
+    """
+
+    queryset = Tool.objects.filter(is_active=True).prefetch_related(prefetch_active_coupons())
     serializer_class = ToolSerializer
     permission_classes = [permissions.AllowAny]
+    authentication_classes: list = []
+
+    def list(self, request, *args, **kwargs):
+        expand = parse_expand(request.query_params.get("expand", ""))
+        omitted = [name for name in HEAVY_FIELDS if name not in expand]
+
+        def build() -> bytes:
+            tools = list(self.get_queryset().defer(*omitted))
+            context = self.get_serializer_context() | {"srcsets": srcsets_for_urls(tool.icon_url for tool in tools)}
+            serializer = self.get_serializer(tools, many=True, context=context)
+            for name in omitted:
+                serializer.child.fields.pop(name)
+            return JSONRenderer().render(serializer.data)
+
+        return _blob_response(request, cached_blob(f"list:{','.join(expand)}", build))
 
 
 class ToolDetailView(generics.RetrieveAPIView):
-    queryset = Tool.objects.filter(is_active=True)
+    queryset = Tool.objects.filter(is_active=True).prefetch_related(prefetch_active_coupons())
     serializer_class = ToolSerializer
     permission_classes = [permissions.AllowAny]
+    authentication_classes: list = []
     lookup_field = "slug"
 
+    def retrieve(self, request, *args, **kwargs):
+        slug = kwargs[self.lookup_field]
+
+        def build() -> bytes | None:
+            tool = self.get_queryset().filter(slug=slug).first()
+            return JSONRenderer().render(self.get_serializer(tool).data) if tool else None
+
+        blob = cached_blob(f"tool:{slug}", build) if len(slug) <= 50 else None
+        if blob is None:
+            raise Http404("No Tool matches the given query.")
+        return _blob_response(request, blob)
+
 
 class MarketplaceLeadCreateView(generics.CreateAPIView):
     serializer_class = MarketplaceLeadSerializer
@@ -131,9 +253,9 @@ class WidgetLeadPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class WidgetLeadCreateView(generics.ListCreateAPIView):
+class WidgetLeadCreateView(ReplicaReadMixin, AsyncAPIView, generics.ListCreateAPIView):
     serializer_class = WidgetLeadSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsTenantMember]
     pagination_class = WidgetLeadPagination
 
     def get_queryset(self):
@@ -158,78 +280,86 @@ class WidgetLeadCreateView(generics.ListCreateAPIView):
             pass
         return qs
 
-    def perform_create(self, serializer):
-        tenant = getattr(self.request, "tenant", None)
-        if tenant is None:
+    async def post(self, request, *args, **kwargs):
+        """Stores the lead, then forwards it to the tenant's webhook without holding a thread."""
+        if getattr(request, "tenant", None) is None:
             raise Http404("Tenant not found for this widget request.")
-        lead = serializer.save(tenant=tenant)
-        webhook = getattr(tenant, "n8n_webhook_url", "") or getattr(tenant, "domain", "")
+        data, webhook, payload = await sync_to_async(self._create_lead)(request)
         if webhook and webhook.startswith("http"):
             try:
-                requests.post(
-                    webhook,
-                    json={
-                        "full_name": lead.full_name,
-                        "email": lead.email,
-                        "phone": lead.phone,
-                        "address": lead.address,
-                        "estimate_amount": str(lead.estimate_amount),
-                        "tool": lead.tool.slug if lead.tool else None,
-                    },
-                    timeout=5,
-                )
+                await outbound.apost(webhook, json=payload, timeout=5)
             except Exception:
                 pass
+        return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data))
+
+    def _create_lead(self, request) -> tuple[dict, str, dict]:
+        tenant = request.tenant
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lead = serializer.save(tenant=tenant)
+        webhook = getattr(tenant, "n8n_webhook_url", "") or getattr(tenant, "domain", "")
+        payload = {
+            "full_name": lead.full_name,
+            "email": lead.email,
+            "phone": lead.phone,
+            "address": lead.address,
+            "estimate_amount": str(lead.estimate_amount),
+            "tool": lead.tool.slug if lead.tool else None,
+        }
+        return serializer.data, webhook, payload
 
 
 class WidgetConfigView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    """
+    GET is public and served from the precomputed per-tenant blob (``marketplace.widget``)
+    with a strong ETag, so revalidations answer 304 without a query. PUT stays authenticated.
+    """
+
+    def get_permissions(self):
+        if self.request.method in ("GET", "HEAD"):
+            return [permissions.AllowAny()]
+        return [IsTenantMember()]
+
+    def perform_authentication(self, request):
+        # Anonymous reads shouldn't touch the session/token tables or add Vary: Cookie.
+        if request.method not in ("GET", "HEAD"):
+            super().perform_authentication(request)
 
     def get(self, request, *args, **kwargs):
-        tenant = getattr(request, "tenant", None)
-        if tenant is None:
-            # Fallback default palette for public preview
-            data = {
-                "primary_color": "#0A0F1A",
-                "secondary_color": "#1F6BFF",
-                "theme": "frosted",
-                "logo_url": "",
-                "mark_text": "neX",
-                "marketing_hook": "See Your Roof from Space & Get a Technical Estimate in 60 Seconds.",
-            }
-            return Response(data)
-
-        config, _ = WidgetConfig.objects.get_or_create(
-            tenant=tenant,
-            defaults={
-                "primary_color": tenant.primary_color,
-                "secondary_color": tenant.secondary_color,
-                "theme": tenant.widget_theme,
-                "logo_url": tenant.brand_logo_url,
-                "marketing_hook": "See Your Roof from Space & Get a Technical Estimate in 60 Seconds.",
-            },
-        )
-        return Response(WidgetConfigSerializer(config).data)
+        response = _blob_response(request, config_blob(getattr(request, "tenant", None)))
+        patch_vary_headers(response, ["X-Tenant-ID"])
+        return response
 
     def put(self, request, *args, **kwargs):
         tenant = getattr(request, "tenant", None)
         if tenant is None:
             raise Http404("Tenant not found for update.")
-        config, _ = WidgetConfig.objects.get_or_create(
-            tenant=tenant,
-            defaults={
-                "primary_color": tenant.primary_color,
-                "secondary_color": tenant.secondary_color,
-                "theme": tenant.widget_theme,
-                "logo_url": tenant.brand_logo_url,
-            },
-        )
+        config, _ = WidgetConfig.objects.get_or_create(tenant=tenant, defaults=tenant_defaults(tenant))
         serializer = WidgetConfigSerializer(config, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
 
 
+class WidgetBootstrapView(APIView):
+    """
+    One request for the embed's startup state: theme, license status and the tool's
+    material names, served from cached per-tenant data with the same caching headers
+    as the config.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    authentication_classes: list = []
+
+    def get(self, request, *args, **kwargs):
+        tool_slug = request.query_params.get("tool", "")
+        if len(tool_slug) > 50 or not slug_re.match(tool_slug):
+            return Response({"detail": "tool must be a slug"}, status=status.HTTP_400_BAD_REQUEST)
+        response = _blob_response(request, bootstrap_blob(getattr(request, "tenant", None), tool_slug))
+        patch_vary_headers(response, ["X-Tenant-ID"])
+        return response
+
+
 class LicenseCheckView(APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -295,18 +425,32 @@ class OnboardingStartSerializer(serializers.Serializer):
     coupon_code = serializers.CharField(required=False, allow_blank=True)
 
 
-class OnboardingStartView(APIView):
+class OnboardingStartView(AsyncAPIView):
     """
     Creates a tenant + contractor + license for new users, or adds a license for existing tenants.
-    Returns a placeholder payment_url (to be swapped with real checkout).
+    Returns a placeholder payment_url (to be swapped with real checkout). The DB work runs in
+    one thread hop; the Flutterwave call is awaited.
     """
 
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         serializer = OnboardingStartSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
+        tenant, tool, license_obj, discount = await sync_to_async(self._start)(data)
+        payment_url = await self._create_flutterwave_link(tenant, tool, data["email"], discount)
+        return Response(
+            {
+                "tenant_id": str(tenant.id),
+                "license_id": str(license_obj.id),
+                "status": license_obj.status,
+                "payment_url": payment_url,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    def _start(self, data: dict) -> tuple[Tenant, Tool, License, Decimal]:
         tool_slug = data["tool"]
         tool = Tool.objects.filter(slug=tool_slug, is_active=True).first()
         if not tool:
@@ -320,32 +464,34 @@ class OnboardingStartView(APIView):
         else:
             if not data.get("tenant_name") or not data.get("full_name"):
                 raise serializers.ValidationError("tenant_name and full_name are required for new accounts.")
-            slug_base = slugify(data["tenant_name"])
-            slug_candidate = slug_base
-            idx = 1
-            while Tenant.objects.filter(slug=slug_candidate).exists():
-                idx += 1
-                slug_candidate = f"{slug_base}-{idx}"
-            tenant = Tenant.objects.create(name=data["tenant_name"], slug=slug_candidate)
-
-        discount, coupon_ok = self._apply_coupon(tool, tenant, data.get("coupon_code"))
-        metadata = {"coupon_code": data.get("coupon_code")} if coupon_ok else {}
-        license_obj, _ = License.objects.get_or_create(
-            tenant=tenant, tool=tool, defaults={"status": License.Status.PENDING, "metadata": metadata}
-        )
-
-        payment_url = self._create_flutterwave_link(tenant, tool, data["email"], discount)
-        return Response(
-            {
-                "tenant_id": str(tenant.id),
-                "license_id": str(license_obj.id),
-                "status": license_obj.status,
-                "payment_url": payment_url,
-            },
-            status=status.HTTP_201_CREATED,
-        )
+            tenant = Tenant.objects.create_with_unique_slug(data["tenant_name"])
 
-    def _create_flutterwave_link(self, tenant, tool, email: str, discount: Decimal) -> str:
+        coupon = self._valid_coupon(tool, tenant, data.get("coupon_code"))
+        with transaction.atomic():
+            license_obj, created = License.objects.get_or_create(
+                tenant=tenant, tool=tool, defaults={"status": License.Status.PENDING}
+            )
+            if created:
+                # Claim the coupon before the opening event so the ledger prices it discounted.
+                redemption = (
+                    CouponRedemption.objects.redeem(coupon, license_obj, expires_in=settings.COUPON_RESERVATION_SECONDS)
+                    if coupon
+                    else None
+                )
+                LicenseEvent.objects.record(
+                    License.objects.filter(pk=license_obj.pk),
+                    License.Status.PENDING,
+                    source=LicenseEvent.Source.ONBOARDING,
+                    from_status="",
+                )
+            else:
+                redemption = license_obj.coupon_redemptions.filter(released_at__isnull=True).first()
+        discount = Decimal("0.00")
+        if redemption:
+            discount = (tool.price_monthly or Decimal("0.00")) * redemption.percent_off / 100
+        return tenant, tool, license_obj, discount
+
+    async def _create_flutterwave_link(self, tenant, tool, email: str, discount: Decimal) -> str:
         secret = os.getenv("FLW_SECRET_KEY")
         callback = os.getenv("FLW_CALLBACK_URL", "")
         if not secret:
@@ -362,11 +508,10 @@ class OnboardingStartView(APIView):
             "customizations": {"title": f"{tool.name} Subscription", "description": f"Tenant {tenant.name}"},
         }
         try:
-            resp = requests.post(
+            resp = await outbound.apost(
                 "https://api.flutterwave.com/v3/payments",
                 headers={"Authorization": f"Bearer {secret}"},
                 json=payload,
-                timeout=10,
             )
             resp.raise_for_status()
             data = resp.json()
@@ -374,54 +519,61 @@ class OnboardingStartView(APIView):
         except Exception:
             return f"https://checkout.flutterwave.com/{tx_ref}"
 
-    def _apply_coupon(self, tool: Tool, tenant: Tenant, code: str | None):
-        if not code or code != tool.coupon_code:
-            return Decimal("0.00"), False
-        today = datetime.utcnow().date()
-        if tool.coupon_start and today < tool.coupon_start:
-            return Decimal("0.00"), False
-        if tool.coupon_end and today > tool.coupon_end:
-            return Decimal("0.00"), False
-        if tool.coupon_tenant and tool.coupon_tenant != tenant:
-            return Decimal("0.00"), False
-        if tool.coupon_usage_limit and tool.coupon_usage_count >= tool.coupon_usage_limit:
-            return Decimal("0.00"), False
-        discount = (tool.price_monthly or Decimal("0.00")) * (tool.coupon_percent_off or Decimal("0.00")) / 100
-        return discount, True
+    def _valid_coupon(self, tool: Tool, tenant: Tenant, code: str | None) -> Coupon | None:
+        if not code:
+            return None
+        coupon = Coupon.objects.lookup(tool.pk, code)
+        if coupon is None or not coupon.is_valid_for(tenant, datetime.utcnow().date()):
+            return None
+        return coupon
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class FlutterwaveWebhookView(APIView):
+    """
+    Stores the delivery and acknowledges immediately; a worker applies it. Provider
+    retries collide on the unique event key and are dropped without further work.
+    """
+
     permission_classes = [permissions.AllowAny]
+    authentication_classes: list = []
 
     def post(self, request, *args, **kwargs):
-        data = request.data
-        status_str = data.get("status")
-        tx_ref = data.get("tx_ref") or ""
+        payload = request.data if isinstance(request.data, dict) else {}
+        event_key, tx_ref, status_str = flutterwave_fields(payload)
         if not tx_ref:
             return Response({"detail": "missing tx_ref"}, status=status.HTTP_400_BAD_REQUEST)
 
-        parts = tx_ref.split("-")
-        tenant_id = parts[0] if parts else None
-        tool_slug = parts[1] if len(parts) > 1 else None
+        try:
+            with transaction.atomic():
+                # Stamped as queued in the same INSERT; the task is sent right after commit.
+                queued_at = now()
+                event = WebhookEvent.objects.create(
+                    provider="flutterwave",
+                    event_key=event_key,
+                    tx_ref=tx_ref,
+                    status=status_str,
+                    payload=payload,
+                    enqueued_at=queued_at,
+                    next_attempt_at=queued_at,
+                )
+        except IntegrityError:
+            return Response({"detail": "duplicate"}, status=status.HTTP_200_OK)
+
+        transaction.on_commit(lambda: _enqueue_webhook(event.pk))
+        return Response({"detail": "accepted"}, status=status.HTTP_200_OK)
 
-        if status_str == "successful" and tenant_id and tool_slug:
-            licenses = License.objects.filter(tenant_id=tenant_id, tool__slug=tool_slug)
-            licenses.update(status=License.Status.ACTIVE)
-            tool = Tool.objects.filter(slug=tool_slug).first()
-            for lic in licenses:
-                if tool and tool.coupon_code and lic.metadata.get("coupon_code") == tool.coupon_code:
-                    if tool.coupon_usage_limit == 0 or tool.coupon_usage_count < tool.coupon_usage_limit:
-                        tool.coupon_usage_count = (tool.coupon_usage_count or 0) + 1
-                        tool.save(update_fields=["coupon_usage_count"])
-            return Response({"detail": "license activated"}, status=status.HTTP_200_OK)
 
-        License.objects.filter(tenant_id=tenant_id, tool__slug=tool_slug).update(status=License.Status.CANCELED)
-        return Response({"detail": "license canceled"}, status=status.HTTP_200_OK)
+def _enqueue_webhook(event_id: int) -> None:
+    try:
+        process_flutterwave_event.delay(event_id)
+    except Exception:
+        # Broker unavailable: the event stays unprocessed and the sweeper task retries it.
+        pass
 
 
 class TenantOriginView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsTenantMember]
 
     def post(self, request, *args, **kwargs):
         tenant = getattr(request, "tenant", None)
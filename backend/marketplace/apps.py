@@ -5,3 +5,16 @@ class MarketplaceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "marketplace"
     verbose_name = "Marketplace"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from marketplace.models import License, WidgetConfig
+        from marketplace.widget import rebuild_config_blob, retire_widget_payloads
+        from pricing.models import MaterialSetting
+
+        post_save.connect(rebuild_config_blob, sender=WidgetConfig, dispatch_uid="widget:WidgetConfig")
+        post_delete.connect(retire_widget_payloads, sender=WidgetConfig, dispatch_uid="widget:WidgetConfig")
+        for model in (License, MaterialSetting):
+            post_save.connect(retire_widget_payloads, sender=model, dispatch_uid=f"widget:{model.__name__}")
+            post_delete.connect(retire_widget_payloads, sender=model, dispatch_uid=f"widget:{model.__name__}")
@@ -0,0 +1,143 @@
+"""
+Content-hashed, precompressed copies of the widget bundle.
+
+``manage.py build_widget_assets`` copies the Vite output into ``WIDGET_ASSETS_ROOT`` as
+``nex-widget.<hash>.js`` / ``style.<hash>.css`` next to ``.br`` and ``.gz`` variants and a
+``manifest.json``. Hashed names never change content, so they are served with a one-year
+immutable Cache-Control; ``/widget/latest.js`` is a short-lived redirect to the current one.
+Older builds are left in place so pages that resolved ``latest`` before a deploy keep working.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - .br variants are skipped without the package
+    brotli = None
+
+# Logical name -> file produced by ``npm run build:widget``.
+SOURCES = {"nex-widget.js": "nex-widget.iife.js", "style.css": "style.css"}
+CONTENT_TYPES = {".js": "application/javascript; charset=utf-8", ".css": "text/css; charset=utf-8"}
+# Preferred first; the identity file is the fallback.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+HASHED_NAME = re.compile(r"^[a-z0-9-]+\.[0-9a-f]{12}\.(js|css)$")
+MANIFEST = "manifest.json"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+LATEST_CACHE_CONTROL = "public, max-age=300"
+
+
+def assets_root() -> Path:
+    return Path(getattr(settings, "WIDGET_ASSETS_ROOT", settings.BASE_DIR / "widget_assets"))
+
+
+def dist_dir() -> Path:
+    return Path(getattr(settings, "WIDGET_DIST_DIR", settings.BASE_DIR.parent / "widget" / "dist"))
+
+
+def _hashed_name(logical: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(logical)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def build(source_dir: Optional[Path] = None, target_dir: Optional[Path] = None) -> dict:
+    """Write hashed + compressed copies of every bundle file and return the new manifest."""
+    source_dir = Path(source_dir or dist_dir())
+    target_dir = Path(target_dir or assets_root())
+    target_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for logical, filename in SOURCES.items():
+        data = (source_dir / filename).read_bytes()
+        name = _hashed_name(logical, data)
+        path = target_dir / name
+        if not path.exists():
+            _write(path, data)
+        encodings = []
+        gz_path = path.with_name(name + ".gz")
+        if not gz_path.exists():
+            _write(gz_path, gzip.compress(data, compresslevel=9, mtime=0))
+        encodings.append("gzip")
+        if brotli is not None:
+            br_path = path.with_name(name + ".br")
+            if not br_path.exists():
+                _write(br_path, brotli.compress(data, quality=11))
+            encodings.append("br")
+        manifest[logical] = {"name": name, "size": len(data), "encodings": encodings}
+    # The manifest flips last, so ``latest`` never points at a file that isn't written yet.
+    _write(target_dir / MANIFEST, json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+_manifest_cache: dict = {"mtime": None, "data": {}}
+
+
+def manifest() -> dict:
+    """The current manifest, re-read only when the file changes on disk."""
+    try:
+        mtime = (assets_root() / MANIFEST).stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _manifest_cache["mtime"] != mtime:
+        _manifest_cache["data"] = json.loads((assets_root() / MANIFEST).read_text())
+        _manifest_cache["mtime"] = mtime
+    return _manifest_cache["data"]
+
+
+def latest_name(logical: str) -> Optional[str]:
+    entry = manifest().get(logical)
+    return entry["name"] if entry else None
+
+
+@dataclass(frozen=True)
+class AssetFile:
+    path: Path
+    content_type: str
+    encoding: Optional[str]
+    etag: str
+
+
+def _accepts(header: str, coding: str) -> bool:
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() != coding:
+            continue
+        q = params.strip().lower()
+        if not q.startswith("q="):
+            return True
+        try:
+            return float(q[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def resolve(name: str, accept_encoding: str) -> Optional[AssetFile]:
+    """Best on-disk variant of a hashed asset for the client's ``Accept-Encoding``."""
+    if not HASHED_NAME.match(name):
+        return None
+    path = assets_root() / name
+    if not path.is_file():
+        return None
+    content_type = CONTENT_TYPES[path.suffix]
+    digest = name.rsplit(".", 2)[1]
+    for coding, suffix in ENCODINGS:
+        variant = path.with_name(name + suffix)
+        if _accepts(accept_encoding, coding) and variant.is_file():
+            return AssetFile(variant, content_type, coding, f'"{digest}-{coding}"')
+    return AssetFile(path, content_type, None, f'"{digest}"')
@@ -0,0 +1,51 @@
+"""
+Rendered marketplace catalog.
+
+The tool list and each tool's detail are public, unpaginated and change about once a
+week, so their JSON is rendered once into bytes and cached in the versioned ``catalog``
+namespace. Saving or deleting a ``Tool`` or ``Coupon``, or a redemption that uses up a
+limited coupon or frees one again, bumps the version, which retires every rendered entry
+at once; the old keys simply age out. Other redemptions leave ``coupon_usage_count``
+stale for up to ``CATALOG_TTL``.
+"""
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from django.db import transaction
+
+from marketplace.widget import ConfigBlob
+from shared.cache import TieredCache
+
+# Safety net for writes that bypass bump_catalog_version() (queryset updates, raw SQL).
+CATALOG_TTL = 60 * 60
+# JSON columns left out of the list unless asked for with ``?expand=``.
+HEAVY_FIELDS = ("config_schema", "bento_features")
+
+catalog_cache = TieredCache("catalog", ttl=CATALOG_TTL, versioned=True)
+
+
+def bump_catalog_version() -> None:
+    """Retire every rendered catalog entry once the current transaction commits."""
+    transaction.on_commit(catalog_cache.bump)
+
+
+def parse_expand(raw: str) -> tuple[str, ...]:
+    """Heavy fields requested with ``?expand=a,b`` (or ``all``), in canonical order."""
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    if "all" in requested:
+        return HEAVY_FIELDS
+    return tuple(name for name in HEAVY_FIELDS if name in requested)
+
+
+def cached_blob(name: str, build: Callable[[], Optional[bytes]]) -> Optional[ConfigBlob]:
+    """
+    ``name``'s rendered bytes at the current catalog version; ``build`` runs on a miss.
+    A ``None`` build (unknown tool) is cached too, so 404 probes don't reach the DB.
+    """
+
+    def render() -> Optional[ConfigBlob]:
+        body = build()
+        return ConfigBlob.from_body(body) if body is not None else None
+
+    return catalog_cache.get_or_set(name, render)
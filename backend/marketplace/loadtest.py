@@ -0,0 +1,345 @@
+"""
+Load-test harness: seeded multi-tenant fixtures and a traffic replayer.
+
+``manage.py seed_loadtest`` creates ``loadtest-NNNN`` tenants. Each gets an owner login,
+an active license for one tool, materials, a widget config, some leads, and a webhook
+pointing at the stand-in receiver. ``manage.py loadtest`` then runs ``--users`` virtual
+users against a running server for ``--duration`` seconds. Each user repeatedly picks a
+session by weight: a homeowner on the embed, a contractor on the dashboard, or an admin.
+The receiver runs in the same process and answers the tenant webhooks, optionally after
+a delay, so the lead path includes a realistic third-party call.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+import httpx
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from accounts.models import Contractor
+from marketplace.models import License, LicenseEvent, Tool, WidgetConfig, WidgetLead
+from pricing.models import MaterialSetting
+from shared.tenant import Tenant
+
+SLUG_PREFIX = "loadtest-"
+ADMIN_EMAIL = "admin@loadtest.invalid"
+PASSWORD = "loadtest"
+MATERIALS = (("Asphalt Shingle", "3.10", "1.90"), ("Standing Seam Metal", "7.40", "3.20"), ("Clay Tile", "9.80", "4.10"))
+# Share of sessions per kind; widget sessions dominate real traffic.
+DEFAULT_MIX = {"widget": 85, "dashboard": 12, "admin": 3}
+
+
+# -- fixtures --------------------------------------------------------------------
+
+
+def seed(tenants: int, tool_slug: str, webhook_url: str, leads_per_tenant: int, reset: bool = False) -> dict:
+    """Create (or top up) the load-test tenants; safe to re-run."""
+    if reset:
+        Contractor.objects.filter(tenant__slug__startswith=SLUG_PREFIX).delete()
+        Tenant.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+    tool, _ = Tool.objects.get_or_create(
+        slug=tool_slug, defaults={"name": "Load-test Estimator", "price_monthly": Decimal("99.00")}
+    )
+    plans = [choice for choice, _ in Tenant.Plan.choices]
+    for index in range(tenants):
+        slug = f"{SLUG_PREFIX}{index:04d}"
+        with transaction.atomic():
+            tenant, _ = Tenant.objects.update_or_create(
+                slug=slug,
+                defaults={
+                    "name": f"Load Test Roofing {index:04d}",
+                    "plan": plans[index % len(plans)],
+                    "n8n_webhook_url": f"{webhook_url.rstrip('/')}/{slug}",
+                },
+            )
+            email = f"owner@{slug}.invalid"
+            if not Contractor.objects.filter(email=email).exists():
+                Contractor.objects.create_user(email, PASSWORD, tenant=tenant, full_name=f"Owner {index:04d}")
+            license, created = License.objects.get_or_create(
+                tenant=tenant, tool=tool, defaults={"status": License.Status.ACTIVE}
+            )
+            if created:
+                # Through the ledger like any other new license, so MRR and the tenant counters match.
+                LicenseEvent.objects.record(
+                    License.objects.filter(pk=license.pk),
+                    License.Status.ACTIVE,
+                    source=LicenseEvent.Source.BACKFILL,
+                    from_status="",
+                )
+            for name, material_rate, labor_rate in MATERIALS:
+                MaterialSetting.objects.get_or_create(
+                    tenant=tenant,
+                    tool=tool,
+                    name=name,
+                    defaults={"material_rate": Decimal(material_rate), "labor_rate": Decimal(labor_rate)},
+                )
+            WidgetConfig.objects.get_or_create(tenant=tenant, defaults={"mark_text": f"LT{index:04d}"})
+            missing = leads_per_tenant - WidgetLead.objects.filter(tenant=tenant).count()
+            WidgetLead.objects.bulk_create(
+                WidgetLead(
+                    tenant=tenant,
+                    tool=tool,
+                    full_name=f"Homeowner {n}",
+                    email=f"homeowner{n}@{slug}.invalid",
+                    address=f"{n} Load Test Lane",
+                    ground_area=Decimal("1800.00"),
+                    pitch=Decimal("6.00"),
+                )
+                for n in range(max(missing, 0))
+            )
+    if not Contractor.objects.filter(email=ADMIN_EMAIL).exists():
+        Contractor.objects.create_superuser(ADMIN_EMAIL, PASSWORD, full_name="Load-test Admin")
+    return {"tenants": Tenant.objects.filter(slug__startswith=SLUG_PREFIX).count(), "tool": tool.slug}
+
+
+def load_fixtures(tool_slug: str) -> dict:
+    """Seeded tenants (id, owner token, material names), the tool's id and the admin token."""
+    materials = defaultdict(list)
+    for tenant_id, name in MaterialSetting.objects.filter(
+        tenant__slug__startswith=SLUG_PREFIX, tool__slug=tool_slug
+    ).values_list("tenant_id", "name"):
+        materials[tenant_id].append(name)
+    tenants = []
+    for owner in Contractor.objects.filter(tenant__slug__startswith=SLUG_PREFIX).select_related("tenant"):
+        token, _ = Token.objects.get_or_create(user=owner)
+        tenants.append({"id": str(owner.tenant_id), "token": token.key, "materials": materials[owner.tenant_id]})
+    admin = Contractor.objects.filter(email=ADMIN_EMAIL).first()
+    admin_token = Token.objects.get_or_create(user=admin)[0].key if admin else ""
+    tool_id = Tool.objects.filter(slug=tool_slug).values_list("id", flat=True).first()
+    return {"tenants": tenants, "admin_token": admin_token, "tool_id": str(tool_id) if tool_id else ""}
+
+
+# -- measurement -----------------------------------------------------------------
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class Stats:
+    latencies: dict = field(default_factory=lambda: defaultdict(list))
+    errors: dict = field(default_factory=lambda: defaultdict(int))
+    statuses: dict = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    webhooks: int = 0
+
+    def record(self, endpoint: str, seconds: float, status: Optional[int]) -> None:
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status or "error"] += 1
+        if status is None or status >= 400:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> list[dict]:
+        rows = []
+        for endpoint, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            rows.append(
+                {
+                    "endpoint": endpoint,
+                    "requests": len(ordered),
+                    "rps": round(len(ordered) / elapsed, 1),
+                    "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+                    "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+                    "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+                    "error_pct": round(100 * self.errors[endpoint] / len(ordered), 2),
+                    "statuses": {str(code): n for code, n in sorted(self.statuses[endpoint].items(), key=str)},
+                }
+            )
+        return rows
+
+
+# -- traffic ---------------------------------------------------------------------
+
+
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    stats: Stats
+    tenants: list[dict]
+    admin_token: str
+    tool: str
+    tool_id: str
+    think: float
+
+    async def call(self, method: str, path: str, endpoint: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(endpoint, time.perf_counter() - started, None)
+            return None
+        self.stats.record(endpoint, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def pause(self) -> None:
+        if self.think:
+            await asyncio.sleep(random.uniform(0, 2 * self.think))
+
+
+async def widget_session(ctx: Context) -> None:
+    """A homeowner on a tenant's site, following the embed: bootstrap, lead, then a few quotes."""
+    tenant = random.choice(ctx.tenants)
+    headers = {"X-Tenant-ID": tenant["id"]}
+    await ctx.call("GET", f"/api/widget/bootstrap?tool={ctx.tool}", "GET /api/widget/bootstrap", headers=headers)
+    await ctx.pause()
+    quote = {"ground_area": random.randint(900, 4200), "pitch": random.choice([4, 6, 8, 10, 12])}
+    n = random.randint(0, 10**9)
+    # The lead endpoint requires an authenticated caller and a tool id, so the owner's
+    # token and the seeded tool's id stand in for what the embed sends.
+    await ctx.call(
+        "POST",
+        "/api/leads/widget",
+        "POST /api/leads/widget",
+        headers={**headers, "Authorization": f"Token {tenant['token']}"},
+        json={
+            "tool": ctx.tool_id,
+            "full_name": f"Homeowner {n}",
+            "email": f"h{n}@example.com",
+            "address": f"{n % 9999} Elm Street",
+            **quote,
+        },
+    )
+    for _ in range(random.randint(1, 3)):
+        material = random.choice(tenant["materials"]) if tenant["materials"] else ""
+        await ctx.call(
+            "POST",
+            f"/api/pricing/estimate?tool={ctx.tool}&material={material}",
+            "POST /api/pricing/estimate",
+            headers=headers,
+            json={"tool": ctx.tool, **quote},
+        )
+        await ctx.pause()
+        quote["pitch"] = random.choice([4, 6, 8, 10, 12])
+
+
+async def dashboard_session(ctx: Context) -> None:
+    """A contractor opening their dashboard and a tool's leads page."""
+    tenant = random.choice(ctx.tenants)
+    headers = {"X-Tenant-ID": tenant["id"], "Authorization": f"Token {tenant['token']}"}
+    await ctx.call("GET", "/api/auth/me", "GET /api/auth/me", headers=headers)
+    await ctx.call("GET", "/api/marketplace/tools", "GET /api/marketplace/tools", headers=headers)
+    await ctx.call("GET", "/api/widget/config", "GET /api/widget/config", headers=headers)
+    await ctx.pause()
+    await ctx.call("GET", f"/api/marketplace/tools/{ctx.tool}", "GET /api/marketplace/tools/<slug>", headers=headers)
+    await ctx.call("GET", f"/api/leads/widget?tool={ctx.tool}&page=1", "GET /api/leads/widget", headers=headers)
+    await ctx.call("GET", "/api/materials", "GET /api/materials", headers=headers)
+
+
+async def admin_session(ctx: Context) -> None:
+    """The platform admin dashboard's initial load."""
+    if not ctx.admin_token:
+        return
+    headers = {"Authorization": f"Token {ctx.admin_token}"}
+    await ctx.call("GET", "/api/admin/tools/", "GET /api/admin/tools", headers=headers)
+    await ctx.call("GET", "/api/admin/tenants/?plan=&license_status=", "GET /api/admin/tenants", headers=headers)
+    await ctx.call("GET", "/api/admin/metrics/", "GET /api/admin/metrics", headers=headers)
+    await ctx.call(
+        "GET", "/api/admin/tickets/?fields=id,tenant,tenant_name,tool,subject,status", "GET /api/admin/tickets",
+        headers=headers,
+    )
+    await ctx.call(
+        "GET", "/api/admin/licenses/?fields=id,tenant_name,tool_name,status,plan", "GET /api/admin/licenses",
+        headers=headers,
+    )
+
+
+SESSIONS = {"widget": widget_session, "dashboard": dashboard_session, "admin": admin_session}
+
+
+async def _user(ctx: Context, mix: dict, deadline: float) -> None:
+    kinds, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        await SESSIONS[random.choices(kinds, weights)[0]](ctx)
+
+
+# -- stand-in webhook receiver ---------------------------------------------------
+
+
+class WebhookReceiver:
+    """Minimal HTTP/1.1 endpoint that answers any request with 200, ``delay`` seconds later."""
+
+    def __init__(self, port: int, delay: float, stats: Stats):
+        self.port = port
+        self.delay = delay
+        self.stats = stats
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "0.0.0.0", self.port)
+
+    async def stop(self) -> None:
+        self._server.close()
+        # Keep-alive connections outlive the listening socket; end their handlers too.
+        handlers = list(self._handlers)
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                self.stats.webhooks += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\n\r\n{}")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Ending quietly on cancel too: asyncio.streams reports a cancelled handler as an error.
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+
+async def run(
+    base_url: str,
+    fixtures: dict,
+    tool: str,
+    users: int,
+    duration: float,
+    mix: dict,
+    think: float = 0.0,
+    webhook_port: Optional[int] = None,
+    webhook_delay: float = 0.0,
+) -> tuple[Stats, float]:
+    stats = Stats()
+    receiver = WebhookReceiver(webhook_port, webhook_delay, stats) if webhook_port else None
+    if receiver:
+        await receiver.start()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            ctx = Context(
+                client, stats, fixtures["tenants"], fixtures["admin_token"], tool, fixtures["tool_id"], think
+            )
+            started = time.monotonic()
+            deadline = started + duration
+            await asyncio.gather(*(_user(ctx, mix, deadline) for _ in range(users)))
+            elapsed = time.monotonic() - started
+    finally:
+        if receiver:
+            await receiver.stop()
+    return stats, elapsed
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace import assets
+
+
+class Command(BaseCommand):
+    help = "Copy the built widget bundle into WIDGET_ASSETS_ROOT under content-hashed names with .br/.gz variants."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", help="Directory holding the Vite output (default: WIDGET_DIST_DIR).")
+
+    def handle(self, *args, **options):
+        source = Path(options["source"]) if options["source"] else None
+        try:
+            manifest = assets.build(source_dir=source)
+        except FileNotFoundError as exc:
+            raise CommandError(f"{exc.filename} not found; run `npm run build:widget` first.")
+        if assets.brotli is None:
+            self.stderr.write(self.style.WARNING("brotli is not installed; only gzip variants were written."))
+        for logical, entry in sorted(manifest.items()):
+            self.stdout.write(f"{logical} -> {entry['name']} ({', '.join(entry['encodings'])})")
+        self.stdout.write(self.style.SUCCESS(f"Widget assets written to {assets.assets_root()}."))
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.loadtest import DEFAULT_MIX, load_fixtures, run
+
+
+class Command(BaseCommand):
+    help = "Replay widget, dashboard and admin traffic from the seeded tenants against a running server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--tool", default="loadtest")
+        parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users.")
+        parser.add_argument("--duration", type=float, default=60, help="Seconds to run.")
+        parser.add_argument("--think", type=float, default=0.5, help="Mean pause between a user's steps, seconds.")
+        parser.add_argument(
+            "--mix",
+            default=",".join(f"{kind}={weight}" for kind, weight in DEFAULT_MIX.items()),
+            help="Session weights, e.g. widget=85,dashboard=12,admin=3.",
+        )
+        parser.add_argument("--webhook-port", type=int, default=8089, help="Stand-in webhook receiver port; 0 disables it.")
+        parser.add_argument("--webhook-delay", type=float, default=0.2, help="Seconds the receiver waits before answering.")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            mix = {kind: int(weight) for kind, weight in (part.split("=") for part in options["mix"].split(","))}
+        except ValueError:
+            raise CommandError("--mix must look like widget=85,dashboard=12,admin=3")
+        unknown = set(mix) - set(DEFAULT_MIX)
+        if unknown:
+            raise CommandError(f"Unknown session kind(s): {', '.join(sorted(unknown))}")
+        fixtures = load_fixtures(options["tool"])
+        if not fixtures["tenants"]:
+            raise CommandError("No load-test tenants found; run seed_loadtest first.")
+
+        stats, elapsed = asyncio.run(
+            run(
+                options["base_url"],
+                fixtures,
+                options["tool"],
+                users=options["users"],
+                duration=options["duration"],
+                mix=mix,
+                think=options["think"],
+                webhook_port=options["webhook_port"] or None,
+                webhook_delay=options["webhook_delay"],
+            )
+        )
+        rows = stats.report(elapsed)
+        if options["json"]:
+            self.stdout.write(json.dumps({"elapsed": round(elapsed, 2), "webhooks": stats.webhooks, "endpoints": rows}))
+            return
+        self.stdout.write(f"{sum(row['requests'] for row in rows)} requests in {elapsed:.1f}s, {stats.webhooks} webhook(s)")
+        self.stdout.write(f"{'endpoint':<36}{'reqs':>8}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err %':>8}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['endpoint']:<36}{row['requests']:>8}{row['rps']:>8}{row['p50_ms']:>9}"
+                f"{row['p95_ms']:>9}{row['p99_ms']:>9}{row['error_pct']:>8}"
+            )
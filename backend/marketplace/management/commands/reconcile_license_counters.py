@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from marketplace.models import TENANT_LICENSE_COUNTERS, License
+from shared.tenant import Tenant
+
+
+def _count(status: str | None = None):
+    licenses = License.objects.filter(tenant=OuterRef("pk"))
+    if status:
+        licenses = licenses.filter(status=status)
+    counted = licenses.order_by().values("tenant").annotate(n=Count("id")).values("n")
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized license counters on Tenant from the License table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drifted tenants without fixing them.")
+
+    def handle(self, *args, **options):
+        expected = {field: _count(status) for status, field in TENANT_LICENSE_COUNTERS.items()}
+        expected["total_licenses"] = _count()
+        drift = Q()
+        for field in expected:
+            drift |= ~Q(**{field: F(f"expected_{field}")})
+        with transaction.atomic():
+            drifted = (
+                Tenant.objects.annotate(**{f"expected_{field}": expr for field, expr in expected.items()})
+                .filter(drift)
+                .values_list("pk", flat=True)
+            )
+            drifted_ids = list(drifted)
+            if drifted_ids and not options["dry_run"]:
+                Tenant.objects.filter(pk__in=drifted_ids).update(**expected)
+        verb = "would fix" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted_ids)} tenant(s) with drifted license counters ({verb})."))
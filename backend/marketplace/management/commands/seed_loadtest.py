@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from marketplace.loadtest import PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = "Create (or top up) the loadtest-NNNN tenants, logins and data that the loadtest command drives."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tenants", type=int, default=50)
+        parser.add_argument("--tool", default="loadtest", help="Slug of the tool every tenant is licensed for.")
+        parser.add_argument("--leads", type=int, default=200, help="Existing leads per tenant.")
+        parser.add_argument(
+            "--webhook-url",
+            default="http://127.0.0.1:8089/hook",
+            help="Base of the tenant webhook URLs; point it at the loadtest command's receiver.",
+        )
+        parser.add_argument("--reset", action="store_true", help="Delete previously seeded tenants first.")
+
+    def handle(self, *args, **options):
+        result = seed(
+            options["tenants"], options["tool"], options["webhook_url"], options["leads"], reset=options["reset"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{result['tenants']} load-test tenant(s) licensed for '{result['tool']}' (password '{PASSWORD}')."
+            )
+        )
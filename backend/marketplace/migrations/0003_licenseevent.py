@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def seed_opening_events(apps, schema_editor):
+    """One opening event per existing license so the ledger starts from today's state."""
+    License = apps.get_model("marketplace", "License")
+    LicenseEvent = apps.get_model("marketplace", "LicenseEvent")
+    events = []
+    for lic in License.objects.select_related("tool").iterator():
+        tool = lic.tool
+        price = tool.price_monthly or Decimal("0.00")
+        code = lic.metadata.get("coupon_code") if isinstance(lic.metadata, dict) else None
+        if (
+            code
+            and tool.coupon_code
+            and code == tool.coupon_code
+            and (not tool.coupon_usage_limit or tool.coupon_usage_count < tool.coupon_usage_limit)
+        ):
+            price = max(Decimal("0.00"), price - price * (tool.coupon_percent_off or Decimal("0.00")) / 100)
+        events.append(
+            LicenseEvent(
+                license_id=lic.id,
+                tenant_id=lic.tenant_id,
+                tool_id=lic.tool_id,
+                from_status="",
+                to_status=lic.status,
+                price=price,
+                mrr_delta=price if lic.status == "active" else Decimal("0.00"),
+                source="backfill",
+                occurred_at=lic.starts_at or lic.created_at,
+            )
+        )
+    LicenseEvent.objects.bulk_create(events, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_tool_coupon_code_tool_coupon_end_and_more'),
+        ('shared', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LicenseEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('from_status', models.CharField(blank=True, max_length=16)),
+                ('to_status', models.CharField(choices=[('active', 'Active'), ('canceled', 'Canceled'), ('expired', 'Expired'), ('trial', 'Trial'), ('pending', 'Pending')], max_length=16)),
+                ('price', models.DecimalField(decimal_places=2, help_text='Effective monthly price at the time', max_digits=10)),
+                ('mrr_delta', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('source', models.CharField(choices=[('webhook', 'Payment webhook'), ('onboarding', 'Onboarding'), ('admin', 'Admin'), ('backfill', 'Backfill')], max_length=16)),
+                ('occurred_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('license', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='marketplace.license')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='license_events', to='shared.tenant')),
+                ('tool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='license_events', to='marketplace.tool')),
+            ],
+            options={
+                'verbose_name': 'License Event',
+                'verbose_name_plural': 'License Events',
+                'ordering': ['occurred_at', 'id'],
+                'indexes': [models.Index(fields=['license', 'occurred_at'], name='marketplace_license_86194e_idx')],
+            },
+        ),
+        migrations.RunPython(seed_opening_events, migrations.RunPython.noop),
+    ]
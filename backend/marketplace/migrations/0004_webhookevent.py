@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_licenseevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('provider', models.CharField(default='flutterwave', max_length=32)),
+                ('event_key', models.CharField(help_text='Provider transaction id, or tx_ref:status', max_length=128)),
+                ('tx_ref', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(blank=True, max_length=32)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Webhook Event',
+                'verbose_name_plural': 'Webhook Events',
+                'indexes': [models.Index(fields=['processed_at', 'received_at'], name='marketplace_process_817634_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'event_key'), name='uniq_webhook_event')],
+            },
+        ),
+    ]
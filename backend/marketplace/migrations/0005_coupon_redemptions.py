@@ -0,0 +1,162 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:19
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+SHARDS = 8
+
+
+def copy_tool_coupons(apps, schema_editor):
+    """
+    Move each tool's coupon columns into a Coupon and turn licenses that carried the
+    code into redemptions, activated ones first, up to the usage limit.
+    """
+    Tool = apps.get_model("marketplace", "Tool")
+    License = apps.get_model("marketplace", "License")
+    Coupon = apps.get_model("marketplace", "Coupon")
+    CouponShard = apps.get_model("marketplace", "CouponShard")
+    CouponRedemption = apps.get_model("marketplace", "CouponRedemption")
+    for tool in Tool.objects.exclude(coupon_code="").iterator():
+        coupon = Coupon.objects.create(
+            tool_id=tool.id,
+            code=tool.coupon_code,
+            percent_off=tool.coupon_percent_off,
+            starts_on=tool.coupon_start,
+            ends_on=tool.coupon_end,
+            usage_limit=tool.coupon_usage_limit,
+            tenant_id=tool.coupon_tenant_id,
+        )
+        limit = tool.coupon_usage_limit
+        count = min(SHARDS, limit) if limit else SHARDS
+        base, extra = divmod(limit, count)
+        shards = [
+            CouponShard(coupon=coupon, index=i, capacity=(base + (1 if i < extra else 0)) if limit else None)
+            for i in range(count)
+        ]
+        holders = (
+            License.objects.filter(tool_id=tool.id, status__in=["active", "pending"], metadata__coupon_code=tool.coupon_code)
+            .order_by("status", "created_at")
+        )
+        if limit:
+            holders = holders[:limit]
+        redemptions = []
+        for n, lic in enumerate(holders):
+            shard = next(s for s in shards[n % count:] + shards if s.capacity is None or s.used < s.capacity)
+            shard.used += 1
+            redemptions.append(
+                CouponRedemption(
+                    coupon=coupon,
+                    license_id=lic.id,
+                    tenant_id=lic.tenant_id,
+                    shard=shard.index,
+                    percent_off=coupon.percent_off,
+                    redeemed_at=lic.created_at,
+                )
+            )
+        CouponShard.objects.bulk_create(shards)
+        CouponRedemption.objects.bulk_create(redemptions, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0004_webhookevent'),
+        ('shared', '0002_tenant_license_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Coupon',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=64)),
+                ('percent_off', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('starts_on', models.DateField(blank=True, null=True)),
+                ('ends_on', models.DateField(blank=True, null=True)),
+                ('usage_limit', models.PositiveIntegerField(default=0, help_text='0 = unlimited')),
+                ('is_active', models.BooleanField(default=True)),
+                ('tenant', models.ForeignKey(blank=True, help_text='Restrict the coupon to one tenant', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coupons', to='shared.tenant')),
+                ('tool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupons', to='marketplace.tool')),
+            ],
+            options={
+                'verbose_name': 'Coupon',
+                'verbose_name_plural': 'Coupons',
+            },
+        ),
+        migrations.CreateModel(
+            name='CouponRedemption',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('percent_off', models.DecimalField(decimal_places=2, help_text='Discount locked in at redemption', max_digits=5)),
+                ('redeemed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='marketplace.coupon')),
+                ('license', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemptions', to='marketplace.license')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemptions', to='shared.tenant')),
+            ],
+            options={
+                'verbose_name': 'Coupon Redemption',
+                'verbose_name_plural': 'Coupon Redemptions',
+            },
+        ),
+        migrations.CreateModel(
+            name='CouponShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('used', models.PositiveIntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(blank=True, help_text='Empty = unlimited', null=True)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='marketplace.coupon')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='coupon',
+            constraint=models.UniqueConstraint(fields=('tool', 'code'), name='uniq_coupon_code_per_tool'),
+        ),
+        migrations.AddIndex(
+            model_name='couponredemption',
+            index=models.Index(fields=['license', 'released_at'], name='marketplace_license_26e25c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='couponredemption',
+            constraint=models.UniqueConstraint(fields=('coupon', 'license'), name='uniq_coupon_redemption'),
+        ),
+        migrations.AddConstraint(
+            model_name='couponshard',
+            constraint=models.UniqueConstraint(fields=('coupon', 'index'), name='uniq_coupon_shard'),
+        ),
+        migrations.RunPython(copy_tool_coupons, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='tool',
+            name='coupon_code',
+        ),
+        migrations.RemoveField(
+            model_name='tool',
+            name='coupon_end',
+        ),
+        migrations.RemoveField(
+            model_name='tool',
+            name='coupon_percent_off',
+        ),
+        migrations.RemoveField(
+            model_name='tool',
+            name='coupon_start',
+        ),
+        migrations.RemoveField(
+            model_name='tool',
+            name='coupon_tenant',
+        ),
+        migrations.RemoveField(
+            model_name='tool',
+            name='coupon_usage_count',
+        ),
+        migrations.RemoveField(
+            model_name='tool',
+            name='coupon_usage_limit',
+        ),
+    ]
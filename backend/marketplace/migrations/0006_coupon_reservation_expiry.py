@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0005_coupon_redemptions'),
+        ('shared', '0002_tenant_license_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='couponredemption',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='Unpaid hold; released after this unless the payment is confirmed', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='couponredemption',
+            index=models.Index(fields=['expires_at'], name='marketplace_expires_b56354_idx'),
+        ),
+    ]
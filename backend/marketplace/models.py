@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import random
 import uuid
+from collections import defaultdict
+from datetime import timedelta
 from decimal import Decimal
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import DecimalField, F, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 
+from shared.cache import TieredCache, get_instance
 from shared.tenant import Tenant, TenantScopedModel, TimeStampedModel
 
 
@@ -27,15 +34,6 @@ class Tool(TimeStampedModel):
         help_text="List of feature cards for bento layout; shape: [{title, copy, icon}]",
     )
     is_active = models.BooleanField(default=True)
-    coupon_code = models.CharField(max_length=64, blank=True)
-    coupon_percent_off = models.DecimalField(max_digits=5, decimal_places=2, default=0)
-    coupon_start = models.DateField(null=True, blank=True)
-    coupon_end = models.DateField(null=True, blank=True)
-    coupon_usage_limit = models.PositiveIntegerField(default=0, help_text="0 = unlimited")
-    coupon_usage_count = models.PositiveIntegerField(default=0)
-    coupon_tenant = models.ForeignKey(
-        "shared.Tenant", null=True, blank=True, on_delete=models.SET_NULL, related_name="tool_coupons"
-    )
 
     class Meta:
         verbose_name = "Tool"
@@ -44,6 +42,51 @@ class Tool(TimeStampedModel):
     def __str__(self) -> str:  # pragma: no cover
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from marketplace.catalog import bump_catalog_version
+
+        bump_catalog_version()
+
+    def delete(self, *args, **kwargs):
+        from marketplace.catalog import bump_catalog_version
+
+        bump_catalog_version()
+        return super().delete(*args, **kwargs)
+
+    @property
+    def primary_coupon(self) -> "Coupon | None":
+        """Newest active coupon; uses ``prefetch_active_coupons()`` results when present."""
+        coupons = getattr(self, "active_coupons", None)
+        if coupons is None:
+            coupons = list(Coupon.objects.filter(tool=self, is_active=True).with_usage().order_by("-created_at")[:1])
+        return coupons[0] if coupons else None
+
+
+class LicenseQuerySet(models.QuerySet):
+    def with_effective_price(self):
+        """
+        Annotate ``effective_price``: the tool price less the discount locked in by the
+        license's unreleased coupon redemption, if any.
+        """
+        price = F("tool__price_monthly")
+        percent_off = Coalesce(
+            Subquery(
+                CouponRedemption.objects.filter(license=OuterRef("pk"), released_at__isnull=True).values(
+                    "percent_off"
+                )[:1]
+            ),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=5, decimal_places=2),
+        )
+        return self.annotate(
+            effective_price=Greatest(
+                price - price * percent_off / Value(Decimal("100")),
+                Value(Decimal("0.00")),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
 
 class License(TenantScopedModel):
     """Tenant's subscription to a given tool."""
@@ -66,6 +109,8 @@ class License(TenantScopedModel):
     expires_at = models.DateTimeField(null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
 
+    objects = LicenseQuerySet.as_manager()
+
     class Meta:
         verbose_name = "License"
         verbose_name_plural = "Licenses"
@@ -78,6 +123,444 @@ class License(TenantScopedModel):
         return f"{self.tenant} → {self.tool} ({self.status})"
 
 
+# License status -> denormalized counter column on Tenant.
+TENANT_LICENSE_COUNTERS = {
+    "active": "active_licenses",
+    "trial": "trial_licenses",
+    "canceled": "canceled_licenses",
+}
+
+
+def bump_tenant_license_counters(events) -> None:
+    """Apply the counter changes implied by ``events`` with one F() UPDATE per tenant."""
+    deltas: dict = defaultdict(lambda: defaultdict(int))
+    for event in events:
+        counters = deltas[event.tenant_id]
+        if not event.from_status:
+            counters["total_licenses"] += 1
+        elif event.from_status in TENANT_LICENSE_COUNTERS:
+            counters[TENANT_LICENSE_COUNTERS[event.from_status]] -= 1
+        if event.to_status in TENANT_LICENSE_COUNTERS:
+            counters[TENANT_LICENSE_COUNTERS[event.to_status]] += 1
+    for tenant_id, counters in deltas.items():
+        # Clamped so a counter that has drifted low can't underflow the unsigned column.
+        changes = {field: Greatest(F(field) + delta, 0) for field, delta in counters.items() if delta}
+        if changes:
+            Tenant.objects.filter(pk=tenant_id).update(**changes)
+    if deltas:
+        from marketplace.widget import bump_widget_generation
+
+        bump_widget_generation(deltas)
+
+
+def drop_tenant_license_counters(canceled_per_tenant: dict) -> None:
+    """Take deleted licenses, already moved to canceled by ``record``, out of the tenant counters."""
+    for tenant_id, count in canceled_per_tenant.items():
+        Tenant.objects.filter(pk=tenant_id).update(
+            canceled_licenses=Greatest(F("canceled_licenses") - count, 0),
+            total_licenses=Greatest(F("total_licenses") - count, 0),
+        )
+    if canceled_per_tenant:
+        from marketplace.widget import bump_widget_generation
+
+        bump_widget_generation(canceled_per_tenant)
+
+
+class LicenseEventManager(models.Manager):
+    def record(self, licenses: models.QuerySet, to_status: str, *, source: str, from_status: str | None = None):
+        """
+        Append one event per license moving to ``to_status``, priced at this moment, and
+        move the tenant license counters to match. Call it before the status write, inside
+        the same transaction: the licenses are locked so concurrent callers cannot record
+        the same transition twice. Licenses already in ``to_status`` are skipped unless
+        ``from_status`` is given (e.g. "" on creation).
+        """
+        qs = licenses.select_for_update(of=("self",))
+        if from_status is None:
+            qs = qs.exclude(status=to_status)
+        last_active_price = Subquery(
+            self.filter(license=OuterRef("pk"), to_status=License.Status.ACTIVE)
+            .order_by("-occurred_at")
+            .values("price")[:1]
+        )
+        rows = qs.with_effective_price().annotate(last_active_price=last_active_price).values(
+            "id", "tenant_id", "tool_id", "status", "effective_price", "last_active_price"
+        )
+        events = []
+        for row in rows:
+            previous = row["status"] if from_status is None else from_status
+            price = row["effective_price"] or Decimal("0.00")
+            delta = Decimal("0.00")
+            if to_status == License.Status.ACTIVE:
+                delta += price
+            if previous == License.Status.ACTIVE:
+                delta -= row["last_active_price"] if row["last_active_price"] is not None else price
+            events.append(
+                LicenseEvent(
+                    license_id=row["id"],
+                    tenant_id=row["tenant_id"],
+                    tool_id=row["tool_id"],
+                    from_status=previous,
+                    to_status=to_status,
+                    price=price,
+                    mrr_delta=delta,
+                    source=source,
+                )
+            )
+        created = self.bulk_create(events)
+        bump_tenant_license_counters(created)
+        return created
+
+
+class LicenseEvent(models.Model):
+    """
+    Append-only ledger of license status transitions. ``mrr_delta`` is the change in
+    monthly recurring revenue caused by the transition, so MRR at any point in time is
+    the running sum of deltas up to it.
+    """
+
+    class Source(models.TextChoices):
+        WEBHOOK = "webhook", "Payment webhook"
+        ONBOARDING = "onboarding", "Onboarding"
+        ADMIN = "admin", "Admin"
+        BACKFILL = "backfill", "Backfill"
+
+    id = models.BigAutoField(primary_key=True)
+    license = models.ForeignKey(License, on_delete=models.CASCADE, related_name="events")
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name="license_events")
+    tool = models.ForeignKey(Tool, on_delete=models.CASCADE, related_name="license_events")
+    from_status = models.CharField(max_length=16, blank=True)
+    to_status = models.CharField(max_length=16, choices=License.Status.choices)
+    price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Effective monthly price at the time")
+    mrr_delta = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    source = models.CharField(max_length=16, choices=Source.choices)
+    occurred_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = LicenseEventManager()
+
+    class Meta:
+        verbose_name = "License Event"
+        verbose_name_plural = "License Events"
+        ordering = ["occurred_at", "id"]
+        indexes = [
+            models.Index(fields=["license", "occurred_at"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.license_id}: {self.from_status or '∅'} → {self.to_status}"
+
+
+COUPON_SHARDS = 8
+COUPON_CACHE_TTL = 60 * 60 * 24
+coupon_cache = TieredCache("coupon", ttl=COUPON_CACHE_TTL)
+
+
+def _coupon_cache_key(tool_id, code: str) -> str:
+    return f"{tool_id}:{code}"
+
+
+class CouponQuerySet(models.QuerySet):
+    def with_usage(self):
+        return self.annotate(redeemed=Coalesce(Sum("shards__used"), 0))
+
+
+class CouponManager(models.Manager.from_queryset(CouponQuerySet)):
+    def lookup(self, tool_id, code: str) -> "Coupon | None":
+        """
+        Active coupon for (tool, code), cached until the coupon is saved or deleted.
+        Usage is not part of the cached value: limits are enforced at redemption time.
+        """
+        return get_instance(
+            coupon_cache,
+            _coupon_cache_key(tool_id, code),
+            self.model,
+            lambda: self.filter(tool_id=tool_id, code=code, is_active=True).first(),
+        )
+
+
+class Coupon(TimeStampedModel):
+    """
+    Percentage discount on a tool. Usage is counted on ``CouponShard`` rows rather than
+    here, so concurrent redemptions of one promotion do not queue on a single row lock.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tool = models.ForeignKey(Tool, on_delete=models.CASCADE, related_name="coupons")
+    code = models.CharField(max_length=64)
+    percent_off = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    starts_on = models.DateField(null=True, blank=True)
+    ends_on = models.DateField(null=True, blank=True)
+    usage_limit = models.PositiveIntegerField(default=0, help_text="0 = unlimited")
+    tenant = models.ForeignKey(
+        Tenant, null=True, blank=True, on_delete=models.SET_NULL, related_name="coupons",
+        help_text="Restrict the coupon to one tenant",
+    )
+    is_active = models.BooleanField(default=True)
+
+    objects = CouponManager()
+
+    class Meta:
+        verbose_name = "Coupon"
+        verbose_name_plural = "Coupons"
+        constraints = [
+            models.UniqueConstraint(fields=["tool", "code"], name="uniq_coupon_code_per_tool"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.code} ({self.percent_off}% off {self.tool_id})"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Read through __dict__ so deferred loads don't trigger a query per instance.
+        self._loaded_key = (self.__dict__.get("tool_id"), self.__dict__.get("code"))
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        super().save(*args, **kwargs)
+        if creating:
+            self.allocate_shards()
+        else:
+            self.rebalance_shards()
+        self._invalidate()
+        self._loaded_key = (self.tool_id, self.code)
+
+    def delete(self, *args, **kwargs):
+        self._invalidate()
+        return super().delete(*args, **kwargs)
+
+    def _invalidate(self) -> None:
+        keys = {_coupon_cache_key(*self._loaded_key), _coupon_cache_key(self.tool_id, self.code)}
+        coupon_cache.delete(*keys)
+        transaction.on_commit(lambda: coupon_cache.delete(*keys))
+        from marketplace.catalog import bump_catalog_version
+
+        bump_catalog_version()
+
+    def is_valid_for(self, tenant, today=None) -> bool:
+        today = today or timezone.now().date()
+        if self.starts_on and today < self.starts_on:
+            return False
+        if self.ends_on and today > self.ends_on:
+            return False
+        if self.tenant_id and (tenant is None or self.tenant_id != tenant.pk):
+            return False
+        return True
+
+    def discount_for(self, price: Decimal) -> Decimal:
+        return (price or Decimal("0.00")) * (self.percent_off or Decimal("0.00")) / 100
+
+    def _capacities(self, count: int) -> list:
+        if not self.usage_limit:
+            return [None] * count
+        base, extra = divmod(self.usage_limit, count)
+        return [base + (1 if i < extra else 0) for i in range(count)]
+
+    def allocate_shards(self) -> None:
+        count = min(COUPON_SHARDS, self.usage_limit) if self.usage_limit else COUPON_SHARDS
+        CouponShard.objects.bulk_create(
+            CouponShard(coupon=self, index=i, capacity=capacity)
+            for i, capacity in enumerate(self._capacities(max(count, 1)))
+        )
+
+    def rebalance_shards(self) -> None:
+        """Spread a changed ``usage_limit`` over the shards, keeping what each has used."""
+        with transaction.atomic():
+            shards = list(CouponShard.objects.select_for_update().filter(coupon=self).order_by("index"))
+            if not shards:
+                self.allocate_shards()
+                return
+            capacities = self._capacities(len(shards))
+            if self.usage_limit:
+                # Never drop a shard's capacity below what it has already handed out.
+                spare = self.usage_limit - sum(s.used for s in shards)
+                capacities = [s.used for s in shards]
+                for i in range(max(spare, 0)):
+                    capacities[i % len(shards)] += 1
+            changed = [s for s, cap in zip(shards, capacities) if s.capacity != cap]
+            for shard, cap in zip(shards, capacities):
+                shard.capacity = cap
+            CouponShard.objects.bulk_update(changed, ["capacity"])
+
+
+class CouponShard(models.Model):
+    """One slice of a coupon's usage limit; redemptions claim a unit from a random shard."""
+
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name="shards")
+    index = models.PositiveSmallIntegerField()
+    used = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField(null=True, blank=True, help_text="Empty = unlimited")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["coupon", "index"], name="uniq_coupon_shard"),
+        ]
+
+
+def _spare_uses(coupon_id) -> int | None:
+    """Unclaimed uses left on a coupon across its shards; None when it is unlimited."""
+    shards = list(CouponShard.objects.filter(coupon_id=coupon_id).values_list("used", "capacity"))
+    if not shards or any(capacity is None for _, capacity in shards):
+        return None
+    return sum(max(capacity - used, 0) for used, capacity in shards)
+
+
+class CouponRedemptionManager(models.Manager):
+    def redeem(
+        self, coupon: Coupon, license: "License", *, expires_in: int | None = None
+    ) -> "CouponRedemption | None":
+        """
+        Claim one use of ``coupon`` for ``license`` with a conditional UPDATE on a random
+        shard, falling through the others when one is full. Returns None once the coupon
+        is exhausted; redeeming the same license twice returns the existing redemption.
+        With ``expires_in`` (seconds) the use is only held until then unless ``confirm``
+        is called; ``release_expired`` gives unpaid holds back.
+        """
+        order = list(range(CouponShard.objects.filter(coupon=coupon).count()))
+        random.shuffle(order)
+        try:
+            with transaction.atomic():
+                for index in order:
+                    claimed = (
+                        CouponShard.objects.filter(coupon=coupon, index=index)
+                        .filter(Q(capacity__isnull=True) | Q(used__lt=F("capacity")))
+                        .update(used=F("used") + 1)
+                    )
+                    if claimed:
+                        if coupon.usage_limit and _spare_uses(coupon.pk) == 0:
+                            # The catalog only needs re-rendering when this was the last use.
+                            from marketplace.catalog import bump_catalog_version
+
+                            bump_catalog_version()
+                        return self.create(
+                            coupon=coupon,
+                            license=license,
+                            tenant_id=license.tenant_id,
+                            shard=index,
+                            percent_off=coupon.percent_off,
+                            expires_at=timezone.now() + timedelta(seconds=expires_in) if expires_in else None,
+                        )
+                return None
+        except IntegrityError:
+            return self.filter(coupon=coupon, license=license).first()
+
+    def confirm(self, licenses: models.QuerySet) -> int:
+        """Keep the uses held by ``licenses`` for good (their payment went through)."""
+        return self.filter(license__in=licenses, released_at__isnull=True, expires_at__isnull=False).update(
+            expires_at=None
+        )
+
+    def release(self, licenses: models.QuerySet) -> int:
+        """Give back the uses held by ``licenses`` (e.g. when payment fails)."""
+        released: dict = defaultdict(int)
+        for redemption in self.select_for_update().select_related("coupon").filter(
+            license__in=licenses, released_at__isnull=True
+        ):
+            CouponShard.objects.filter(coupon_id=redemption.coupon_id, index=redemption.shard, used__gt=0).update(
+                used=F("used") - 1
+            )
+            redemption.released_at = timezone.now()
+            redemption.save(update_fields=["released_at"])
+            released[redemption.coupon] += 1
+        # Only a coupon that was used up before these releases changes in the catalog.
+        if any(coupon.usage_limit and _spare_uses(coupon.pk) == count for coupon, count in released.items()):
+            from marketplace.catalog import bump_catalog_version
+
+            bump_catalog_version()
+        return sum(released.values())
+
+    def release_expired(self) -> int:
+        """Give back the holds of pending licenses whose checkout window has passed."""
+        with transaction.atomic():
+            stale = License.objects.filter(
+                status=License.Status.PENDING,
+                coupon_redemptions__released_at__isnull=True,
+                coupon_redemptions__expires_at__lt=timezone.now(),
+            )
+            return self.release(stale)
+
+
+class CouponRedemption(models.Model):
+    """Ledger of coupon uses: one row per license that claimed a coupon."""
+
+    id = models.BigAutoField(primary_key=True)
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name="redemptions")
+    license = models.ForeignKey(License, on_delete=models.CASCADE, related_name="coupon_redemptions")
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name="coupon_redemptions")
+    shard = models.PositiveSmallIntegerField()
+    percent_off = models.DecimalField(max_digits=5, decimal_places=2, help_text="Discount locked in at redemption")
+    redeemed_at = models.DateTimeField(default=timezone.now)
+    released_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(
+        null=True, blank=True, help_text="Unpaid hold; released after this unless the payment is confirmed"
+    )
+
+    objects = CouponRedemptionManager()
+
+    class Meta:
+        verbose_name = "Coupon Redemption"
+        verbose_name_plural = "Coupon Redemptions"
+        constraints = [
+            models.UniqueConstraint(fields=["coupon", "license"], name="uniq_coupon_redemption"),
+        ]
+        indexes = [
+            models.Index(fields=["license", "released_at"]),
+            models.Index(fields=["expires_at"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.coupon_id} → {self.license_id}"
+
+
+def prefetch_active_coupons() -> Prefetch:
+    """Prefetch for ``Tool.primary_coupon`` so tool lists don't query coupons per row."""
+    return Prefetch(
+        "coupons",
+        queryset=Coupon.objects.filter(is_active=True).with_usage().order_by("-created_at"),
+        to_attr="active_coupons",
+    )
+
+
+class WebhookEvent(models.Model):
+    """
+    Every payment-provider webhook as received. The unique (provider, event_key) index
+    drops retries of the same delivery; a worker applies each event exactly once. An
+    event that still fails after ``WEBHOOK_MAX_ATTEMPTS`` tries is dead-lettered and left
+    for an admin to requeue.
+
+    ``next_attempt_at`` is when a task is next due to pick the event up: the enqueue time,
+    or the end of a retry countdown. The sweeper only re-enqueues events whose due time
+    has long passed without them being processed.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    provider = models.CharField(max_length=32, default="flutterwave")
+    event_key = models.CharField(max_length=128, help_text="Provider transaction id, or tx_ref:status")
+    tx_ref = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=32, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    dead_lettered_at = models.DateTimeField(null=True, blank=True)
+    enqueued_at = models.DateTimeField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Webhook Event"
+        verbose_name_plural = "Webhook Events"
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "event_key"], name="uniq_webhook_event"),
+        ]
+        indexes = [
+            models.Index(fields=["processed_at", "received_at"]),
+            models.Index(fields=["processed_at", "next_attempt_at"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.provider}:{self.event_key} ({self.status})"
+
+
 class WidgetConfig(TenantScopedModel):
     """Per-tenant theming for the embeddable widget."""
 
@@ -5,6 +5,7 @@ from typing import Optional
 from rest_framework.permissions import BasePermission
 
 from marketplace.models import License
+from shared.middleware import tenant_by_id
 
 
 class HasActiveLicense(BasePermission):
@@ -31,3 +32,28 @@ class HasActiveLicense(BasePermission):
         return License.objects.filter(
             tenant=tenant, tool__slug=tool_slug, status=License.Status.ACTIVE
         ).exists()
+
+
+class IsTenantMember(BasePermission):
+    """
+    Authenticated, and acting on the tenant in the caller's credentials rather than the
+    one Host/X-Tenant-ID resolved to: a request that resolves to another tenant is
+    refused, and one that resolves to none is bound to the caller's. Superusers may act
+    on whichever tenant the request resolved to.
+    """
+
+    message = "You can only act on your own tenant."
+
+    def has_permission(self, request, view) -> bool:
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        if user.is_superuser:
+            return True
+        if not user.tenant_id:
+            return False
+        tenant = getattr(request, "tenant", None)
+        if tenant is None:
+            request.tenant = tenant_by_id(user.tenant_id)
+            return request.tenant is not None
+        return str(tenant.pk) == str(user.tenant_id)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
+
+from marketplace.models import CouponRedemption, WebhookEvent
+from marketplace.webhooks import apply_flutterwave_event, record_failed_attempt
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=30)
+def process_flutterwave_event(self, event_id: int) -> bool:
+    try:
+        return apply_flutterwave_event(event_id)
+    except Exception as exc:
+        if record_failed_attempt(event_id, exc, retry_in=self.default_retry_delay):
+            return False
+        raise self.retry(exc=exc)
+
+
+def enqueue_webhook_events(event_ids) -> None:
+    """Queue a processing task per event, marking each as due now so the sweeper leaves it be."""
+    event_ids = list(event_ids)
+    stamp = now()
+    WebhookEvent.objects.filter(pk__in=event_ids).update(enqueued_at=stamp, next_attempt_at=stamp)
+    for event_id in event_ids:
+        process_flutterwave_event.delay(event_id)
+
+
+@shared_task
+def sweep_unprocessed_webhooks(older_than_seconds: int = 60) -> int:
+    """
+    Re-enqueue events that were due more than ``older_than_seconds`` ago and are still
+    unprocessed: their task never ran (broker outage, worker crash) or gave up retrying.
+    Events that are queued or waiting out a retry countdown are left alone, and events
+    out of attempts are dead-lettered instead of being tried again.
+    """
+    cutoff = now() - timedelta(seconds=older_than_seconds)
+    unprocessed = WebhookEvent.objects.filter(processed_at__isnull=True, dead_lettered_at__isnull=True)
+    overdue = unprocessed.filter(
+        Q(next_attempt_at__lt=cutoff) | Q(next_attempt_at__isnull=True, received_at__lt=cutoff)
+    )
+    overdue.filter(attempts__gte=settings.WEBHOOK_MAX_ATTEMPTS).update(dead_lettered_at=now())
+    pending = list(overdue.filter(attempts__lt=settings.WEBHOOK_MAX_ATTEMPTS).values_list("pk", flat=True)[:500])
+    enqueue_webhook_events(pending)
+    return len(pending)
+
+
+@shared_task
+def release_expired_coupon_reservations() -> int:
+    """Return coupon uses held by onboarding checkouts that were never paid."""
+    return CouponRedemption.objects.release_expired()
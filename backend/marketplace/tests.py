@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.timezone import now
+
+from marketplace import assets, loadtest
+from marketplace.models import (
+    Coupon,
+    CouponRedemption,
+    CouponShard,
+    License,
+    LicenseEvent,
+    Tool,
+    WebhookEvent,
+    WidgetConfig,
+)
+from marketplace.tasks import process_flutterwave_event, sweep_unprocessed_webhooks
+from pricing.models import MaterialSetting
+from shared.cache import clear_local_caches
+from shared.tenant import Tenant
+
+
+class CouponReservationTests(TestCase):
+    """Onboarding holds a coupon use until the payment is confirmed or the hold expires."""
+
+    def setUp(self):
+        self.tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=Decimal("100.00"))
+        self.coupon = Coupon.objects.create(tool=self.tool, code="LAUNCH", percent_off=Decimal("20.00"), usage_limit=2)
+
+    def _license(self, slug: str) -> License:
+        tenant = Tenant.objects.create(slug=slug, name=slug)
+        return License.objects.create(tenant=tenant, tool=self.tool, status=License.Status.PENDING)
+
+    def _used(self) -> int:
+        return sum(CouponShard.objects.filter(coupon=self.coupon).values_list("used", flat=True))
+
+    def test_expired_holds_are_released(self):
+        stale, paid = self._license("stale"), self._license("paid")
+        CouponRedemption.objects.redeem(self.coupon, stale, expires_in=60)
+        CouponRedemption.objects.redeem(self.coupon, paid, expires_in=60)
+        License.objects.filter(pk=paid.pk).update(status=License.Status.ACTIVE)
+        CouponRedemption.objects.confirm(License.objects.filter(pk=paid.pk))
+        self.assertEqual(self._used(), 2)
+
+        CouponRedemption.objects.filter(license=stale).update(expires_at=now() - timedelta(seconds=1))
+        self.assertEqual(CouponRedemption.objects.release_expired(), 1)
+        self.assertEqual(self._used(), 1)
+        self.assertIsNotNone(CouponRedemption.objects.get(license=stale).released_at)
+        self.assertIsNone(CouponRedemption.objects.get(license=paid).released_at)
+        self.assertEqual(CouponRedemption.objects.release_expired(), 0)
+
+    def test_catalog_is_bumped_only_when_exhaustion_changes(self):
+        first, second = self._license("first"), self._license("second")
+        with mock.patch("marketplace.catalog.bump_catalog_version") as bump:
+            CouponRedemption.objects.redeem(self.coupon, first)
+            bump.assert_not_called()
+            CouponRedemption.objects.redeem(self.coupon, second)
+            bump.assert_called_once()
+            bump.reset_mock()
+            self.assertIsNone(CouponRedemption.objects.redeem(self.coupon, self._license("third")))
+            bump.assert_not_called()
+            CouponRedemption.objects.release(License.objects.filter(pk=first.pk))
+            bump.assert_called_once()
+            bump.reset_mock()
+            CouponRedemption.objects.release(License.objects.filter(pk=second.pk))
+            bump.assert_not_called()
+
+
+@override_settings(WEBHOOK_MAX_ATTEMPTS=2)
+class WebhookDeadLetterTests(TestCase):
+    """Failed tries are counted and an event out of attempts is dead-lettered, not swept forever."""
+
+    def setUp(self):
+        self.event = WebhookEvent.objects.create(event_key="txn:1", tx_ref="bogus", status="successful")
+        WebhookEvent.objects.filter(pk=self.event.pk).update(received_at=now() - timedelta(minutes=5))
+
+    def test_failures_count_attempts_then_dead_letter(self):
+        boom = RuntimeError("provider down")
+        with mock.patch("marketplace.tasks.apply_flutterwave_event", side_effect=boom):
+            with self.assertRaises(Exception):
+                process_flutterwave_event.apply(args=[self.event.pk], throw=True)
+            self.event.refresh_from_db()
+            self.assertEqual(self.event.attempts, 1)
+            self.assertIsNone(self.event.dead_lettered_at)
+
+            self.assertFalse(process_flutterwave_event.apply(args=[self.event.pk], throw=True).get())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attempts, 2)
+        self.assertIn("provider down", self.event.last_error)
+        self.assertIsNotNone(self.event.dead_lettered_at)
+
+    def test_sweeper_dead_letters_exhausted_events(self):
+        retry = WebhookEvent.objects.create(event_key="txn:2", tx_ref="bogus", status="successful", attempts=1)
+        WebhookEvent.objects.filter(pk=retry.pk).update(received_at=now() - timedelta(minutes=5))
+        WebhookEvent.objects.filter(pk=self.event.pk).update(attempts=2)
+        with mock.patch.object(process_flutterwave_event, "delay") as delay:
+            self.assertEqual(sweep_unprocessed_webhooks(), 1)
+        delay.assert_called_once_with(retry.pk)
+        self.event.refresh_from_db()
+        self.assertIsNotNone(self.event.dead_lettered_at)
+
+    def test_failed_attempt_pushes_the_due_time_past_the_countdown(self):
+        with mock.patch("marketplace.tasks.apply_flutterwave_event", side_effect=RuntimeError("provider down")):
+            with self.assertRaises(Exception):
+                process_flutterwave_event.apply(args=[self.event.pk], throw=True)
+        self.event.refresh_from_db()
+        self.assertGreater(self.event.next_attempt_at, now() + timedelta(seconds=25))
+
+
+class WebhookSweeperTests(TestCase):
+    """The sweeper re-enqueues only events whose due time passed without a task picking them up."""
+
+    def setUp(self):
+        self.received = now() - timedelta(minutes=10)
+
+    def _event(self, key: str, next_attempt_at=None) -> WebhookEvent:
+        event = WebhookEvent.objects.create(event_key=key, tx_ref="bogus", status="successful")
+        WebhookEvent.objects.filter(pk=event.pk).update(received_at=self.received, next_attempt_at=next_attempt_at)
+        return event
+
+    def _sweep(self) -> list:
+        with mock.patch.object(process_flutterwave_event, "delay") as delay:
+            sweep_unprocessed_webhooks()
+        return [call.args[0] for call in delay.call_args_list]
+
+    def test_queued_and_retrying_events_are_left_alone(self):
+        self._event("txn:queued", next_attempt_at=now() - timedelta(seconds=5))
+        self._event("txn:retrying", next_attempt_at=now() + timedelta(seconds=30))
+        self.assertEqual(self._sweep(), [])
+
+    def test_overdue_and_never_enqueued_events_are_requeued_once(self):
+        overdue = self._event("txn:overdue", next_attempt_at=now() - timedelta(minutes=5))
+        never = self._event("txn:never")
+        self.assertEqual(sorted(self._sweep()), sorted([overdue.pk, never.pk]))
+        overdue.refresh_from_db()
+        self.assertGreater(overdue.next_attempt_at, now() - timedelta(seconds=5))
+        self.assertEqual(overdue.enqueued_at, overdue.next_attempt_at)
+        # Requeued just now, so the next pass leaves them for the task.
+        self.assertEqual(self._sweep(), [])
+
+    def test_webhook_is_stored_as_queued(self):
+        with mock.patch.object(process_flutterwave_event, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    "/api/payments/flutterwave/webhook", {"data": {"id": 7, "tx_ref": "x", "status": "successful"}},
+                    content_type="application/json",
+                )
+        self.assertEqual(response.status_code, 200)
+        event = WebhookEvent.objects.get(event_key="txn:7")
+        self.assertIsNotNone(event.next_attempt_at)
+        delay.assert_called_once_with(event.pk)
+        self.assertEqual(self._sweep(), [])
+
+
+class LicenseAdminLedgerTests(TestCase):
+    """Admin edits and deletes go through the ledger, so tenant counters stay in step."""
+
+    def setUp(self):
+        self.model_admin = site._registry[License]
+        self.request = RequestFactory().post("/admin/")
+        self.tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=Decimal("40.00"))
+        self.tenant = Tenant.objects.create(slug="acme", name="Acme")
+
+    def _save(self, license: License, changed: list[str], change: bool = True) -> None:
+        self.model_admin.save_model(self.request, license, mock.Mock(changed_data=changed), change)
+
+    def _counters(self) -> tuple[int, int, int]:
+        self.tenant.refresh_from_db()
+        return self.tenant.active_licenses, self.tenant.canceled_licenses, self.tenant.total_licenses
+
+    def test_create_change_and_delete_are_recorded(self):
+        license = License(tenant=self.tenant, tool=self.tool, status=License.Status.ACTIVE)
+        self._save(license, ["tenant", "tool", "status"], change=False)
+        self.assertEqual(self._counters(), (1, 0, 1))
+
+        license.status = License.Status.CANCELED
+        self._save(license, ["status"])
+        self.assertEqual(self._counters(), (0, 1, 1))
+        self.assertEqual(
+            list(LicenseEvent.objects.filter(license=license).values_list("to_status", "mrr_delta")),
+            [("active", Decimal("40.00")), ("canceled", Decimal("-40.00"))],
+        )
+
+        license.status = License.Status.ACTIVE
+        self._save(license, ["status"])
+        self.model_admin.delete_model(self.request, license)
+        self.assertFalse(License.objects.exists())
+        self.assertEqual(self._counters(), (0, 0, 0))
+
+    def test_counters_never_go_negative(self):
+        license = License.objects.create(tenant=self.tenant, tool=self.tool, status=License.Status.ACTIVE)
+        self.model_admin.delete_model(self.request, license)
+        self.assertEqual(self._counters(), (0, 0, 0))
+
+
+class WidgetConfigViewTests(TestCase):
+    """The public widget config is served from the cached blob with an exact-match ETag."""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_caches()
+        self.tenant = Tenant.objects.create(slug="acme", name="Acme")
+        self.headers = {"HTTP_X_TENANT_ID": str(self.tenant.pk)}
+
+    def _get(self, **extra):
+        return self.client.get("/api/widget/config", **self.headers, **extra)
+
+    def test_anonymous_get_serves_the_tenant_config(self):
+        WidgetConfig.objects.create(tenant=self.tenant, theme="midnight", mark_text="ACME")
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["theme"], response.json()["mark_text"]), ("midnight", "ACME"))
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("X-Tenant-ID", response["Vary"])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self._get()["ETag"]
+        for header in (etag, f'"other", {etag}', f"W/{etag}", "*"):
+            response = self._get(HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response["ETag"], etag)
+
+    def test_etag_is_compared_whole(self):
+        etag = self._get()["ETag"]
+        for header in (f'"x{etag[1:]}', f'{etag[:-1]}x"', etag[1:-1], '"other"'):
+            self.assertEqual(self._get(HTTP_IF_NONE_MATCH=header).status_code, 200, header)
+
+    def test_saving_the_config_changes_the_etag(self):
+        config = WidgetConfig.objects.create(tenant=self.tenant, theme="frosted")
+        before = self._get()["ETag"]
+        config.theme = "midnight"
+        with self.captureOnCommitCallbacks(execute=True):
+            config.save()
+        response = self._get(HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], before)
+        self.assertEqual(response.json()["theme"], "midnight")
+
+    def test_cached_hit_runs_no_queries(self):
+        etag = self._get()["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get().status_code, 200)
+            self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class WidgetBootstrapInvalidationTests(TestCase):
+    """Saving or deleting the rows behind the bootstrap payload retires the cached copy."""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_caches()
+        self.tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=Decimal("100.00"))
+        self.tenant = Tenant.objects.create(slug="acme", name="Acme")
+
+    def _bootstrap(self) -> dict:
+        response = self.client.get("/api/widget/bootstrap?tool=estimator", HTTP_X_TENANT_ID=str(self.tenant.pk))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_material_edit_changes_the_payload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            material = MaterialSetting.objects.create(tenant=self.tenant, tool=self.tool, name="Slate")
+        self.assertEqual(self._bootstrap()["materials"], ["Slate"])
+
+        material.name = "Cedar"
+        with self.captureOnCommitCallbacks(execute=True):
+            material.save()
+        self.assertEqual(self._bootstrap()["materials"], ["Cedar"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            material.delete()
+        self.assertEqual(self._bootstrap()["materials"], [])
+
+    def test_license_save_changes_the_payload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            license = License.objects.create(tenant=self.tenant, tool=self.tool, status=License.Status.PENDING)
+        self.assertFalse(self._bootstrap()["licensed"])
+
+        license.status = License.Status.ACTIVE
+        with self.captureOnCommitCallbacks(execute=True):
+            license.save()
+        self.assertTrue(self._bootstrap()["licensed"])
+
+    def test_config_save_and_delete_change_the_payload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            config = WidgetConfig.objects.create(tenant=self.tenant, theme="midnight")
+        self.assertEqual(self._bootstrap()["config"]["theme"], "midnight")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            config.delete()
+        self.assertEqual(self._bootstrap()["config"]["theme"], self.tenant.widget_theme)
+
+
+class CatalogViewTests(TestCase):
+    """The tool list and detail are served as cached bytes until a Tool or Coupon is written."""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_caches()
+        self.tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=Decimal("100.00"))
+
+    def test_list_is_served_from_cached_bytes(self):
+        first = self.client.get("/api/marketplace/tools")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([tool["slug"] for tool in first.json()], ["estimator"])
+        self.assertNotIn("config_schema", first.json()[0])
+        with self.assertNumQueries(0):
+            again = self.client.get("/api/marketplace/tools")
+            not_modified = self.client.get("/api/marketplace/tools", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual((again.content, again["ETag"]), (first.content, first["ETag"]))
+        self.assertEqual(not_modified.status_code, 304)
+
+        expanded = self.client.get("/api/marketplace/tools?expand=all")
+        self.assertIn("config_schema", expanded.json()[0])
+        self.assertNotEqual(expanded["ETag"], first["ETag"])
+
+    def test_detail_and_unknown_slugs_are_cached(self):
+        first = self.client.get("/api/marketplace/tools/estimator")
+        self.assertEqual(first.json()["name"], "Estimator")
+        self.assertEqual(self.client.get("/api/marketplace/tools/missing").status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/marketplace/tools/estimator").content, first.content)
+            self.assertEqual(self.client.get("/api/marketplace/tools/missing").status_code, 404)
+
+    def test_tool_save_retires_the_rendered_catalog(self):
+        before = self.client.get("/api/marketplace/tools")
+        detail = self.client.get("/api/marketplace/tools/estimator")
+        self.tool.name = "Roof Estimator"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tool.save()
+
+        after = self.client.get("/api/marketplace/tools", HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        self.assertEqual(after.json()[0]["name"], "Roof Estimator")
+        self.assertEqual(self.client.get("/api/marketplace/tools/estimator").json()["name"], "Roof Estimator")
+        self.assertNotEqual(self.client.get("/api/marketplace/tools/estimator")["ETag"], detail["ETag"])
+
+    def test_coupon_save_retires_the_rendered_catalog(self):
+        before = self.client.get("/api/marketplace/tools/estimator")
+        self.assertIsNone(before.json()["coupon_code"])
+        with self.captureOnCommitCallbacks(execute=True):
+            coupon = Coupon.objects.create(tool=self.tool, code="LAUNCH", percent_off=Decimal("20.00"))
+        self.assertEqual(self.client.get("/api/marketplace/tools/estimator").json()["coupon_code"], "LAUNCH")
+
+        coupon.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            coupon.save()
+        after = self.client.get("/api/marketplace/tools/estimator")
+        self.assertIsNone(after.json()["coupon_code"])
+        self.assertEqual(after["ETag"], before["ETag"])
+
+
+class WidgetAssetViewTests(TestCase):
+    """Hashed bundle files are served precompressed, immutable and revalidated by ETag."""
+
+    def setUp(self):
+        dist = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(dist.cleanup)
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        (Path(dist.name) / "nex-widget.iife.js").write_bytes(b"console.log('widget');" * 50)
+        (Path(dist.name) / "style.css").write_bytes(b".nex{color:red}")
+        self.enterContext(override_settings(WIDGET_DIST_DIR=dist.name, WIDGET_ASSETS_ROOT=root.name))
+        self.enterContext(mock.patch.dict(assets._manifest_cache, {"mtime": None, "data": {}}))
+        self.name = assets.build()["nex-widget.js"]["name"]
+        (self.root / f"{self.name}.br").write_bytes(b"brotli bytes")
+
+    def _get(self, accept_encoding: str = "", **extra):
+        return self.client.get(f"/widget/{self.name}", HTTP_ACCEPT_ENCODING=accept_encoding, **extra)
+
+    def test_best_accepted_encoding_is_served(self):
+        for header, encoding, body in (
+            ("gzip, deflate, br", "br", b"brotli bytes"),
+            ("gzip, br;q=0", "gzip", (self.root / f"{self.name}.gz").read_bytes()),
+            ("", None, (self.root / self.name).read_bytes()),
+        ):
+            response = self._get(header)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get("Content-Encoding"), encoding, header)
+            self.assertEqual(b"".join(response.streaming_content), body)
+            self.assertEqual(response["Cache-Control"], assets.IMMUTABLE)
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertTrue(response["Content-Type"].startswith("application/javascript"))
+
+    def test_each_encoding_has_its_own_etag(self):
+        br, gz = self._get("br")["ETag"], self._get("gzip")["ETag"]
+        self.assertNotEqual(br, gz)
+        self.assertEqual(self._get("br", HTTP_IF_NONE_MATCH=br).status_code, 304)
+        self.assertEqual(self._get("gzip", HTTP_IF_NONE_MATCH=br).status_code, 200)
+        self.assertEqual(self._get("br", HTTP_IF_NONE_MATCH=br[:-1] + "x\"").status_code, 200)
+
+    def test_latest_redirects_to_the_fingerprinted_name(self):
+        response = self.client.get("/widget/latest.js")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], f"/widget/{self.name}")
+        self.assertEqual(response["Cache-Control"], assets.LATEST_CACHE_CONTROL)
+
+    def test_unknown_or_unhashed_names_are_404(self):
+        self.assertEqual(self.client.get("/widget/nex-widget.000000000000.js").status_code, 404)
+        self.assertEqual(self.client.get("/widget/manifest.json").status_code, 404)
+
+
+class LoadTestSeedTests(TestCase):
+    """Seeded licenses go through the ledger, so counters and MRR need no reconcile pass."""
+
+    def test_seeding_records_one_opening_event_per_license(self):
+        for _ in range(2):  # re-running only tops up
+            loadtest.seed(2, "loadtest", "http://127.0.0.1:9/hooks", leads_per_tenant=1)
+        events = LicenseEvent.objects.filter(tenant__slug__startswith=loadtest.SLUG_PREFIX)
+        self.assertEqual(
+            sorted(events.values_list("from_status", "to_status", "source")),
+            [("", License.Status.ACTIVE, LicenseEvent.Source.BACKFILL)] * 2,
+        )
+        for tenant in Tenant.objects.filter(slug__startswith=loadtest.SLUG_PREFIX):
+            self.assertEqual((tenant.active_licenses, tenant.total_licenses), (1, 1))
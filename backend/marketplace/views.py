@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from marketplace import assets
+from shared.utils import etag_matches
+
+
+@require_safe
+def widget_asset(request, name: str):
+    """A content-hashed bundle file; the best precompressed variant the client accepts."""
+    asset = assets.resolve(name, request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if asset is None:
+        raise Http404("Unknown widget asset.")
+    if etag_matches(request.META.get("HTTP_IF_NONE_MATCH", ""), asset.etag):
+        response = HttpResponse(status=304)
+    else:
+        response = FileResponse(asset.path.open("rb"), content_type=asset.content_type)
+        if asset.encoding:
+            response["Content-Encoding"] = asset.encoding
+    response["ETag"] = asset.etag
+    response["Cache-Control"] = assets.IMMUTABLE
+    patch_vary_headers(response, ["Accept-Encoding"])
+    response["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+def _latest(logical: str):
+    @require_safe
+    def view(request):
+        name = assets.latest_name(logical)
+        if name is None:
+            raise Http404("Widget assets have not been built.")
+        response = HttpResponseRedirect(f"/widget/{name}")
+        response["Cache-Control"] = assets.LATEST_CACHE_CONTROL
+        return response
+
+    return view
+
+
+widget_latest_js = _latest("nex-widget.js")
+widget_latest_css = _latest("style.css")
@@ -0,0 +1,91 @@
+"""
+Applying persisted payment webhooks. The HTTP view only stores and acknowledges;
+everything here runs in the worker.
+"""
+from __future__ import annotations
+
+import re
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from marketplace.models import CouponRedemption, License, LicenseEvent, WebhookEvent
+
+# tx_ref is built by OnboardingStartView as "<tenant uuid>-<tool slug>-<nonce uuid>".
+TX_REF_RE = re.compile(
+    r"^(?P<tenant>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})-(?P<tool>[-a-zA-Z0-9_]+?)"
+    r"(?:-[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})?$"
+)
+
+
+def parse_tx_ref(tx_ref: str) -> tuple[Optional[str], Optional[str]]:
+    match = TX_REF_RE.match(tx_ref or "")
+    if not match:
+        return None, None
+    return match.group("tenant"), match.group("tool")
+
+
+def flutterwave_fields(payload: dict) -> tuple[str, str, str]:
+    """(event_key, tx_ref, status) from either the v3 ``{"event", "data"}`` shape or a flat body."""
+    data = payload.get("data") if isinstance(payload.get("data"), dict) else payload
+    tx_ref = str(data.get("tx_ref") or "")
+    status = str(data.get("status") or "")
+    transaction_id = data.get("id")
+    event_key = f"txn:{transaction_id}" if transaction_id else f"{tx_ref}:{status}"
+    return event_key[:128], tx_ref, status
+
+
+def apply_flutterwave_event(event_id: int) -> bool:
+    """
+    Apply one stored event. Returns False when it was already handled, dead-lettered or is
+    held by another worker. A failure rolls back everything including ``attempts``; the
+    task records the failed attempt (``record_failed_attempt``).
+    """
+    with transaction.atomic():
+        event = (
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(pk=event_id, processed_at__isnull=True, dead_lettered_at__isnull=True)
+            .first()
+        )
+        if event is None:
+            return False
+        event.attempts = F("attempts") + 1
+        tenant_id, tool_slug = parse_tx_ref(event.tx_ref)
+        if not tenant_id or not tool_slug:
+            event.last_error = "unrecognised tx_ref"
+        else:
+            licenses = License.objects.filter(tenant_id=tenant_id, tool__slug=tool_slug)
+            if event.status == "successful":
+                LicenseEvent.objects.record(licenses, License.Status.ACTIVE, source=LicenseEvent.Source.WEBHOOK)
+                licenses.update(status=License.Status.ACTIVE)
+                CouponRedemption.objects.confirm(licenses)
+            else:
+                LicenseEvent.objects.record(licenses, License.Status.CANCELED, source=LicenseEvent.Source.WEBHOOK)
+                licenses.update(status=License.Status.CANCELED)
+                # A failed checkout gives its coupon use back to the pool.
+                CouponRedemption.objects.release(licenses)
+        event.processed_at = now()
+        event.save(update_fields=["attempts", "last_error", "processed_at"])
+    return True
+
+
+def record_failed_attempt(event_id: int, exc: Exception, retry_in: float = 0) -> bool:
+    """
+    Count a failed try and push ``next_attempt_at`` past the task's ``retry_in`` countdown;
+    returns True when it used the last one and the event was dead-lettered.
+    """
+    WebhookEvent.objects.filter(pk=event_id).update(
+        attempts=F("attempts") + 1, last_error=repr(exc)[:2000], next_attempt_at=now() + timedelta(seconds=retry_in)
+    )
+    return bool(
+        WebhookEvent.objects.filter(
+            pk=event_id,
+            processed_at__isnull=True,
+            dead_lettered_at__isnull=True,
+            attempts__gte=settings.WEBHOOK_MAX_ATTEMPTS,
+        ).update(dead_lettered_at=now())
+    )
@@ -0,0 +1,151 @@
+"""
+Precomputed widget payloads.
+
+Every embed fetches its tenant's theme on each page view, so the JSON is built once per
+tenant, kept in the shared cache with a content-hash ETag, and rebuilt when the config
+is written. The cache key carries ``Tenant.updated_at`` so tenant-level branding edits
+(used as defaults when there is no ``WidgetConfig`` row) roll over to a fresh entry.
+
+Both payloads are tagged with their tenant. Saving or deleting a ``License``,
+``MaterialSetting`` or ``WidgetConfig`` retires the tag from post_save/post_delete
+(connected in ``MarketplaceConfig.ready``); bulk paths that skip signals (``record()``,
+``bulk_create``) call ``bump_widget_generation`` themselves.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from django.db import transaction
+
+from adminpanel.images import srcset_for_url
+from marketplace.models import License, WidgetConfig
+from pricing.models import MaterialSetting
+from shared.cache import TieredCache
+from shared.tenant import Tenant
+
+DEFAULT_MARKETING_HOOK = "See Your Roof from Space & Get a Technical Estimate in 60 Seconds."
+CONFIG_FIELDS = ("primary_color", "secondary_color", "theme", "logo_url", "mark_text", "marketing_hook")
+CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=600"
+BLOB_TTL = 60 * 60 * 24
+# Safety net for queryset update()s that neither send signals nor call bump_widget_generation().
+BOOTSTRAP_TTL = 300
+
+widget_cache = TieredCache("widget", ttl=BLOB_TTL)
+
+
+@dataclass(frozen=True)
+class ConfigBlob:
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_data(cls, data: dict) -> "ConfigBlob":
+        return cls.from_body(json.dumps(data, sort_keys=True, separators=(",", ":")).encode())
+
+    @classmethod
+    def from_body(cls, body: bytes) -> "ConfigBlob":
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+PUBLIC_DEFAULT = ConfigBlob.from_data(
+    {
+        "primary_color": "#0A0F1A",
+        "secondary_color": "#1F6BFF",
+        "theme": "frosted",
+        "logo_url": "",
+        "mark_text": "neX",
+        "marketing_hook": DEFAULT_MARKETING_HOOK,
+        "logo_srcset": {},
+    }
+)
+
+
+def tenant_defaults(tenant: Tenant) -> dict:
+    """Initial ``WidgetConfig`` values, seeded from the tenant's branding."""
+    return {
+        "primary_color": tenant.primary_color,
+        "secondary_color": tenant.secondary_color,
+        "theme": tenant.widget_theme,
+        "logo_url": tenant.brand_logo_url,
+        "marketing_hook": DEFAULT_MARKETING_HOOK,
+    }
+
+
+def _config_key(tenant: Tenant) -> str:
+    return f"cfg:{tenant.pk}:{tenant.updated_at.timestamp():.6f}"
+
+
+def _tenant_tag(tenant_id) -> str:
+    return f"tenant:{tenant_id}"
+
+
+def build_config_blob(tenant: Tenant, config: Optional[WidgetConfig]) -> ConfigBlob:
+    if config is None:
+        config = WidgetConfig(tenant=tenant, **tenant_defaults(tenant))
+    data = {field: getattr(config, field) for field in CONFIG_FIELDS}
+    data["logo_srcset"] = srcset_for_url(config.logo_url)
+    return ConfigBlob.from_data(data)
+
+
+def store_config_blob(tenant: Tenant, config: Optional[WidgetConfig]) -> ConfigBlob:
+    blob = build_config_blob(tenant, config)
+    widget_cache.set(_config_key(tenant), blob, tags=[_tenant_tag(tenant.pk)])
+    return blob
+
+
+def config_blob(tenant: Optional[Tenant]) -> ConfigBlob:
+    """The tenant's widget config payload; only a cache miss reads ``WidgetConfig``."""
+    if tenant is None:
+        return PUBLIC_DEFAULT
+    return widget_cache.get_or_set(
+        _config_key(tenant),
+        lambda: build_config_blob(tenant, WidgetConfig.objects.filter(tenant=tenant).first()),
+        tags=[_tenant_tag(tenant.pk)],
+    )
+
+
+def bump_widget_generation(tenant_ids) -> None:
+    """Retire cached widget payloads for ``tenant_ids`` once the current transaction commits."""
+    tags = [_tenant_tag(tenant_id) for tenant_id in set(tenant_ids)]
+    transaction.on_commit(lambda: widget_cache.invalidate_tags(*tags))
+
+
+def retire_widget_payloads(sender, instance, **kwargs) -> None:
+    """post_save/post_delete receiver for the rows the tenant's payloads are built from."""
+    if instance.tenant_id is not None:
+        bump_widget_generation([instance.tenant_id])
+
+
+def rebuild_config_blob(sender, instance, **kwargs) -> None:
+    """post_save receiver for ``WidgetConfig``: retire the tenant's payloads, then store the new config."""
+    bump_widget_generation([instance.tenant_id])
+    transaction.on_commit(lambda: store_config_blob(instance.tenant, instance))
+
+
+def bootstrap_blob(tenant: Optional[Tenant], tool_slug: str) -> ConfigBlob:
+    """Everything the embed needs on load: theme, license status and material names."""
+    if tenant is None:
+        return ConfigBlob.from_data(
+            {"tool": tool_slug, "config": json.loads(PUBLIC_DEFAULT.body), "licensed": False, "materials": []}
+        )
+
+    def build() -> ConfigBlob:
+        materials = (
+            MaterialSetting.objects.filter(tenant=tenant, tool__slug=tool_slug).order_by("name").values_list("name", flat=True)
+        )
+        return ConfigBlob.from_data(
+            {
+                "tool": tool_slug,
+                "config": json.loads(config_blob(tenant).body),
+                "licensed": License.objects.filter(
+                    tenant=tenant, tool__slug=tool_slug, status=License.Status.ACTIVE
+                ).exists(),
+                "materials": list(materials),
+            }
+        )
+
+    key = f"boot:{tenant.pk}:{tool_slug}:{tenant.updated_at.timestamp():.6f}"
+    return widget_cache.get_or_set(key, build, tags=[_tenant_tag(tenant.pk)], ttl=BOOTSTRAP_TTL)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from rest_framework import permissions, serializers, status, views
+from rest_framework import serializers, status, views
 from rest_framework.response import Response
 
 from marketplace.models import Tool
+from marketplace.permissions import IsTenantMember
+from marketplace.widget import bump_widget_generation
 from pricing.models import MaterialSetting
 
 
@@ -18,14 +20,14 @@ class MaterialSettingSerializer(serializers.ModelSerializer):
 
 
 class MaterialSettingBulkView(views.APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsTenantMember]
 
     def get(self, request, *args, **kwargs):
         tenant = getattr(request, "tenant", None)
         if tenant is None:
             return Response({"detail": "Tenant not resolved"}, status=status.HTTP_400_BAD_REQUEST)
         tool_slug = request.query_params.get("tool")
-        qs = MaterialSetting.objects.filter(tenant=tenant)
+        qs = MaterialSetting.objects.filter(tenant=tenant).select_related("tool")
         if tool_slug:
             qs = qs.filter(tool__slug=tool_slug)
         serializer = MaterialSettingSerializer(qs, many=True)
@@ -41,12 +43,15 @@ class MaterialSettingBulkView(views.APIView):
         if tool_slug:
             tool = Tool.objects.filter(slug=tool_slug).first()
 
-        # Replace existing for this tenant/tool
-        MaterialSetting.objects.filter(tenant=tenant, tool=tool).delete()
+        # Replace existing for this tenant/tool. One raw DELETE: a plain delete() would load
+        # every row to send post_delete, and bump_widget_generation() below covers the lot.
+        existing = MaterialSetting.objects.filter(tenant=tenant, tool=tool)
+        existing._raw_delete(existing.db)
         serializer = MaterialSettingSerializer(data=materials, many=True)
         serializer.is_valid(raise_exception=True)
         objs = []
         for item in serializer.validated_data:
             objs.append(MaterialSetting(tenant=tenant, tool=tool, **item))
         MaterialSetting.objects.bulk_create(objs)
+        bump_widget_generation([tenant.pk])
         return Response(MaterialSettingSerializer(objs, many=True).data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.views import APIView
+
+
+def _is_model_field(model, name: str) -> bool:
+    try:
+        model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+class ViewOrderedCursorPagination(CursorPagination):
+    """
+    Cursor pagination whose ordering comes from the view's ``cursor_ordering`` so one
+    class serves viewsets sorted on different columns.
+
+    DRF's cursor records only the first ordering field and steps over rows that share
+    it with an offset. This one records every field and filters on the whole key, so a
+    repeated name pages by its tie-breaker instead. End the ordering with a unique
+    column, and prefer columns that don't change while a client pages through.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [
+            instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            for name in (field.lstrip("-") for field in ordering)
+        ]
+        return json.dumps([str(value) for value in values])
+
+    def _after(self, position: str, reverse: bool) -> Q:
+        """Rows past ``position`` in scan order: (a, b) > (x, y) as a > x or (a = x and b > y)."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        after = Q(pk__in=[])
+        ties = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") != reverse else "gt"
+            after |= ties & Q(**{f"{name}__{lookup}": value})
+            ties &= Q(**{name: value})
+        return after
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # DRF's implementation, with the single-field position filter swapped for ``_after``.
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            queryset = queryset.filter(self._after(current_position, reverse))
+
+        results = list(queryset[offset : offset + self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_following = len(results) > len(self.page)
+        following_position = self._get_position_from_instance(results[-1], self.ordering) if has_following else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=a,b`` narrows both the serializer output and the SELECT list of GET
+    requests. Without the parameter, list views fall back to ``list_fields`` so heavy
+    columns are only loaded on detail views or when explicitly asked for.
+    """
+
+    fields_param = "fields"
+    list_fields: Optional[tuple[str, ...]] = None
+
+    def get_sparse_fields(self) -> Optional[list[str]]:
+        if not hasattr(self, "_sparse_fields"):
+            self._sparse_fields = self._resolve_sparse_fields()
+        return self._sparse_fields
+
+    def _resolve_sparse_fields(self) -> Optional[list[str]]:
+        if self.request is None or self.request.method not in ("GET", "HEAD"):
+            return None
+        raw = self.request.query_params.get(self.fields_param)
+        if raw:
+            requested = [name.strip() for name in raw.split(",") if name.strip()]
+        elif getattr(self, "action", None) == "list" and self.list_fields:
+            requested = list(self.list_fields)
+        else:
+            return None
+        available = self.get_serializer_class()().fields
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError({self.fields_param: f"Unknown field(s): {', '.join(unknown)}"})
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields:
+            target = getattr(serializer, "child", serializer)
+            for name in set(target.fields) - set(fields):
+                target.fields.pop(name)
+        return serializer
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if not fields:
+            return qs
+        declared = self.get_serializer_class()().fields
+        columns = {"pk"}
+        relations = set()
+        for name in fields:
+            source = declared[name].source
+            if source == "*":
+                return qs
+            parts = source.split(".")
+            if not _is_model_field(qs.model, parts[0]):
+                # Properties are expected to work off the pk or a prefetch, not extra columns.
+                continue
+            columns.add("__".join(parts))
+            if len(parts) > 1:
+                relations.add("__".join(parts[:-1]))
+        ordering = getattr(self, "cursor_ordering", None) or ()
+        for field in (ordering,) if isinstance(ordering, str) else ordering:
+            columns.add(field.lstrip("-"))
+        qs = qs.select_related(None)
+        if relations:
+            qs = qs.select_related(*relations)
+        return qs.only(*columns)
+
+
+class AsyncAPIView(APIView):
+    """
+    ``APIView`` that Django treats as an async view, so handlers written as coroutines
+    can await network calls without holding a worker thread (ASGI mode). Authentication,
+    permission and throttle checks may query the DB and run in one ``sync_to_async`` hop;
+    plain (sync) handlers on the same class run the same way.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,380 @@
+"""
+Two-tier caching: a per-process LRU (L1) in front of the shared Django cache (L2, Redis
+in deployment).
+
+``TieredCache`` is one named namespace of that. Entries can be retired in bulk, either
+by bumping the namespace version (``bump``) or by tag (``invalidate_tags``): versions
+are counters in L2, and an entry remembers the tag versions it was built under, so a
+stale entry is simply never read again and ages out. ``get_or_set`` is single-flight:
+concurrent misses for a key build it once per process, and a short ``cache.add`` lock
+makes other processes wait for that build instead of repeating it.
+
+L1 entries, and the version counters L1 has seen, are trusted for ``LOCAL_TTL``
+seconds, so another process's invalidation can take that long to show up here. Keep it
+short for anything users edit and expect to see at once.
+
+Model instances are cached as plain column dicts (``get_instance``), never pickled, so
+a deploy that changes a model can't load an object of the old shape from L2.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from shared.metrics import observe_cache
+
+DEFAULTS = {"LOCAL_SIZE": 1024, "LOCAL_TTL": 5.0, "LOCK_TIMEOUT": 5.0}
+COUNTERS = ("l1_hits", "l2_hits", "coalesced", "misses", "invalidations")
+
+_MISSING = object()
+_registry: dict[str, "TieredCache"] = {}
+
+
+def _setting(name: str):
+    return getattr(settings, "TIERED_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def _seed() -> int:
+    # Counters start from the clock, so one evicted from L2 and recreated never
+    # repeats a value an old entry was stamped with.
+    return time.time_ns() // 1000
+
+
+class LocalLRUCache:
+    """
+    Bounded, thread-safe in-process LRU whose entries also expire after ``ttl`` seconds.
+    Meant to sit in front of the shared Django cache for hot, small values; other
+    processes can't evict from it, so keep ``ttl`` as short as staleness allows. A
+    ``ttl`` of 0 turns it off.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TieredCache:
+    """
+    A cache namespace over L1 + L2. Any value can be cached, ``None`` included, so a
+    "not found" lookup is cached like any other result.
+
+    ``versioned`` namespaces read one extra counter per lookup and can be retired
+    wholesale with ``bump()``; leave it off when entries are only dropped by key or tag.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: Optional[float] = 300,
+        *,
+        versioned: bool = False,
+        local_size: Optional[int] = None,
+        local_ttl: Optional[float] = None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.versioned = versioned
+        self.local = LocalLRUCache(
+            maxsize=local_size or _setting("LOCAL_SIZE"),
+            ttl=_setting("LOCAL_TTL") if local_ttl is None else local_ttl,
+        )
+        self._version_key = f"{namespace}:#version"
+        self._flights: dict[str, list] = {}
+        self._flights_lock = threading.Lock()
+        self._stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        _registry[namespace] = self
+
+    # -- public API -------------------------------------------------------------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            self._count("misses")
+            return default
+        return value
+
+    def set(self, key: str, value: Any, *, tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        self._store(self._full_key(key), value, self._snapshot(tags), ttl)
+
+    def get_or_set(
+        self, key: str, build: Callable[[], Any], *, tags: Iterable[str] = (), ttl: Optional[float] = None
+    ) -> Any:
+        """``key``'s value, calling ``build`` (at most once across concurrent callers) on a miss."""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        with self._flight(key):
+            value = self._lookup(key, count=False)
+            if value is not _MISSING:
+                self._count("coalesced")
+                return value
+            return self._build(key, build, tuple(tags), ttl)
+
+    async def aget_or_set(
+        self, key: str, build: Callable[[], Any], *, tags: Iterable[str] = (), ttl: Optional[float] = None
+    ) -> Any:
+        """
+        ``get_or_set`` for async code. An L1 hit returns without leaving the event loop;
+        anything else takes a single thread hop, where the (sync) ``build`` runs too.
+        """
+        value = self._lookup(key, local_only=True)
+        if value is not _MISSING:
+            return value
+        return await sync_to_async(self.get_or_set)(key, build, tags=tags, ttl=ttl)
+
+    def delete(self, *keys: str) -> None:
+        full_keys = [self._full_key(key) for key in keys]
+        self.local.delete(*full_keys)
+        cache.delete_many(full_keys)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        """Retire every entry built under any of ``tags``."""
+        for tag_key in {self._tag_key(tag) for tag in tags}:
+            self._incr(tag_key)
+        self._count("invalidations")
+
+    def bump(self) -> None:
+        """Retire every entry in a ``versioned`` namespace."""
+        self._incr(self._version_key)
+        self._count("invalidations")
+
+    def version(self) -> Any:
+        return self._counters([self._version_key])[self._version_key]
+
+    def stats(self) -> dict:
+        """This process's counters; ``hit_ratio`` counts coalesced waits as hits."""
+        with self._stats_lock:
+            counts = {name: self._stats[name] for name in COUNTERS}
+        lookups = counts["l1_hits"] + counts["l2_hits"] + counts["coalesced"] + counts["misses"]
+        return {
+            **counts,
+            "hit_ratio": round((lookups - counts["misses"]) / lookups, 4) if lookups else None,
+            "local_entries": len(self.local),
+        }
+
+    # -- internals ---------------------------------------------------------------
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+        observe_cache(self.namespace, name)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.namespace}:#tag:{tag}"
+
+    def _incr(self, key: str) -> None:
+        self.local.delete(key)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _seed(), None)
+
+    def _counters(self, keys: list[str], local_only: bool = False) -> Optional[dict]:
+        """Current values of version/tag counters, creating missing ones. ``None`` if ``local_only`` can't answer."""
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if not missing:
+            return found
+        if local_only:
+            return None
+        fetched = cache.get_many(missing)
+        unseeded = [key for key in missing if key not in fetched]
+        if unseeded:
+            for key in unseeded:
+                cache.add(key, _seed(), None)
+            fetched.update(cache.get_many(unseeded))
+        for key in missing:
+            found[key] = fetched.get(key)
+            self.local.set(key, found[key])
+        return found
+
+    def _full_key(self, key: str, local_only: bool = False) -> Optional[str]:
+        if not self.versioned:
+            return f"{self.namespace}:{key}"
+        versions = self._counters([self._version_key], local_only)
+        return None if versions is None else f"{self.namespace}:{versions[self._version_key]}:{key}"
+
+    def _snapshot(self, tags: Iterable[str]) -> dict:
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        return self._counters(tag_keys) if tag_keys else {}
+
+    def _fresh(self, entry: tuple, local_only: bool = False) -> Optional[bool]:
+        snapshot = entry[1]
+        if not snapshot:
+            return True
+        current = self._counters(list(snapshot), local_only)
+        return None if current is None else current == snapshot
+
+    def _lookup(self, key: str, local_only: bool = False, count: bool = True) -> Any:
+        full_key = self._full_key(key, local_only)
+        if full_key is None:
+            return _MISSING
+        entry = self.local.get(full_key)
+        if entry is not None:
+            fresh = self._fresh(entry, local_only)
+            if fresh:
+                if count:
+                    self._count("l1_hits")
+                return entry[0]
+            if fresh is False:
+                self.local.delete(full_key)
+        if local_only:
+            return _MISSING
+        entry = cache.get(full_key)
+        if entry is not None and self._fresh(entry):
+            self.local.set(full_key, entry)
+            if count:
+                self._count("l2_hits")
+            return entry[0]
+        return _MISSING
+
+    def _store(self, full_key: str, value: Any, snapshot: dict, ttl: Optional[float]) -> None:
+        entry = (value, snapshot)
+        cache.set(full_key, entry, self.ttl if ttl is None else ttl)
+        self.local.set(full_key, entry)
+
+    @contextmanager
+    def _flight(self, key: str):
+        """Serialise builders of ``key`` within this process."""
+        with self._flights_lock:
+            flight = self._flights.setdefault(key, [threading.Lock(), 0])
+            flight[1] += 1
+        try:
+            with flight[0]:
+                yield
+        finally:
+            with self._flights_lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    del self._flights[key]
+
+    def _build(self, key: str, build: Callable[[], Any], tags: tuple, ttl: Optional[float]) -> Any:
+        lock_key = f"{self.namespace}:#lock:{key}"
+        lock_timeout = _setting("LOCK_TIMEOUT")
+        locked = cache.add(lock_key, 1, lock_timeout)
+        if not locked:
+            # Another process is building it: wait for its result, then give up and build.
+            deadline = time.monotonic() + lock_timeout
+            delay = 0.01
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+                value = self._lookup(key, count=False)
+                if value is not _MISSING:
+                    self._count("coalesced")
+                    return value
+                if cache.get(lock_key) is None:
+                    break
+        self._count("misses")
+        try:
+            # Versions are read before building, so an invalidation that lands mid-build
+            # leaves this entry already stale rather than hiding the change.
+            full_key = self._full_key(key)
+            snapshot = self._snapshot(tags)
+            value = build()
+            self._store(full_key, value, snapshot, ttl)
+            return value
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+
+def _columns(model) -> list[str]:
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _row(instance) -> Optional[dict]:
+    return None if instance is None else {name: getattr(instance, name) for name in _columns(type(instance))}
+
+
+def _current(model, row: Optional[dict]) -> bool:
+    return row is None or set(row) == set(_columns(model))
+
+
+def _instance(model, row: Optional[dict]):
+    if row is None:
+        return None
+    names = _columns(model)
+    return model.from_db(DEFAULT_DB_ALIAS, names, [row[name] for name in names])
+
+
+def get_instance(tiered: TieredCache, key: str, model, lookup: Callable[[], Any]):
+    """
+    ``lookup()`` (an instance of ``model`` or ``None``) through ``tiered``, stored as a
+    dict of column values. Each call returns a new instance, so callers may modify it.
+    A row cached by a build with other columns is dropped and looked up again.
+    """
+    row = tiered.get_or_set(key, lambda: _row(lookup()))
+    if not _current(model, row):
+        tiered.delete(key)
+        row = tiered.get_or_set(key, lambda: _row(lookup()))
+    return _instance(model, row)
+
+
+async def aget_instance(tiered: TieredCache, key: str, model, lookup: Callable[[], Any]):
+    """``get_instance`` for async code; an L1 hit stays on the event loop."""
+    row = await tiered.aget_or_set(key, lambda: _row(lookup()))
+    if not _current(model, row):
+        return await sync_to_async(get_instance)(tiered, key, model, lookup)
+    return _instance(model, row)
+
+
+def clear_local_caches() -> None:
+    """Empty the L1 of every namespace in this process; L2 is left alone."""
+    for tiered in _registry.values():
+        tiered.local.clear()
+
+
+def cache_stats() -> dict[str, dict]:
+    """``TieredCache.stats()`` for every namespace in this process."""
+    return {name: tiered.stats() for name, tiered in sorted(_registry.items())}
@@ -0,0 +1,139 @@
+"""
+Read-replica routing.
+
+Nothing goes to the ``replica`` alias unless a view opts in with ``ReplicaReadMixin``
+(or code wraps itself in ``reading_from_replica()``); everything else, and every write,
+stays on ``default``. A request that writes pins its user to the primary for
+``REPLICA_STICKY_SECONDS`` so the next page load reads its own writes instead of
+whatever the replica has replayed so far.
+
+The alias is chosen through a ``ContextVar``, so concurrent requests on one thread
+(ASGI) or in different threads (WSGI) never see each other's choice.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = "replica"
+PRIMARY = "default"
+
+_read_alias: ContextVar[Optional[str]] = ContextVar("read_alias", default=None)
+_wrote: ContextVar[bool] = ContextVar("wrote", default=False)
+
+
+def replica_configured() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+def sticky_seconds() -> int:
+    return int(getattr(settings, "REPLICA_STICKY_SECONDS", 10))
+
+
+def _pin_key(user_id) -> str:
+    return f"dbpin:{user_id}"
+
+
+def is_pinned(user) -> bool:
+    return bool(user is not None and user.is_authenticated and cache.get(_pin_key(user.pk)))
+
+
+@contextmanager
+def reading_from_replica():
+    """Send reads inside the block to the replica, when one is configured."""
+    token = _read_alias.set(REPLICA if replica_configured() else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Reads follow the per-request choice (primary by default); writes and migrations stay on the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaReadMixin:
+    """
+    DRF view opt-in: safe requests read from the replica once the caller is
+    authenticated, unless a recent write of theirs has pinned them to the primary.
+    Authentication itself always reads the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and replica_configured() and not is_pinned(request.user):
+            _read_alias.set(REPLICA)
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Scopes the read alias to one request and, when the request wrote anything, pins the
+    user to the primary for ``REPLICA_STICKY_SECONDS``. Place it after the auth middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        alias_token, wrote_token = _read_alias.set(None), _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            self._pin(request)
+        finally:
+            _read_alias.reset(alias_token)
+            _wrote.reset(wrote_token)
+        return response
+
+    async def __acall__(self, request):
+        alias_token, wrote_token = _read_alias.set(None), _wrote.set(False)
+        try:
+            response = await self.get_response(request)
+            if _wrote.get():
+                await self._apin(request)
+        finally:
+            _read_alias.reset(alias_token)
+            _wrote.reset(wrote_token)
+        return response
+
+    @staticmethod
+    def _user_id(request):
+        user = getattr(request, "user", None)
+        return user.pk if user is not None and user.is_authenticated else None
+
+    def _pin(self, request) -> None:
+        user_id = self._user_id(request)
+        if _wrote.get() and user_id is not None and replica_configured():
+            cache.set(_pin_key(user_id), 1, sticky_seconds())
+
+    async def _apin(self, request) -> None:
+        # request.user may still be the session middleware's lazy object, which queries on first use.
+        user_id = await sync_to_async(self._user_id)(request)
+        if user_id is not None and replica_configured():
+            await cache.aset(_pin_key(user_id), 1, sticky_seconds())
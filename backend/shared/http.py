@@ -0,0 +1,282 @@
+"""
+Outbound HTTP for third-party calls (payments, tenant webhooks).
+
+One pooled ``requests.Session`` per host keeps TCP/TLS connections warm between calls,
+every request gets connect/read timeouts, and a per-host circuit breaker fails fast
+while a provider is down instead of parking web workers on it. Latencies are kept in
+process-local histograms per host and outcome.
+
+Async views call ``arequest``/``apost``, which share the same breakers and histograms.
+Their connections are only pooled under ASGI: the lifespan handler in ``config.asgi``
+calls ``pool_async_clients()`` at startup, so that worker's long-lived loop keeps one
+``httpx.AsyncClient`` per host until ``aclose()`` at shutdown. Anywhere else (WSGI,
+``runserver``, scripts) each loop is short-lived, so every call opens and closes its own
+client rather than leaving one behind per loop.
+
+Webhook hosts come from tenants, so per-host state lives in an LRU of ``MAX_HOSTS``
+entries instead of growing for the life of the worker: the least recently used host's
+session (or pooled async client) is closed on eviction and its breaker and histograms are
+dropped; a host that comes back starts with a closed breaker and empty histograms.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from shared.metrics import observe_outbound
+
+DEFAULTS = {
+    "CONNECT_TIMEOUT": 3.05,
+    "READ_TIMEOUT": 10.0,
+    "POOL_MAXSIZE": 10,
+    "BREAKER_FAILURES": 5,
+    "BREAKER_RESET_SECONDS": 30.0,
+    "MAX_HOSTS": 256,
+}
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _setting(name: str):
+    return getattr(settings, "OUTBOUND_HTTP", {}).get(name, DEFAULTS[name])
+
+
+class CircuitOpen(requests.RequestException):
+    """Raised without touching the network while a host's breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed until ``failures`` consecutive errors, then open for ``reset_seconds``. After
+    that one trial call is let through (half-open): success closes it, failure re-opens.
+    """
+
+    def __init__(self, failures: int, reset_seconds: float):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._errors = 0
+        self._opened_at: float | None = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._trial_running = False
+            if ok:
+                self._errors = 0
+                self._opened_at = None
+                return
+            self._errors += 1
+            if self._opened_at is not None or self._errors >= self.failures:
+                self._opened_at = time.monotonic()
+
+
+class LatencyHistogram:
+    """Cumulative-bucket histogram in the Prometheus style (``le`` upper bounds, plus +Inf)."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.total
+        cumulative, running = {}, 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "count": running, "sum": total}
+
+
+class _Host:
+    """Everything kept per host: the pooled session, the breaker and one histogram per outcome."""
+
+    __slots__ = ("session", "breaker", "histograms")
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_setting("POOL_MAXSIZE"), max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = CircuitBreaker(_setting("BREAKER_FAILURES"), _setting("BREAKER_RESET_SECONDS"))
+        self.histograms: dict[str, LatencyHistogram] = {}
+
+
+class OutboundClient:
+    def __init__(self):
+        # host -> _Host, least recently used first.
+        self._hosts: OrderedDict[str, _Host] = OrderedDict()
+        # Loops registered by pool_async_clients() -> OrderedDict{host: AsyncClient}; a client
+        # is bound to the loop that created it.
+        self._async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._closing: set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> _Host:
+        evicted = []
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _Host()
+                while len(self._hosts) > _setting("MAX_HOSTS"):
+                    evicted.append(self._hosts.popitem(last=False)[1])
+            else:
+                self._hosts.move_to_end(host)
+        # In-flight calls on an evicted session finish; its idle connections are closed.
+        for old in evicted:
+            old.session.close()
+        return state
+
+    def _session(self, host: str) -> requests.Session:
+        return self._host(host).session
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        return self._host(host).breaker
+
+    def _observe(self, host: str, outcome: str, seconds: float) -> None:
+        histograms = self._host(host).histograms
+        histogram = histograms.get(outcome)
+        if histogram is None:
+            with self._lock:
+                histogram = histograms.setdefault(outcome, LatencyHistogram())
+        histogram.observe(seconds)
+        observe_outbound(host, outcome, seconds)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        ``requests``-compatible call. Connection errors, timeouts and 5xx responses count
+        against the host's breaker; 4xx are the caller's problem and count as healthy.
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            self._observe(host, "short_circuit", 0.0)
+            raise CircuitOpen(f"circuit open for {host}")
+        kwargs.setdefault("timeout", (_setting("CONNECT_TIMEOUT"), _setting("READ_TIMEOUT")))
+        started = time.perf_counter()
+        try:
+            response = self._session(host).request(method, url, **kwargs)
+        except requests.RequestException:
+            breaker.record(False)
+            self._observe(host, "error", time.perf_counter() - started)
+            raise
+        ok = response.status_code < 500
+        breaker.record(ok)
+        self._observe(host, "ok" if ok else "error", time.perf_counter() - started)
+        return response
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def _new_async_client(self) -> httpx.AsyncClient:
+        pool = _setting("POOL_MAXSIZE")
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+            timeout=httpx.Timeout(_setting("READ_TIMEOUT"), connect=_setting("CONNECT_TIMEOUT")),
+        )
+
+    def _async_client(self, host: str) -> httpx.AsyncClient | None:
+        """The running loop's pooled client for ``host``, or None when the loop isn't pooled."""
+        clients = self._async_clients.get(asyncio.get_running_loop())
+        if clients is None:
+            return None
+        client = clients.get(host)
+        if client is None:
+            client = clients[host] = self._new_async_client()
+            while len(clients) > _setting("MAX_HOSTS"):
+                task = asyncio.ensure_future(clients.popitem(last=False)[1].aclose())
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+        else:
+            clients.move_to_end(host)
+        return client
+
+    def pool_async_clients(self) -> None:
+        """Pool async clients on the running loop until ``aclose()``; for loops that live as long as the worker."""
+        self._async_clients.setdefault(asyncio.get_running_loop(), OrderedDict())
+
+    async def aclose(self) -> None:
+        """Close and forget the running loop's pooled clients."""
+        clients = self._async_clients.pop(asyncio.get_running_loop(), {})
+        await asyncio.gather(*(client.aclose() for client in clients.values()))
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Coroutine twin of ``request()`` for async views. ``timeout`` is a number of seconds
+        or an ``httpx.Timeout``; transport errors surface as ``httpx.HTTPError``.
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            self._observe(host, "short_circuit", 0.0)
+            raise CircuitOpen(f"circuit open for {host}")
+        pooled = self._async_client(host)
+        started = time.perf_counter()
+        try:
+            async with contextlib.nullcontext(pooled) if pooled else self._new_async_client() as client:
+                response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            breaker.record(False)
+            self._observe(host, "error", time.perf_counter() - started)
+            raise
+        ok = response.status_code < 500
+        breaker.record(ok)
+        self._observe(host, "ok" if ok else "error", time.perf_counter() - started)
+        return response
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def stats(self) -> dict:
+        """Per-host breaker state and latency histograms, for dashboards and exporters."""
+        with self._lock:
+            hosts = list(self._hosts.items())
+        return {
+            host: {
+                "circuit": state.breaker.state,
+                "latency": {outcome: histogram.snapshot() for outcome, histogram in list(state.histograms.items())},
+            }
+            for host, state in hosts
+        }
+
+
+outbound = OutboundClient()
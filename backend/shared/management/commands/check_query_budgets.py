@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from config.query_budgets import BUDGETS
+from shared.query_budgets import budget_routes, run
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay every endpoint in config/query_budgets.py against a throwaway database at each size "
+        "and fail on a blown budget, an unexpected status or a query count that grows with the data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,1000", help="Rows per table for each pass, comma separated.")
+        parser.add_argument("--route", action="append", default=[], help="Only check this URL name (repeatable).")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options["sizes"].split(",")})
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers, e.g. 10,1000")
+        if sizes[0] < 2:
+            raise CommandError("Sizes must be at least 2 rows.")
+
+        problems = []
+        routes = budget_routes()
+        budgeted = {case.route for case in BUDGETS}
+        unknown = set(options["route"]) - budgeted
+        if unknown:
+            raise CommandError(f"No budget for: {', '.join(sorted(unknown))}")
+        if not options["route"]:
+            problems += [f"{name}: no budget in config/query_budgets.py" for name in sorted(routes - budgeted)]
+        problems += [f"{name}: not a URL name in config/urls.py" for name in sorted(budgeted - routes)]
+        cases = [case for case in BUDGETS if not options["route"] or case.route in options["route"]]
+
+        # Like the test runner, replay with DEBUG off so DEBUG-only behaviour doesn't leak in.
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run(cases, sizes)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        counts = "".join(f"{f'@{size}':>7}" for size in sizes)
+        self.stdout.write(f"{'route':<24}{'request':<56}{'budget':>7}{counts}  status")
+        for result in results:
+            case, failures = result.case, result.failures()
+            row = "".join(f"{result.queries[size]:>7}" for size in sizes)
+            statuses = "/".join(str(code) for code in dict.fromkeys(result.statuses.values()))
+            line = f"{case.route:<24}{case.label[:55]:<56}{case.budget:>7}{row}  {statuses}"
+            self.stdout.write(self.style.ERROR(line) if failures else line)
+            for failure in failures:
+                problems.append(f"{case.route} ({case.label}): {failure}")
+            if failures and options["verbosity"] > 1:
+                for sql, n in result.repeated():
+                    self.stdout.write(f"    {n}x {sql[:200]}")
+        if problems:
+            raise CommandError("Query budget check failed:\n  " + "\n  ".join(problems))
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} request(s) within budget at {', '.join(map(str, sizes))} rows."))
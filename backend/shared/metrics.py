@@ -0,0 +1,211 @@
+"""
+Prometheus metrics, exposed at ``/metrics``.
+
+- ``http_request_duration_seconds``: latency by URL name (``config/urls.py``), method,
+  status class and tenant plan.
+- ``http_request_db_queries``: queries per request, by URL name.
+- ``outbound_request_duration_seconds``: third-party call latency from ``shared.http``,
+  by service (Flutterwave, or ``webhook`` for tenant endpoints) and outcome.
+- ``cache_events_total``: ``TieredCache`` hits (``l1_hits``/``l2_hits``/``coalesced``),
+  ``misses`` and ``invalidations`` by namespace; the hit ratio is derived in PromQL.
+- ``celery_task_duration_seconds``: task run time by task name and final state.
+
+Under gunicorn or Celery's prefork pool every process keeps its own samples, so set
+``PROMETHEUS_MULTIPROC_DIR`` (``gunicorn.conf.py`` does) before the processes start:
+each one then writes to files there and the endpoint adds them up. Without it (e.g.
+``runserver``) the process's own registry is served.
+"""
+from __future__ import annotations
+
+import hmac
+import os
+import shutil
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery.signals import task_postrun, task_prerun, worker_init, worker_process_shutdown
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+DEFAULTS = {"TOKEN": "", "OUTBOUND_SERVICES": {"api.flutterwave.com": "flutterwave"}, "CELERY_PORT": 0}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+# Any other verb is labelled "other": clients choose the method, and each new label value is a new series.
+METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by URL name.",
+    ["route", "method", "status", "plan"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries per request by URL name.", ["route"], buckets=QUERY_BUCKETS
+)
+OUTBOUND_LATENCY = Histogram(
+    "outbound_request_duration_seconds",
+    "Third-party HTTP call latency (shared.http).",
+    ["service", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+CACHE_EVENTS = Counter("cache_events", "TieredCache hits, misses and invalidations.", ["namespace", "event"])
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Celery task run time.", ["task", "state"], buckets=TASK_BUCKETS
+)
+
+_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+_task_started: dict[str, float] = {}
+
+
+def _setting(name: str):
+    return getattr(settings, "METRICS", {}).get(name, DEFAULTS[name])
+
+
+def multiprocess_dir() -> str:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+
+
+def reset_multiprocess_dir() -> None:
+    """Empty the shared sample directory; call once before the worker processes start."""
+    path = multiprocess_dir()
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def _registry():
+    if not multiprocess_dir():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def observe_outbound(host: str, outcome: str, seconds: float) -> None:
+    # Tenant webhook hosts are unbounded, so only configured providers get their own label.
+    service = _setting("OUTBOUND_SERVICES").get(host, "webhook")
+    OUTBOUND_LATENCY.labels(service, outcome).observe(seconds)
+
+
+def observe_cache(namespace: str, event: str) -> None:
+    CACHE_EVENTS.labels(namespace, event).inc()
+
+
+def metrics_view(request):
+    """
+    Prometheus exposition behind ``Authorization: Bearer <METRICS_TOKEN>``. Without a
+    token it is a 404, so a deployment that forgot to set one doesn't publish tenant
+    plans and traffic; only ``DEBUG`` serves it open.
+    """
+    token = _setting("TOKEN")
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=404)
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install(connection, **kwargs) -> None:
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+class MetricsMiddleware:
+    """Records latency and query count for every request. Keep it first in ``MIDDLEWARE``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(_install, dispatch_uid="shared.metrics")
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started, counter = time.perf_counter(), [0]
+        token = _queries.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self._observe(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    async def __acall__(self, request):
+        started, counter = time.perf_counter(), [0]
+        token = _queries.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self._observe(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    @staticmethod
+    def _observe(request, response, seconds: float, queries: int) -> None:
+        match = getattr(request, "resolver_match", None)
+        route = (match.view_name or match._func_path) if match else "unmatched"
+        tenant = getattr(request, "tenant", None)
+        plan = tenant.plan if tenant is not None else "none"
+        method = request.method if request.method in METHODS else "other"
+        REQUEST_LATENCY.labels(route, method, f"{response.status_code // 100}xx", plan).observe(seconds)
+        REQUEST_QUERIES.labels(route).observe(queries)
+
+
+@task_prerun.connect
+def _task_prerun(task_id=None, **kwargs) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_postrun(task_id=None, task=None, state=None, **kwargs) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@worker_init.connect
+def _serve_worker_metrics(**kwargs) -> None:
+    """
+    The Celery worker has no HTTP server of its own: with ``METRICS_CELERY_PORT`` set, its
+    main process serves the pool's samples there (pool processes can't bind the port).
+    """
+    port = int(_setting("CELERY_PORT") or 0)
+    if port:
+        reset_multiprocess_dir()
+        start_http_server(port, registry=_registry())
+
+
+@worker_process_shutdown.connect
+def _forget_worker_process(pid=None, **kwargs) -> None:
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -1,25 +1,60 @@
 from __future__ import annotations
 
+import uuid
 from typing import Optional
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import HttpRequest
 
-from shared.tenant import Tenant
+from shared.cache import aget_instance, get_instance
+from shared.tenant import Tenant, tenant_cache
+
+
+def _lookup_keys(request: HttpRequest) -> tuple[str, Optional[uuid.UUID]]:
+    """Host to match on, and the X-Tenant-ID header as a UUID (None when absent or malformed)."""
+    host = request.get_host().split(":")[0].lower() if request.get_host() else ""
+    try:
+        tenant_id = uuid.UUID(request.headers.get("X-Tenant-ID", ""))
+    except ValueError:
+        tenant_id = None
+    return host, tenant_id
 
 
 def resolve_tenant(request: HttpRequest) -> Optional[Tenant]:
     """
     Resolve the current tenant from Host header or X-Tenant-ID.
-    Keep lightweight to avoid DB churn; used across API and widget embed.
+    Keep lightweight to avoid DB churn; used across API and widget embed. Lookups (misses
+    included) are cached as column values and dropped by ``Tenant.save()``; every call
+    builds its own instance.
     """
-    host = request.get_host().split(":")[0] if request.get_host() else ""
-    header_tenant_id = request.headers.get("X-Tenant-ID")
+    host, tenant_id = _lookup_keys(request)
+    tenant: Optional[Tenant] = None
+    if host:
+        tenant = get_instance(
+            tenant_cache, f"host:{host}", Tenant, lambda: Tenant.objects.filter(domain__iexact=host).first()
+        )
+    if tenant is None and tenant_id:
+        tenant = tenant_by_id(tenant_id)
+    return tenant
 
+
+def tenant_by_id(tenant_id) -> Optional[Tenant]:
+    """The tenant with ``tenant_id`` through the same cached lookup as ``X-Tenant-ID``."""
+    return get_instance(tenant_cache, f"id:{tenant_id}", Tenant, lambda: Tenant.objects.filter(id=tenant_id).first())
+
+
+async def aresolve_tenant(request: HttpRequest) -> Optional[Tenant]:
+    """``resolve_tenant`` for ASGI requests: warm lookups are answered without leaving the event loop."""
+    host, tenant_id = _lookup_keys(request)
     tenant: Optional[Tenant] = None
     if host:
-        tenant = Tenant.objects.filter(domain__iexact=host).first()
-    if tenant is None and header_tenant_id:
-        tenant = Tenant.objects.filter(id=header_tenant_id).first()
+        tenant = await aget_instance(
+            tenant_cache, f"host:{host}", Tenant, lambda: Tenant.objects.filter(domain__iexact=host).first()
+        )
+    if tenant is None and tenant_id:
+        tenant = await aget_instance(
+            tenant_cache, f"id:{tenant_id}", Tenant, lambda: Tenant.objects.filter(id=tenant_id).first()
+        )
     return tenant
 
 
@@ -29,9 +64,21 @@ class TenantResolverMiddleware:
     Falls back to None when no match to keep public marketplace accessible.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
 
     def __call__(self, request: HttpRequest):
+        if self.is_async:
+            return self.__acall__(request)
         request.tenant = resolve_tenant(request)
         return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest):
+        request.tenant = await aresolve_tenant(request)
+        return await self.get_response(request)
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:12
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def populate_counters(apps, schema_editor):
+    Tenant = apps.get_model("shared", "Tenant")
+    License = apps.get_model("marketplace", "License")
+    counters = {"active": "active_licenses", "trial": "trial_licenses", "canceled": "canceled_licenses"}
+    for tenant_id, status, total in (
+        License.objects.values_list("tenant_id", "status").annotate(total=Count("id")).order_by()
+    ):
+        changes = {"total_licenses": F("total_licenses") + total}
+        if status in counters:
+            changes[counters[status]] = F(counters[status]) + total
+        Tenant.objects.filter(pk=tenant_id).update(**changes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared', '0001_initial'),
+        ('marketplace', '0003_licenseevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='active_licenses',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='canceled_licenses',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='total_licenses',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='trial_licenses',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
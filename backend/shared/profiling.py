@@ -0,0 +1,182 @@
+"""
+Sampled per-request SQL profiling.
+
+``QueryProfilerMiddleware`` times a random ``SAMPLE_RATE`` share of requests and every
+query they run, on any database alias. Queries are grouped by fingerprint (the SQL with
+literals and ``IN`` lists collapsed), so one statement issued ``REPEAT_THRESHOLD`` or
+more times in a request, the usual N+1 signature, stands out. Each sample goes into a
+ring buffer of ``BUFFER_SIZE`` slots in the shared cache, so every worker's samples are
+visible to the admin endpoint (``GET /api/admin/profiles``).
+
+Off unless ``REQUEST_PROFILING["ENABLED"]``. When it is off the middleware removes
+itself at startup; when it is on, unsampled requests pay only a ``ContextVar`` read per
+query.
+"""
+from __future__ import annotations
+
+import random
+import re
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+DEFAULTS = {"ENABLED": False, "SAMPLE_RATE": 0.01, "BUFFER_SIZE": 500, "REPEAT_THRESHOLD": 5}
+SLOT_TTL = 60 * 60 * 24
+_INDEX_KEY = "profile:index"
+
+_active: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+_IN_LIST_RE = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def _setting(name: str):
+    return getattr(settings, "REQUEST_PROFILING", {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql: str) -> str:
+    """``sql`` with literal values and variable-length ``IN`` lists collapsed."""
+    sql = _IN_LIST_RE.sub("(%s, ...)", sql)
+    sql = _STRING_RE.sub("'?'", sql)
+    return _NUMBER_RE.sub("?", sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self._by_fingerprint: dict = defaultdict(lambda: [0, 0.0])
+
+    def record(self, sql: str, seconds: float) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        entry = self._by_fingerprint[fingerprint(sql)]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def repeated(self, threshold: int) -> list[dict]:
+        rows = [
+            {"sql": sql[:500], "count": count, "db_ms": round(seconds * 1000, 2)}
+            for sql, (count, seconds) in self._by_fingerprint.items()
+            if count >= threshold
+        ]
+        return sorted(rows, key=lambda row: -row["count"])
+
+    def summary(self, request, response) -> dict:
+        match = getattr(request, "resolver_match", None)
+        return {
+            "at": time.time(),
+            "method": request.method,
+            "path": request.path,
+            "view": (match.view_name or match._func_path) if match else "",
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "queries": self.queries,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "repeated": self.repeated(_setting("REPEAT_THRESHOLD")),
+        }
+
+
+def _profile_execute(execute, sql, params, many, context):
+    profile = _active.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record(sql, time.perf_counter() - started)
+
+
+def _install(connection, **kwargs) -> None:
+    if _profile_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_profile_execute)
+
+
+def store(sample: dict) -> None:
+    """Write ``sample`` into the next ring-buffer slot, overwriting the oldest."""
+    cache.add(_INDEX_KEY, 0, None)
+    try:
+        index = cache.incr(_INDEX_KEY)
+    except ValueError:
+        index = 1
+        cache.set(_INDEX_KEY, index, None)
+    cache.set(f"profile:slot:{index % _setting('BUFFER_SIZE')}", sample, SLOT_TTL)
+
+
+def samples() -> list[dict]:
+    """Everything currently in the ring buffer, newest first."""
+    keys = [f"profile:slot:{slot}" for slot in range(_setting("BUFFER_SIZE"))]
+    return sorted(cache.get_many(keys).values(), key=lambda sample: -sample["at"])
+
+
+def clear() -> None:
+    cache.delete_many([f"profile:slot:{slot}" for slot in range(_setting("BUFFER_SIZE"))])
+
+
+class QueryProfilerMiddleware:
+    """
+    Samples requests into the profile ring buffer. Sampled responses also carry a
+    ``Server-Timing`` header (DB time and query count) for the browser's dev tools.
+    Put it near the top of ``MIDDLEWARE`` so session and auth queries are counted too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not _setting("ENABLED"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = float(_setting("SAMPLE_RATE"))
+        connection_created.connect(_install, dispatch_uid="shared.profiling")
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = _active.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _active.reset(token)
+        store(self._finish(profile, request, response))
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        profile = RequestProfile()
+        # Thread hops copy the context, so queries run in sync_to_async still find ``profile``.
+        token = _active.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _active.reset(token)
+        await sync_to_async(store)(self._finish(profile, request, response))
+        return response
+
+    @staticmethod
+    def _finish(profile: RequestProfile, request, response) -> dict:
+        sample = profile.summary(request, response)
+        response["Server-Timing"] = (
+            f'db;dur={sample["db_ms"]};desc="{sample["queries"]} queries", app;dur={sample["duration_ms"]}'
+        )
+        return sample
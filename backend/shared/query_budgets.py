@@ -0,0 +1,303 @@
+"""
+Per-endpoint query budgets.
+
+``config/query_budgets.py`` lists, for every URL name in ``config/urls.py``, one or more
+requests and the number of queries each may run. ``manage.py check_query_budgets``
+builds a throwaway test database, seeds it with ``rows`` rows per table for each size
+(10 and 1000 by default) and replays every request against it. A request fails when it:
+
+- answers with an unexpected status (so the case really reached the view);
+- runs more queries than its budget at any size;
+- runs more queries at the larger size than at the smaller one, the N+1 signature.
+
+Every request starts with empty caches, so budgets are cold-path counts, and runs in a
+transaction that is rolled back, so writes don't leak into the next case. Transaction
+control statements (BEGIN, ROLLBACK, savepoints) are not counted.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import io
+import json
+import logging
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Optional, Union
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.models import Contractor, RefreshToken
+from accounts.tokens import issue_access_token
+from adminpanel.models import DailyRollup, MediaAsset, Ticket, UploadSession
+from marketplace.models import (
+    Coupon,
+    CouponShard,
+    License,
+    LicenseEvent,
+    MarketplaceLead,
+    Tool,
+    WidgetConfig,
+    WidgetLead,
+)
+from pricing.models import MaterialSetting
+from shared.cache import clear_local_caches
+from shared.profiling import fingerprint
+from shared.tenant import Tenant
+
+PASSWORD = "budget-password"
+# URL namespaces that are not ours to budget.
+EXCLUDED_NAMESPACES = ("admin",)
+UNCOUNTED_PREFIXES = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE SAVEPOINT")
+
+
+@dataclass(frozen=True)
+class Case:
+    """
+    One request and its budget. ``path`` and string values in ``data`` are formatted
+    with the seeded fixture ids (``{tool}``, ``{tenant}``, ...). ``user`` is ``anon``,
+    ``owner`` (the tenant's contractor, with ``X-Tenant-ID``), ``admin`` or ``basic``
+    (the owner over HTTP Basic).
+    """
+
+    route: str
+    method: str
+    path: str
+    user: str
+    budget: int
+    status: Union[int, tuple[int, ...]] = 200
+    data: Optional[dict] = None
+    headers: Optional[dict] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.method} {self.path}"
+
+    def expected(self) -> tuple[int, ...]:
+        return self.status if isinstance(self.status, tuple) else (self.status,)
+
+
+@dataclass
+class Result:
+    case: Case
+    queries: dict  # rows -> count
+    statuses: dict  # rows -> status code
+    sql: dict  # rows -> list of SQL strings
+
+    def failures(self) -> list[str]:
+        problems = []
+        for rows, code in self.statuses.items():
+            if code not in self.case.expected():
+                problems.append(f"status {code} at {rows} rows, expected {self.case.status}")
+        worst = max(self.queries.values())
+        if worst > self.case.budget:
+            problems.append(f"{worst} queries, budget {self.case.budget}")
+        sizes = sorted(self.queries)
+        if self.queries[sizes[-1]] > self.queries[sizes[0]]:
+            problems.append(
+                f"query count grows with data ({self.queries[sizes[0]]} at {sizes[0]} rows, "
+                f"{self.queries[sizes[-1]]} at {sizes[-1]})"
+            )
+        return problems
+
+    def repeated(self) -> list[tuple[str, int]]:
+        """Statements the largest run issued more than once, most repeated first."""
+        counts = Counter(fingerprint(sql) for sql in self.sql[max(self.sql)])
+        return [(sql, n) for sql, n in counts.most_common() if n > 1]
+
+
+def budget_routes() -> set[str]:
+    """URL names in ``config/urls.py`` that need a budget."""
+
+    def walk(patterns, namespace=None):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, pattern.namespace or namespace)
+            elif isinstance(pattern, URLPattern) and pattern.name and namespace not in EXCLUDED_NAMESPACES:
+                yield pattern.name
+
+    return set(walk(get_resolver().url_patterns))
+
+
+# -- fixtures --------------------------------------------------------------------
+
+
+def seed(rows: int) -> dict:
+    """``rows`` rows in every table the endpoints read; returns the ids cases refer to."""
+    today = timezone.now()
+    tool = Tool.objects.create(slug="budget-tool", name="Budget Tool", price_monthly=Decimal("99.00"))
+    Tool.objects.bulk_create(
+        Tool(slug=f"budget-tool-{i}", name=f"Budget Tool {i}", price_monthly=Decimal("49.00")) for i in range(1, rows)
+    )
+    tools = list(Tool.objects.order_by("slug"))
+    coupons = Coupon.objects.bulk_create(
+        Coupon(tool=item, code=f"SAVE{i}", percent_off=Decimal("10.00")) for i, item in enumerate(tools)
+    )
+    CouponShard.objects.bulk_create(CouponShard(coupon=coupon, index=0) for coupon in coupons)
+
+    tenant = Tenant.objects.create(slug="budget-tenant", name="Budget Roofing", plan=Tenant.Plan.PRO)
+    Tenant.objects.bulk_create(Tenant(slug=f"budget-tenant-{i}", name=f"Budget Roofing {i}") for i in range(1, rows))
+    tenants = list(Tenant.objects.order_by("slug"))
+    licenses = License.objects.bulk_create(
+        License(tenant=item, tool=tool, status=License.Status.ACTIVE) for item in tenants
+    )
+    LicenseEvent.objects.bulk_create(
+        LicenseEvent(
+            license=item,
+            tenant_id=item.tenant_id,
+            tool=tool,
+            to_status=License.Status.ACTIVE,
+            price=tool.price_monthly,
+            mrr_delta=tool.price_monthly,
+            source=LicenseEvent.Source.BACKFILL,
+            occurred_at=today - timedelta(days=i),
+        )
+        for i, item in enumerate(licenses)
+    )
+    call_command("reconcile_license_counters", verbosity=0, stdout=io.StringIO())
+
+    owner = Contractor.objects.create_user("owner@budget.invalid", PASSWORD, tenant=tenant, full_name="Budget Owner")
+    admin = Contractor.objects.create_superuser("admin@budget.invalid", PASSWORD, full_name="Budget Admin")
+    Contractor.objects.bulk_create(
+        Contractor(email=f"user{i}@budget.invalid", tenant=item, full_name=f"User {i}", password="!")
+        for i, item in enumerate(tenants[1 : rows - 1], start=1)
+    )
+    Token.objects.create(user=owner)
+
+    WidgetConfig.objects.create(tenant=tenant)
+    MaterialSetting.objects.bulk_create(
+        MaterialSetting(tenant=tenant, tool=tool, name=f"Material {i}", material_rate=Decimal("3.00"), labor_rate=1)
+        for i in range(rows)
+    )
+    WidgetLead.objects.bulk_create(
+        WidgetLead(tenant=tenant, tool=tool, full_name=f"Lead {i}", email=f"lead{i}@example.com", address=f"{i} Elm")
+        for i in range(rows)
+    )
+    MarketplaceLead.objects.bulk_create(
+        MarketplaceLead(tool=tool, full_name=f"Lead {i}", email=f"demo{i}@example.com", address=f"{i} Oak")
+        for i in range(rows)
+    )
+    tickets = Ticket.objects.bulk_create(
+        Ticket(tenant=tenants[i % len(tenants)], tool=tool, subject=f"Ticket {i}") for i in range(rows)
+    )
+    DailyRollup.objects.bulk_create(
+        DailyRollup(day=(today - timedelta(days=i)).date(), tenant=tenant, tool=tool, widget_leads=3, marketplace_leads=1)
+        for i in range(rows)
+    )
+    assets = MediaAsset.objects.bulk_create(
+        MediaAsset(
+            sha256=hashlib.sha256(str(i).encode()).hexdigest(), path=f"tool_media/{i}.bin", size=1024,
+            content_type="application/octet-stream",
+        )
+        for i in range(rows)
+    )
+    uploads = UploadSession.objects.bulk_create(
+        UploadSession(filename=f"upload-{i}.bin", size=4096, created_by=admin) for i in range(rows)
+    )
+    return {
+        "tool": tool.slug,
+        "tool_id": str(tool.pk),
+        "tenant": str(tenant.pk),
+        "license": str(licenses[0].pk),
+        "ticket": str(tickets[0].pk),
+        "sha256": assets[0].sha256,
+        "upload": str(uploads[0].pk),
+        "refresh": RefreshToken.objects.issue(owner),
+        "owner_access": issue_access_token(owner),
+        "admin_access": issue_access_token(admin),
+        "basic": base64.b64encode(f"{owner.email}:{PASSWORD}".encode()).decode(),
+    }
+
+
+# -- replay ----------------------------------------------------------------------
+
+
+def _format(value: Any, fixtures: dict) -> Any:
+    if isinstance(value, str):
+        return value.format(**fixtures)
+    if isinstance(value, dict):
+        return {key: _format(item, fixtures) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_format(item, fixtures) for item in value]
+    return value
+
+
+def _headers(case: Case, fixtures: dict) -> dict:
+    headers = {}
+    if case.user == "owner":
+        headers = {"Authorization": f"Bearer {fixtures['owner_access']}", "X-Tenant-ID": fixtures["tenant"]}
+    elif case.user == "admin":
+        headers = {"Authorization": f"Bearer {fixtures['admin_access']}"}
+    elif case.user == "basic":
+        headers = {"Authorization": f"Basic {fixtures['basic']}"}
+    elif case.user != "anon":
+        raise ValueError(f"Unknown user {case.user!r} for {case.route}")
+    return headers | _format(case.headers or {}, fixtures)
+
+
+def send(case: Case, fixtures: dict, client: Client):
+    """Send ``case`` with empty caches and no cookies. Callers wrap it in a transaction they roll back."""
+    path = _format(case.path, fixtures)
+    route = resolve(path.split("?")[0]).url_name
+    if route != case.route:
+        raise ValueError(f"{case.label} resolves to {route!r}, not {case.route!r}")
+    cache.clear()
+    clear_local_caches()
+    # A session cookie left by an earlier case (login) would add a session read.
+    client.cookies.clear()
+    data = _format(case.data, fixtures)
+    return client.generic(
+        case.method,
+        path,
+        data=b"" if data is None else json.dumps(data),
+        content_type="application/json",
+        headers=_headers(case, fixtures),
+    )
+
+
+def measure(case: Case, fixtures: dict, client: Client) -> tuple[int, list[str]]:
+    """Replay ``case`` cold and rolled back; returns the status and the SQL it ran."""
+    with ExitStack() as stack:
+        captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+        with transaction.atomic():
+            response = send(case, fixtures, client)
+            transaction.set_rollback(True)
+    sql = [
+        query["sql"]
+        for context in captured
+        for query in context.captured_queries
+        if not query["sql"].startswith(UNCOUNTED_PREFIXES)
+    ]
+    return response.status_code, sql
+
+
+def run(cases: list[Case], sizes: list[int]) -> list[Result]:
+    """Seed each size in turn (flushing in between) and measure every case against it."""
+    results = [Result(case, {}, {}, {}) for case in cases]
+    # A view that raises should show up as a 500 in the report, not abort the run.
+    client = Client(raise_request_exception=False)
+    request_logger = logging.getLogger("django.request")
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        for rows in sizes:
+            call_command("flush", interactive=False, verbosity=0)
+            fixtures = seed(rows)
+            for result in results:
+                code, sql = measure(result.case, fixtures, client)
+                result.statuses[rows] = code
+                result.queries[rows] = len(sql)
+                result.sql[rows] = sql
+    finally:
+        request_logger.setLevel(level)
+    return results
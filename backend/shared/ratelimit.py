@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import math
+import time
+
+from django.core.cache import cache
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window counter on the shared Django cache (Redis in deployment).
+
+    Hits land in fixed windows of ``window`` seconds; the current rate is this window's
+    count plus the previous window's count weighted by how much of it still overlaps
+    the sliding window. Two keys per identity and atomic ``incr``, so it holds across
+    processes without a sorted set per client.
+    """
+
+    def __init__(self, scope: str, limit: int, window: int):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _key(self, ident: str, index: int) -> str:
+        return f"rl:{self.scope}:{ident}:{index}"
+
+    def _position(self) -> tuple[int, float]:
+        now = time.time()
+        index = int(now // self.window)
+        return index, (now - index * self.window) / self.window
+
+    def _counts(self, ident: str) -> tuple[int, int, float]:
+        index, elapsed = self._position()
+        current_key, previous_key = self._key(ident, index), self._key(ident, index - 1)
+        values = cache.get_many([current_key, previous_key])
+        return values.get(current_key, 0), values.get(previous_key, 0), elapsed
+
+    def count(self, ident: str) -> float:
+        current, previous, elapsed = self._counts(ident)
+        return current + previous * (1 - elapsed)
+
+    def hit(self, ident: str) -> float:
+        """
+        Count one hit and return the sliding-window count including it. The increment
+        comes first, so concurrent callers each see their own hit and at most ``limit``
+        of them find themselves within it.
+        """
+        index, elapsed = self._position()
+        key = self._key(ident, index)
+        cache.add(key, 0, timeout=self.window * 2)
+        try:
+            current = cache.incr(key)
+        except ValueError:  # expired between add() and incr()
+            cache.set(key, 1, timeout=self.window * 2)
+            current = 1
+        previous = cache.get(self._key(ident, index - 1), 0)
+        return current + previous * (1 - elapsed)
+
+    def undo(self, ident: str) -> None:
+        """Give back a hit taken in the current window (e.g. the attempt turned out fine)."""
+        index, _ = self._position()
+        try:
+            cache.decr(self._key(ident, index))
+        except ValueError:  # the window rolled over; the hit ages out on its own
+            pass
+
+    def retry_after(self, ident: str) -> int | None:
+        """Seconds until another hit is allowed, or None if one is allowed now."""
+        current, previous, elapsed = self._counts(ident)
+        if current + previous * (1 - elapsed) < self.limit:
+            return None
+        if current >= self.limit:
+            return max(1, math.ceil((1 - elapsed) * self.window))
+        # Wait until enough of the previous window has slid out.
+        needed = 1 - (self.limit - current) / previous
+        return max(1, math.ceil((needed - elapsed) * self.window))
+
+    def reset(self, ident: str) -> None:
+        index, _ = self._position()
+        cache.delete_many([self._key(ident, index), self._key(ident, index - 1)])
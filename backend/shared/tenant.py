@@ -1,8 +1,25 @@
 from __future__ import annotations
 
+import re
 import uuid
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import BigIntegerField, Case, Count, Max, Value, When
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+from shared.cache import TieredCache
+
+
+TENANT_CACHE_TTL = 300
+# Request-tenant lookups by host and by id (see ``shared.middleware.resolve_tenant``).
+tenant_cache = TieredCache("tenant", ttl=TENANT_CACHE_TTL)
+
+
+def tenant_cache_keys(tenant: "Tenant", *domains: str) -> list[str]:
+    """``tenant_cache`` keys that can hold ``tenant``; ``domains`` adds former domains on a change."""
+    hosts = {d.lower() for d in (tenant.domain, *domains) if d}
+    return [f"id:{tenant.pk}"] + [f"host:{host}" for host in hosts]
 
 
 class TimeStampedModel(models.Model):
@@ -15,6 +32,43 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class TenantManager(models.Manager):
+    slug_retries = 5
+
+    def next_free_slug(self, base: str) -> str:
+        """
+        ``base`` if unused, otherwise ``base-<n>`` one past the highest suffix in use.
+        A single aggregate over the ``base``/``base-<digits>`` family, however large it is.
+        Suffixes are capped at nine digits so a slug like ``acme-20240101123`` can't
+        overflow the cast.
+        """
+        family = self.filter(slug__regex=rf"^{re.escape(base)}(-[0-9]{{1,9}})?$")
+        suffix = Case(
+            When(slug=base, then=Value(1)),
+            default=Cast(Substr("slug", len(base) + 2), BigIntegerField()),
+            output_field=BigIntegerField(),
+        )
+        taken = family.aggregate(count=Count("pk"), top=Max(suffix))
+        return f"{base}-{taken['top'] + 1}" if taken["count"] else base
+
+    def create_with_unique_slug(self, name: str, **fields) -> "Tenant":
+        """
+        Create a tenant whose slug is derived from ``name``. A concurrent signup that takes
+        the same slug first trips the unique index; the savepoint is rolled back and the
+        next suffix tried.
+        """
+        max_length = self.model._meta.get_field("slug").max_length
+        base = slugify(name)[: max_length - 6].strip("-") or "tenant"
+        for attempt in range(self.slug_retries):
+            slug = self.next_free_slug(base)
+            try:
+                with transaction.atomic():
+                    return self.create(name=name, slug=slug, **fields)
+            except IntegrityError:
+                if attempt == self.slug_retries - 1:
+                    raise
+
+
 class Tenant(TimeStampedModel):
     class Plan(models.TextChoices):
         FREEMIUM = "freemium", "Freemium"
@@ -39,10 +93,37 @@ class Tenant(TimeStampedModel):
         choices=[("frosted", "Frosted Glass (Light)"), ("smoked", "Smoked Glass (Dark)")],
         default="frosted",
     )
+    # Denormalized license counts, kept in step by marketplace.LicenseEvent.objects.record()
+    # and repaired by `manage.py reconcile_license_counters`.
+    active_licenses = models.PositiveIntegerField(default=0, db_index=True)
+    trial_licenses = models.PositiveIntegerField(default=0, db_index=True)
+    canceled_licenses = models.PositiveIntegerField(default=0, db_index=True)
+    total_licenses = models.PositiveIntegerField(default=0)
+
+    objects = TenantManager()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_domain = self.__dict__.get("domain", "")
 
     def __str__(self) -> str:  # pragma: no cover - repr convenience
         return f"{self.name} ({self.slug})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._forget(self._loaded_domain)
+        self._loaded_domain = self.domain
+
+    def delete(self, *args, **kwargs):
+        self._forget(self._loaded_domain)
+        return super().delete(*args, **kwargs)
+
+    def _forget(self, *domains: str) -> None:
+        """Drop cached request-tenant lookups (see ``shared.middleware.resolve_tenant``)."""
+        keys = tenant_cache_keys(self, *domains)
+        tenant_cache.delete(*keys)
+        transaction.on_commit(lambda: tenant_cache.delete(*keys))
+
 
 class TenantScopedModel(TimeStampedModel):
     """Base class that enforces tenant scoping on all core tables."""
@@ -0,0 +1,530 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import (
+    AsyncClient,
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.testcases import _AssertNumQueriesContext
+
+from accounts.models import Contractor
+from accounts.tokens import issue_access_token
+from config.query_budgets import BUDGETS
+from marketplace.models import License, Tool, WidgetLead
+from shared import db, profiling
+from shared.cache import LocalLRUCache, TieredCache, clear_local_caches, get_instance
+from shared.http import CircuitOpen, OutboundClient
+from shared.metrics import METHODS, REQUEST_LATENCY, metrics_view
+from shared.query_budgets import UNCOUNTED_PREFIXES, budget_routes, seed, send
+from shared.tenant import Tenant, tenant_cache
+
+
+class NextFreeSlugTests(TestCase):
+    def test_ignores_suffixes_longer_than_nine_digits(self):
+        Tenant.objects.create(slug="acme", name="Acme")
+        Tenant.objects.create(slug="acme-7", name="Acme")
+        Tenant.objects.create(slug="acme-20240101123", name="Acme")
+        self.assertEqual(Tenant.objects.next_free_slug("acme"), "acme-8")
+
+
+# SQLite's shared in-memory test database locks whole tables, so the race only runs where
+# writers can really overlap (PostgreSQL).
+@skipUnlessDBFeature("has_select_for_update")
+class CreateWithUniqueSlugRaceTests(TransactionTestCase):
+    """Concurrent signups with the same name all succeed, each with its own slug."""
+
+    signups = 4
+
+    def test_concurrent_signups_get_distinct_slugs(self):
+        barrier = threading.Barrier(self.signups)
+        created, errors = [], []
+
+        def signup():
+            try:
+                barrier.wait()
+                created.append(Tenant.objects.create_with_unique_slug("Acme Roofing").slug)
+            except Exception as exc:  # surfaced by the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=signup) for _ in range(self.signups)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            sorted(created), sorted(["acme-roofing"] + [f"acme-roofing-{n}" for n in range(2, self.signups + 1)])
+        )
+
+
+class AsyncClientLifecycleTests(TestCase):
+    """Async clients are pooled only on loops registered at ASGI startup, and closed at shutdown."""
+
+    def setUp(self):
+        self.outbound = OutboundClient()
+        self.created: list[httpx.AsyncClient] = []
+
+        def new_client():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+            self.created.append(client)
+            return client
+
+        patcher = mock.patch.object(self.outbound, "_new_async_client", side_effect=new_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unpooled_loop_closes_a_client_per_call(self):
+        async def calls():
+            await self.outbound.apost("http://hooks.test/a")
+            await self.outbound.apost("http://hooks.test/b")
+
+        asyncio.run(calls())
+        self.assertEqual(len(self.created), 2)
+        self.assertTrue(all(client.is_closed for client in self.created))
+        self.assertEqual(len(self.outbound._async_clients), 0)
+
+    def test_pooled_loop_reuses_and_closes_at_shutdown(self):
+        async def worker():
+            self.outbound.pool_async_clients()
+            await self.outbound.apost("http://hooks.test/a")
+            await self.outbound.apost("http://hooks.test/b")
+            self.assertFalse(self.created[0].is_closed)
+            await self.outbound.aclose()
+
+        asyncio.run(worker())
+        self.assertEqual(len(self.created), 1)
+        self.assertTrue(self.created[0].is_closed)
+
+    @override_settings(OUTBOUND_HTTP={"MAX_HOSTS": 1})
+    def test_pooled_loop_closes_the_evicted_hosts_client(self):
+        async def worker():
+            self.outbound.pool_async_clients()
+            await self.outbound.apost("http://a.test/")
+            await self.outbound.apost("http://b.test/")
+            await asyncio.sleep(0)
+            self.assertTrue(self.created[0].is_closed)
+            self.assertFalse(self.created[1].is_closed)
+            self.assertEqual(list(self.outbound._hosts), ["b.test"])
+            await self.outbound.aclose()
+
+        asyncio.run(worker())
+
+
+class _BudgetQueriesContext(_AssertNumQueriesContext):
+    @property
+    def captured_queries(self):
+        return [query for query in super().captured_queries if not query["sql"].startswith(UNCOUNTED_PREFIXES)]
+
+
+# Reads stay on "default" so assertNumQueries sees them even when a replica is configured.
+@override_settings(DATABASE_ROUTERS=[])
+class QueryBudgetTests(TestCase):
+    """Every ``config.query_budgets`` case, cold, at 10 and at 1000 rows per table."""
+
+    def assertNumQueries(self, num, func=None, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+        """Django's, minus transaction control statements, which ``check_query_budgets`` doesn't count either."""
+        context = _BudgetQueriesContext(self, num, connections[using])
+        if func is None:
+            return context
+        with context:
+            func(*args, **kwargs)
+
+    def _check_budgets(self, rows: int) -> None:
+        fixtures = seed(rows)
+        client = Client()
+        for case in BUDGETS:
+            with self.subTest(route=case.route, request=case.label, rows=rows):
+                with transaction.atomic():
+                    with self.assertNumQueries(case.budget):
+                        response = send(case, fixtures, client)
+                    transaction.set_rollback(True)
+                self.assertIn(response.status_code, case.expected())
+
+    def test_budgets_at_10_rows(self):
+        self._check_budgets(10)
+
+    def test_budgets_at_1000_rows(self):
+        self._check_budgets(1000)
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(budget_routes() - {case.route for case in BUDGETS}, set())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """``/ok`` answers 200, ``/fail`` 503 and ``/slow`` 200 after half a second."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def do_GET(self):
+        self.server.seen.append((self.path, self.client_address[1]))
+        if self.path == "/slow":
+            time.sleep(0.5)
+        body = b"{}"
+        try:
+            self.send_response(503 if self.path == "/fail" else 200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):  # the client timed out first
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(
+    OUTBOUND_HTTP={
+        "CONNECT_TIMEOUT": 1.0,
+        "READ_TIMEOUT": 0.2,
+        "POOL_MAXSIZE": 2,
+        "BREAKER_FAILURES": 2,
+        "BREAKER_RESET_SECONDS": 0.3,
+        "MAX_HOSTS": 2,
+    }
+)
+class OutboundClientTests(SimpleTestCase):
+    """``OutboundClient`` against a local HTTP server: timeouts, the breaker and connection reuse."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.daemon_threads = True
+        cls.server.seen = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.seen.clear()
+        self.outbound = OutboundClient()
+        self.host = f"127.0.0.1:{self.server.server_port}"
+
+    def test_read_timeout_raises_and_counts_as_failure(self):
+        with self.assertRaises(requests.Timeout):
+            self.outbound.get(f"{self.base}/slow")
+        self.assertEqual(self.outbound.breaker(self.host)._errors, 1)
+        self.assertEqual(self.outbound.stats()[self.host]["latency"]["error"]["count"], 1)
+
+    def test_breaker_opens_fails_fast_and_closes_after_a_good_trial(self):
+        for _ in range(2):
+            self.assertEqual(self.outbound.get(f"{self.base}/fail").status_code, 503)
+        self.assertEqual(self.outbound.breaker(self.host).state, "open")
+
+        with self.assertRaises(CircuitOpen):
+            self.outbound.get(f"{self.base}/ok")
+        self.assertEqual([path for path, _ in self.server.seen], ["/fail", "/fail"])
+
+        time.sleep(0.35)
+        self.assertEqual(self.outbound.breaker(self.host).state, "half-open")
+        self.assertEqual(self.outbound.get(f"{self.base}/ok").status_code, 200)
+        self.assertEqual(self.outbound.breaker(self.host).state, "closed")
+
+    def test_failed_trial_reopens_the_breaker(self):
+        for _ in range(2):
+            self.outbound.get(f"{self.base}/fail")
+        time.sleep(0.35)
+        self.outbound.get(f"{self.base}/fail")
+        self.assertEqual(self.outbound.breaker(self.host).state, "open")
+
+    def test_session_is_reused_per_host(self):
+        for _ in range(3):
+            self.assertEqual(self.outbound.get(f"{self.base}/ok").status_code, 200)
+        self.assertIs(self.outbound._session(self.host), self.outbound._session(self.host))
+        # One keep-alive connection served all three calls.
+        self.assertEqual(len({port for _, port in self.server.seen}), 1)
+
+    def test_least_recently_used_host_is_evicted_and_its_session_closed(self):
+        self.outbound.get(f"{self.base}/fail")
+        first = self.outbound._session(self.host)
+        evicted = self.outbound._session("b.test")
+        self.outbound._session(self.host)  # touch: b.test is now the oldest
+        with mock.patch.object(first, "close") as close_first, mock.patch.object(evicted, "close") as close_evicted:
+            self.outbound._session("c.test")
+
+        self.assertEqual(list(self.outbound._hosts), [self.host, "c.test"])
+        close_evicted.assert_called_once()
+        close_first.assert_not_called()
+        self.assertEqual(set(self.outbound.stats()), {self.host, "c.test"})
+        self.assertEqual(self.outbound.stats()[self.host]["latency"]["error"]["count"], 1)
+
+
+HAS_REPLICA = db.REPLICA in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, "needs a replica database (POSTGRES_REPLICA_HOST)")
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Which alias reads go to, recorded at the router. A TransactionTestCase, because the
+    test replica is a second connection that can't see a TestCase's uncommitted rows.
+    """
+
+    # The runner sets up every alias named here, skipped or not.
+    databases = {"default", db.REPLICA} if HAS_REPLICA else {"default"}
+
+    def setUp(self):
+        cache.clear()
+        self.tenant = Tenant.objects.create(slug="acme", name="Acme")
+        self.tool = Tool.objects.create(slug="estimator", name="Estimator", price_monthly=10)
+        License.objects.create(tenant=self.tenant, tool=self.tool, status=License.Status.ACTIVE)
+        WidgetLead.objects.create(tenant=self.tenant, tool=self.tool, full_name="Pat", email="pat@example.com")
+        self.admin = Contractor.objects.create_superuser("admin@example.com", "pw", full_name="Admin")
+        self.owner = Contractor.objects.create_user("owner@example.com", "pw", tenant=self.tenant, full_name="Owner")
+        self.reads: list[tuple[str, str | None]] = []
+        original = db.ReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            alias = original(router, model, **hints)
+            self.reads.append((model._meta.label, alias))
+            return alias
+
+        patcher = mock.patch.object(db.ReplicaRouter, "db_for_read", db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _aliases(self, label: str) -> set:
+        return {alias for model, alias in self.reads if model == label}
+
+    def _bearer(self, user) -> dict:
+        return {"Authorization": f"Bearer {issue_access_token(user)}"}
+
+    def test_safe_request_reads_from_replica(self):
+        response = self.client.get("/api/admin/tools/", headers=self._bearer(self.admin))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._aliases("marketplace.Tool"), {db.REPLICA})
+
+    def test_write_pins_user_to_primary(self):
+        response = self.client.patch(
+            f"/api/admin/tools/{self.tool.slug}/", {"summary": "Updated"}, content_type="application/json",
+            headers=self._bearer(self.admin),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(db.is_pinned(self.admin))
+
+        self.reads.clear()
+        self.client.get("/api/admin/tools/", headers=self._bearer(self.admin))
+        self.assertEqual(self._aliases("marketplace.Tool"), {None})
+        # Other users are not affected by the pin.
+        self.reads.clear()
+        other = Contractor.objects.create_superuser("other@example.com", "pw", full_name="Other")
+        self.client.get("/api/admin/tools/", headers=self._bearer(other))
+        self.assertEqual(self._aliases("marketplace.Tool"), {db.REPLICA})
+
+    async def test_async_view_keeps_alias_across_sync_to_async(self):
+        response = await AsyncClient().get(
+            "/api/leads/widget", {"tool": self.tool.slug}, headers=self._bearer(self.owner) | {"X-Tenant-ID": str(self.tenant.pk)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._aliases("marketplace.WidgetLead"), {db.REPLICA})
+        # The request's choice does not leak out of it.
+        self.assertIsNone(db._read_alias.get())
+
+    async def test_reading_from_replica_crosses_sync_to_async(self):
+        def count():
+            return WidgetLead.objects.count()
+
+        with db.reading_from_replica():
+            await sync_to_async(count)()
+        await sync_to_async(count)()
+        self.assertEqual([alias for model, alias in self.reads if model == "marketplace.WidgetLead"], [db.REPLICA, None])
+
+
+class MetricsViewTests(SimpleTestCase):
+    def _get(self, **headers):
+        return metrics_view(RequestFactory().get("/metrics", headers=headers))
+
+    @override_settings(METRICS={"TOKEN": ""}, DEBUG=False)
+    def test_hidden_without_a_token(self):
+        self.assertEqual(self._get().status_code, 404)
+
+    @override_settings(METRICS={"TOKEN": ""}, DEBUG=True)
+    def test_open_without_a_token_in_debug(self):
+        self.assertEqual(self._get().status_code, 200)
+
+    @override_settings(METRICS={"TOKEN": "s3cret"}, DEBUG=False)
+    def test_token_required_when_set(self):
+        self.assertEqual(self._get().status_code, 401)
+        self.assertEqual(self._get(Authorization="Bearer wrong").status_code, 401)
+        self.assertEqual(self._get(Authorization="Bearer s3cret").status_code, 200)
+
+
+class RequestMetricLabelTests(TestCase):
+    def _label_sets(self) -> set[tuple]:
+        return {
+            (sample.labels["route"], sample.labels["method"])
+            for metric in REQUEST_LATENCY.collect()
+            for sample in metric.samples
+            if sample.name.endswith("_count")
+        }
+
+    def test_client_chosen_values_collapse_to_fixed_labels(self):
+        client = Client()
+        for i in range(3):
+            client.generic(f"BREW{i}", f"/no/such/route/{i}")
+        labels = self._label_sets()
+        self.assertIn(("unmatched", "other"), labels)
+        self.assertLessEqual({method for _, method in labels}, METHODS | {"other"})
+        self.assertFalse({route for route, _ in labels if route.startswith("/no/such")})
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tiered = TieredCache("test-tiered", ttl=60, local_ttl=30)
+
+    def test_l1_then_l2_hits(self):
+        self.tiered.set("k", {"v": 1})
+        self.assertEqual(self.tiered.get("k"), {"v": 1})
+        self.tiered.local.clear()  # as seen from another process
+        self.assertEqual(self.tiered.get("k"), {"v": 1})
+        self.assertEqual(self.tiered.get("k"), {"v": 1})
+        stats = self.tiered.stats()
+        self.assertEqual((stats["l1_hits"], stats["l2_hits"], stats["misses"]), (2, 1, 0))
+
+    def test_local_lru_evicts_the_least_recently_used(self):
+        local = LocalLRUCache(maxsize=2, ttl=30)
+        local.set("a", 1)
+        local.set("b", 2)
+        local.get("a")
+        local.set("c", 3)
+        self.assertEqual((local.get("a"), local.get("b"), local.get("c")), (1, None, 3))
+
+    def test_tag_invalidation_retires_both_tiers(self):
+        self.tiered.set("k", "old", tags=["t1"])
+        self.tiered.set("other", "kept", tags=["t2"])
+        self.tiered.invalidate_tags("t1")
+        self.assertIsNone(self.tiered.get("k"))
+        self.tiered.local.clear()
+        self.assertIsNone(self.tiered.get("k"))
+        self.assertEqual(self.tiered.get("other"), "kept")
+
+    def test_version_bump_retires_both_tiers(self):
+        versioned = TieredCache("test-versioned", ttl=60, versioned=True)
+        versioned.set("k", "old")
+        versioned.bump()
+        self.assertIsNone(versioned.get("k"))
+        versioned.local.clear()
+        self.assertIsNone(versioned.get("k"))
+        self.assertEqual(versioned.get_or_set("k", lambda: "new"), "new")
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return "built"
+
+        def read(results):
+            barrier.wait()
+            results.append(self.tiered.get_or_set("k", build))
+
+        results = []
+        threads = [threading.Thread(target=read, args=(results,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["built"] * 8)
+        self.assertEqual(self.tiered.stats()["coalesced"], 7)
+
+    def test_entries_expire(self):
+        tiered = TieredCache("test-expiring", ttl=1, local_ttl=0.2)
+        tiered.set("k", "v")
+        time.sleep(0.3)
+        self.assertEqual(tiered.get("k"), "v")  # L1 expired, L2 still has it
+        self.assertEqual(tiered.stats()["l2_hits"], 1)
+        time.sleep(1)
+        tiered.local.clear()
+        self.assertIsNone(tiered.get("k"))
+
+    def test_instances_are_cached_as_column_values(self):
+        tenant = Tenant.objects.create(slug="acme", name="Acme")
+
+        def lookup():
+            return Tenant.objects.filter(pk=tenant.pk).first()
+
+        first = get_instance(tenant_cache, "test:acme", Tenant, lookup)
+        self.assertIsInstance(cache.get("tenant:test:acme")[0], dict)
+        with self.assertNumQueries(0):
+            second = get_instance(tenant_cache, "test:acme", Tenant, lookup)
+        self.assertEqual((second.pk, second.name), (tenant.pk, "Acme"))
+        self.assertIsNot(first, second)
+        self.assertFalse(second._state.adding)
+
+        # A row cached by a deploy with other columns is looked up again.
+        tenant_cache.set("test:acme", {"id": tenant.pk, "name": "Acme"})
+        with self.assertNumQueries(1):
+            self.assertEqual(get_instance(tenant_cache, "test:acme", Tenant, lookup).slug, "acme")
+
+
+PROFILING = {"ENABLED": True, "SAMPLE_RATE": 1.0, "BUFFER_SIZE": 3, "REPEAT_THRESHOLD": 2}
+
+
+@override_settings(REQUEST_PROFILING=PROFILING)
+class QueryProfilerTests(TestCase):
+    """Sampled requests land in the shared ring buffer with their query counts and repeats."""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_caches()
+        self.tenant = Tenant.objects.create(slug="acme", name="Acme")
+
+    def test_sampled_request_is_stored_with_its_queries(self):
+        response = Client().get("/api/widget/config", HTTP_X_TENANT_ID=str(self.tenant.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queries"', response["Server-Timing"])
+        [sample] = profiling.samples()
+        self.assertEqual((sample["method"], sample["view"], sample["status"]), ("GET", "widget-config", 200))
+        self.assertGreater(sample["queries"], 0)
+
+    @override_settings(REQUEST_PROFILING=PROFILING | {"SAMPLE_RATE": 0.0})
+    def test_unsampled_requests_are_not_stored(self):
+        response = Client().get("/api/widget/config", HTTP_X_TENANT_ID=str(self.tenant.pk))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(profiling.samples(), [])
+
+    def test_repeated_statements_are_grouped_by_fingerprint(self):
+        profile = profiling.RequestProfile()
+        for pk in (1, 2, 3):
+            profile.record(f"SELECT * FROM tool WHERE id = {pk} AND slug = 'x{pk}'", 0.001)
+        profile.record("SELECT * FROM tool WHERE id IN (%s, %s, %s)", 0.001)
+        [repeated] = profile.repeated(threshold=2)
+        self.assertEqual(repeated["count"], 3)
+        self.assertEqual(repeated["sql"], "SELECT * FROM tool WHERE id = ? AND slug = '?'")
+        self.assertEqual(profiling.fingerprint("id IN (%s, %s)"), "id IN (%s, ...)")
+
+    def test_ring_buffer_keeps_the_newest_samples(self):
+        for n in range(5):
+            profiling.store({"at": float(n), "n": n})
+        self.assertEqual([sample["n"] for sample in profiling.samples()], [4, 3, 2])
+        profiling.clear()
+        self.assertEqual(profiling.samples(), [])
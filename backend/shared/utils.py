@@ -4,6 +4,8 @@ import math
 from dataclasses import dataclass
 from typing import Optional
 
+from django.utils.http import parse_etags
+
 
 def calculate_actual_area(base_area_sqft: float, pitch: float) -> float:
     """
@@ -22,6 +24,17 @@ def apply_rate_from_settings(actual_area: float, material_rate: float, labor_rat
     return round(actual_area * (material_rate + labor_rate), 2)
 
 
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an ``If-None-Match`` header names ``etag``. Compares whole entity tags,
+    weakly as RFC 9110 asks for GET, so a proxy's ``W/`` prefix still matches.
+    """
+    etags = parse_etags(if_none_match)
+    if etags == ["*"]:
+        return True
+    return etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in etags}
+
+
 @dataclass
 class ScraperResult:
     zip_code: str
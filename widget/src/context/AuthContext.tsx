@@ -5,9 +5,25 @@ type User = {
   full_name?: string;
   tenant_id?: string;
   token?: string;
+  access?: string;
+  refresh?: string;
+  access_expires_at?: number;
   is_superuser?: boolean;
 };
 
+// Prefer the short-lived signed access token; the DRF token stays as a fallback.
+export const authorizationFor = (user: User | null): string => {
+  if (user?.access) return `Bearer ${user.access}`;
+  return user?.token ? `Token ${user.token}` : "";
+};
+
+const withTokenPair = <T extends User>(base: T, data: any): T => ({
+  ...base,
+  access: data.access,
+  refresh: data.refresh,
+  access_expires_at: data.expires_in ? Date.now() + data.expires_in * 1000 : undefined,
+});
+
 type AuthContextValue = {
   user: User | null;
   login: (payload: { email: string; password: string }) => Promise<void>;
@@ -39,6 +55,25 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
     if (cached) setUser(JSON.parse(cached));
   }, []);
 
+  // Rotate the access token a minute before it expires.
+  useEffect(() => {
+    if (!user?.refresh || !user.access_expires_at) return;
+    const delay = Math.max(0, user.access_expires_at - Date.now() - 60_000);
+    const timer = window.setTimeout(async () => {
+      const resp = await fetch(`${API_BASE}/api/auth/token/refresh`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh: user.refresh }),
+      }).catch(() => null);
+      const nextUser = resp?.ok
+        ? withTokenPair(user, await resp.json())
+        : { ...user, access: undefined, refresh: undefined, access_expires_at: undefined };
+      setUser(nextUser);
+      localStorage.setItem("nex:user", JSON.stringify(nextUser));
+    }, delay);
+    return () => window.clearTimeout(timer);
+  }, [user?.refresh, user?.access_expires_at]);
+
   const login = async (payload: { email: string; password: string }) => {
     setAuthError(null);
     // Placeholder: swap with real /api/auth/login
@@ -53,13 +88,16 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
       throw new Error("Login failed");
     }
     const data = await resp.json();
-    const nextUser = {
-      email: data.email || payload.email,
-      full_name: data.full_name,
-      tenant_id: data.tenant_id,
-      token: data.token,
-      is_superuser: data.is_superuser,
-    };
+    const nextUser = withTokenPair(
+      {
+        email: data.email || payload.email,
+        full_name: data.full_name,
+        tenant_id: data.tenant_id,
+        token: data.token,
+        is_superuser: data.is_superuser,
+      },
+      data,
+    );
     setUser(nextUser);
     localStorage.setItem("nex:user", JSON.stringify(nextUser));
     setShowAuth(false);
@@ -79,26 +117,35 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
       throw new Error("Registration failed");
     }
     const data = await resp.json();
-    const nextUser = {
-      email: data.email || payload.email,
-      full_name: data.full_name || payload.full_name,
-      tenant_id: data.tenant_id,
-      token: data.token,
-      is_superuser: data.is_superuser,
-    };
+    const nextUser = withTokenPair(
+      {
+        email: data.email || payload.email,
+        full_name: data.full_name || payload.full_name,
+        tenant_id: data.tenant_id,
+        token: data.token,
+        is_superuser: data.is_superuser,
+      },
+      data,
+    );
     setUser(nextUser);
     localStorage.setItem("nex:user", JSON.stringify(nextUser));
     setShowAuth(false);
   };
 
   const logout = () => {
+    if (user) {
+      fetch(`${API_BASE}/api/auth/logout`, {
+        method: "POST",
+        headers: { Authorization: authorizationFor(user) },
+      }).catch(() => undefined);
+    }
     setUser(null);
     localStorage.removeItem("nex:user");
   };
 
   const withAuthHeaders = (headers: HeadersInit = {}) => {
     const merged: HeadersInit = { ...headers };
-    if (user?.token) merged["Authorization"] = `Token ${user.token}`;
+    if (user?.token || user?.access) merged["Authorization"] = authorizationFor(user);
     if (user?.tenant_id) merged["X-Tenant-ID"] = user.tenant_id;
     return merged;
   };
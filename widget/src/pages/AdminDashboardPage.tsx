@@ -1,8 +1,9 @@
 import React, { useEffect, useState } from "react";
 import "../styles.css";
-import { useAuth } from "../context/AuthContext";
+import { authorizationFor, useAuth } from "../context/AuthContext";
 import { ChartLineUp, Funnel, UsersThree, CreditCard, PresentationChart, Lifebuoy, IdentificationBadge } from "@phosphor-icons/react";
 import DashboardNav from "../components/DashboardNav";
+import { uploadMedia } from "../utils/upload";
 import {
   ResponsiveContainer,
   LineChart,
@@ -40,7 +41,7 @@ type TenantRow = {
   name: string;
   slug: string;
   plan: string;
-  tool_count?: number;
+  total_licenses?: number;
   active_licenses?: number;
   trial_licenses?: number;
   canceled_licenses?: number;
@@ -106,7 +107,7 @@ const AdminDashboardPage: React.FC = () => {
   useEffect(() => {
     const load = async () => {
       const headers: HeadersInit = {};
-      if (user?.token) headers["Authorization"] = `Token ${user.token}`;
+      if (user?.token) headers["Authorization"] = authorizationFor(user);
       const [tResp, tnResp, mResp, tiResp, licResp] = await Promise.all([
         fetch(`${API_BASE}/api/admin/tools/?q=${encodeURIComponent(toolQuery)}`, { headers }),
         fetch(
@@ -114,14 +115,19 @@ const AdminDashboardPage: React.FC = () => {
           { headers },
         ),
         fetch(`${API_BASE}/api/admin/metrics/?from=${metricsFrom}&to=${metricsTo}`, { headers }),
-        fetch(`${API_BASE}/api/admin/tickets/`, { headers }),
-        fetch(`${API_BASE}/api/admin/licenses/`, { headers }),
+        fetch(`${API_BASE}/api/admin/tickets/?fields=id,tenant,tenant_name,tool,subject,status`, { headers }),
+        fetch(`${API_BASE}/api/admin/licenses/?fields=id,tenant_name,tool_name,status,plan`, { headers }),
       ]);
-      if (tResp.ok) setTools(await tResp.json());
-      if (tnResp.ok) setTenants(await tnResp.json());
+      // Admin lists are cursor-paginated: { next, previous, results }
+      const rows = async (resp: Response) => {
+        const data = await resp.json();
+        return Array.isArray(data) ? data : data.results || [];
+      };
+      if (tResp.ok) setTools(await rows(tResp));
+      if (tnResp.ok) setTenants(await rows(tnResp));
       if (mResp.ok) setMetrics(await mResp.json());
-      if (tiResp.ok) setTickets(await tiResp.json());
-      if (licResp.ok) setLicenses(await licResp.json());
+      if (tiResp.ok) setTickets(await rows(tiResp));
+      if (licResp.ok) setLicenses(await rows(licResp));
     };
     load();
   }, [user?.token]);
@@ -136,7 +142,7 @@ const AdminDashboardPage: React.FC = () => {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
-        Authorization: `Token ${user.token}`,
+        Authorization: authorizationFor(user),
       },
       body: JSON.stringify(body),
     });
@@ -168,7 +174,7 @@ const AdminDashboardPage: React.FC = () => {
       method: "PATCH",
       headers: {
         "Content-Type": "application/json",
-        Authorization: `Token ${user.token}`,
+        Authorization: authorizationFor(user),
       },
       body: JSON.stringify(body),
     });
@@ -178,21 +184,29 @@ const AdminDashboardPage: React.FC = () => {
     }
   };
 
+  const uploadNewToolMedia = async (file: File, field: "icon_url" | "media_url") => {
+    if (!user?.token) {
+      openAuth();
+      return;
+    }
+    try {
+      const data = await uploadMedia(file, authorizationFor(user));
+      setNewTool((prev) => ({ ...prev, [field]: data.url }));
+    } catch {
+      // leave the field unchanged; the admin can retry the upload
+    }
+  };
+
   const uploadExistingMedia = async (slug: string, file: File, field: "icon_url" | "media_url") => {
     if (!user?.token) {
       openAuth();
       return;
     }
-    const formData = new FormData();
-    formData.append("file", file);
-    const resp = await fetch(`${API_BASE}/api/admin/upload`, {
-      method: "POST",
-      headers: { Authorization: `Token ${user.token}` },
-      body: formData,
-    });
-    if (resp.ok) {
-      const data = await resp.json();
+    try {
+      const data = await uploadMedia(file, authorizationFor(user));
       await patchTool(slug, { [field]: data.url });
+    } catch {
+      // leave the field unchanged; the admin can retry the upload
     }
   };
 
@@ -203,7 +217,7 @@ const AdminDashboardPage: React.FC = () => {
     }
     const resp = await fetch(`${API_BASE}/api/admin/tickets/${id}/`, {
       method: "PATCH",
-      headers: { "Content-Type": "application/json", Authorization: `Token ${user.token}` },
+      headers: { "Content-Type": "application/json", Authorization: authorizationFor(user) },
       body: JSON.stringify({ status }),
     });
     if (resp.ok) {
@@ -219,7 +233,7 @@ const AdminDashboardPage: React.FC = () => {
     }
     const resp = await fetch(`${API_BASE}/api/admin/licenses/${id}/`, {
       method: "PATCH",
-      headers: { "Content-Type": "application/json", Authorization: `Token ${user.token}` },
+      headers: { "Content-Type": "application/json", Authorization: authorizationFor(user) },
       body: JSON.stringify({ status }),
     });
     if (resp.ok) {
@@ -465,7 +479,7 @@ const AdminDashboardPage: React.FC = () => {
                       accept="image/*"
                       onChange={(e) => {
                         const file = e.target.files?.[0];
-                        if (file) uploadMedia(file, "icon_url");
+                        if (file) uploadNewToolMedia(file, "icon_url");
                       }}
                     />
                     {newTool.icon_url && <p className="nx-subtle small">Uploaded: {newTool.icon_url}</p>}
@@ -477,7 +491,7 @@ const AdminDashboardPage: React.FC = () => {
                       accept="image/*,video/*"
                       onChange={(e) => {
                         const file = e.target.files?.[0];
-                        if (file) uploadMedia(file, "media_url");
+                        if (file) uploadNewToolMedia(file, "media_url");
                       }}
                     />
                     {newTool.media_url && <p className="nx-subtle small">Uploaded: {newTool.media_url}</p>}
@@ -574,7 +588,7 @@ const AdminDashboardPage: React.FC = () => {
                     <div key={t.id} className="leads-row">
                       <span>{t.name}</span>
                       <span>{t.plan}</span>
-                      <span>{t.tool_count ?? 0}</span>
+                      <span>{t.total_licenses ?? 0}</span>
                       <span>
                         Active {t.active_licenses ?? 0} | Trial {t.trial_licenses ?? 0} | Canceled {t.canceled_licenses ?? 0}
                       </span>
@@ -1,7 +1,7 @@
 import React, { useEffect, useMemo, useState } from "react";
 import { Link, useParams } from "react-router-dom";
 import "../styles.css";
-import { useAuth } from "../context/AuthContext";
+import { authorizationFor, useAuth } from "../context/AuthContext";
 
 type Tool = {
   id: string;
@@ -135,7 +135,7 @@ const DashboardToolPage: React.FC = () => {
     const nextPage = dir === "next" ? leadPage + 1 : Math.max(1, leadPage - 1);
     setLeadPage(nextPage);
     const headers = TENANT_ID ? { "X-Tenant-ID": TENANT_ID } : {};
-    if (user?.token) headers["Authorization"] = `Token ${user.token}`;
+    if (user?.token) headers["Authorization"] = authorizationFor(user);
     fetch(`${API_BASE}/api/leads/widget?tool=${slug}&page=${nextPage}`, { headers }).then(async (resp) => {
       if (resp.ok) {
         const data = await resp.json();
@@ -151,7 +151,7 @@ const DashboardToolPage: React.FC = () => {
   const applyLeadFilters = () => {
     setLeadPage(1);
     const headers = TENANT_ID ? { "X-Tenant-ID": TENANT_ID } : {};
-    if (user?.token) headers["Authorization"] = `Token ${user.token}`;
+    if (user?.token) headers["Authorization"] = authorizationFor(user);
     const params = new URLSearchParams();
     params.set("tool", slug || "");
     params.set("page", "1");
@@ -174,7 +174,7 @@ const DashboardToolPage: React.FC = () => {
     setMaterialsStatus(null);
     const headers: HeadersInit = { "Content-Type": "application/json" };
     if (TENANT_ID) headers["X-Tenant-ID"] = TENANT_ID;
-    if (user?.token) headers["Authorization"] = `Token ${user.token}`;
+    if (user?.token) headers["Authorization"] = authorizationFor(user);
     const resp = await fetch(`${API_BASE}/api/materials`, {
       method: "POST",
       headers,
@@ -198,7 +198,7 @@ const DashboardToolPage: React.FC = () => {
     setOriginStatus(null);
     const headers: HeadersInit = { "Content-Type": "application/json" };
     if (TENANT_ID) headers["X-Tenant-ID"] = TENANT_ID;
-    if (user?.token) headers["Authorization"] = `Token ${user.token}`;
+    if (user?.token) headers["Authorization"] = authorizationFor(user);
     const resp = await fetch(`${API_BASE}/api/tenant/origin`, {
       method: "POST",
       headers,
@@ -216,7 +216,7 @@ const DashboardToolPage: React.FC = () => {
     setVibeStatus(null);
     const headers: HeadersInit = { "Content-Type": "application/json" };
     if (TENANT_ID) headers["X-Tenant-ID"] = TENANT_ID;
-    if (user?.token) headers["Authorization"] = `Token ${user.token}`;
+    if (user?.token) headers["Authorization"] = authorizationFor(user);
     const resp = await fetch(`${API_BASE}/api/widget/config`, {
       method: "PUT",
       headers,
@@ -24,7 +24,7 @@ import {
   TrendUp,
 } from "@phosphor-icons/react";
 import "../styles.css";
-import { useAuth } from "../context/AuthContext";
+import { authorizationFor, useAuth } from "../context/AuthContext";
 
 type Feature = { title?: string; copy?: string; icon?: string };
 type Tool = { id: string; slug: string; name: string; summary: string; media_url?: string; price_monthly?: number; bento_features?: Feature[] };
@@ -129,7 +129,7 @@ const ToolDetailPage: React.FC = () => {
         payload.password = password;
       }
       const headers: HeadersInit = { "Content-Type": "application/json" };
-      if (user?.token) headers["Authorization"] = `Token ${user.token}`;
+      if (user?.token) headers["Authorization"] = authorizationFor(user);
       const resp = await fetch(`${API_BASE}/api/onboarding/start`, { method: "POST", headers, body: JSON.stringify(payload) });
       if (!resp.ok) throw new Error((await resp.json()).detail || "Unable to start onboarding");
       const data = await resp.json();
@@ -0,0 +1,63 @@
+import { API_BASE } from "./api";
+
+export type UploadedMedia = { url: string; sha256: string; size: number; content_type: string; deduplicated: boolean };
+
+// Files up to this size are hashed in the browser so the server can skip re-uploads.
+const HASH_LIMIT = 64 * 1024 * 1024;
+const MAX_RETRIES = 5;
+
+const sha256Hex = async (file: File) => {
+  const digest = await crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, "0")).join("");
+};
+
+/**
+ * Upload through a resumable session: known bytes come back at once, others are sent
+ * in `chunk_size` pieces and a failed chunk resumes from the offset the server reports.
+ */
+export const uploadMedia = async (file: File, authorization: string): Promise<UploadedMedia> => {
+  const sha256 = file.size <= HASH_LIMIT && crypto?.subtle ? await sha256Hex(file) : "";
+  const start = await fetch(`${API_BASE}/api/admin/uploads`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Authorization: authorization },
+    body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type, sha256 }),
+  });
+  if (!start.ok) throw new Error(`upload failed (${start.status})`);
+  const session = await start.json();
+  if (start.status === 200) return session as UploadedMedia;
+
+  const url = `${API_BASE}/api/admin/uploads/${session.id}`;
+  let offset = 0;
+  let retries = 0;
+  while (true) {
+    try {
+      const resp = await fetch(url, {
+        method: "PATCH",
+        headers: {
+          "Content-Type": "application/offset+octet-stream",
+          "Upload-Offset": String(offset),
+          Authorization: authorization,
+        },
+        body: file.slice(offset, offset + session.chunk_size),
+      });
+      const data = await resp.json();
+      if (resp.status === 409) {
+        offset = data.offset;
+        continue;
+      }
+      if (!resp.ok) {
+        const error = new Error(data.detail || `upload failed (${resp.status})`);
+        // rejected by the server; retrying the same bytes won't help
+        (error as any).fatal = true;
+        throw error;
+      }
+      if ("sha256" in data) return data as UploadedMedia;
+      offset = data.offset;
+      retries = 0;
+    } catch (err) {
+      if ((err as any).fatal || ++retries > MAX_RETRIES) throw err;
+      const state = await fetch(url, { headers: { Authorization: authorization } }).catch(() => null);
+      if (state?.ok) offset = (await state.json()).offset;
+    }
+  }
+};
@@ -19,6 +19,13 @@ type WidgetTheme = {
   marketing_hook?: string;
 };
 
+type WidgetBootstrap = {
+  tool: string;
+  config: WidgetTheme;
+  licensed: boolean;
+  materials: string[];
+};
+
 type Estimate = {
   ground_area: number;
   pitch: number;
@@ -72,7 +79,8 @@ export const WidgetShell: React.FC<WidgetConfig> = ({
   const [busy, setBusy] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [hook, setHook] = useState(defaultTheme.marketing_hook || "");
-  const [materials] = useState<string[]>(["Asphalt Shingle", "Metal Roof", "Tile"]);
+  const [materials, setMaterials] = useState<string[]>(["Asphalt Shingle", "Metal Roof", "Tile"]);
+  const [licensed, setLicensed] = useState<boolean | null>(null);
   const [materialChoice, setMaterialChoice] = useState<string | null>(null);
 
   const derived = useMemo(() => {
@@ -87,28 +95,28 @@ export const WidgetShell: React.FC<WidgetConfig> = ({
   }, [estimate, groundArea, pitch]);
 
   useEffect(() => {
-    const loadConfig = async () => {
+    // One round trip for theme, entitlement and materials.
+    const loadBootstrap = async () => {
       try {
-        const data = await fetchJSON<WidgetTheme>(`${base}/api/widget/config`, {
+        const data = await fetchJSON<WidgetBootstrap>(`${base}/api/widget/bootstrap?tool=${encodeURIComponent(toolSlug)}`, {
           headers: {
             "X-Tenant-ID": tenantId,
           },
         });
-        setTheme(data);
-        if (data.marketing_hook) {
-          setHook(data.marketing_hook);
-        } else {
-          setHook(defaultTheme.marketing_hook || "");
-        }
-        document.documentElement.style.setProperty("--accent", data.secondary_color || defaultTheme.secondary_color);
-        document.documentElement.style.setProperty("--secondary", data.primary_color || defaultTheme.primary_color);
+        const config = data.config;
+        setTheme(config);
+        setHook(config.marketing_hook || defaultTheme.marketing_hook || "");
+        setLicensed(data.licensed);
+        if (data.materials.length) setMaterials(data.materials);
+        document.documentElement.style.setProperty("--accent", config.secondary_color || defaultTheme.secondary_color);
+        document.documentElement.style.setProperty("--secondary", config.primary_color || defaultTheme.primary_color);
       } catch {
         setTheme(defaultTheme);
         setHook(defaultTheme.marketing_hook || "");
       }
     };
-    loadConfig();
-  }, [base, tenantId]);
+    loadBootstrap();
+  }, [base, tenantId, toolSlug]);
 
   const handleAddressSubmit = (evt: React.FormEvent) => {
     evt.preventDefault();
@@ -284,7 +292,9 @@ export const WidgetShell: React.FC<WidgetConfig> = ({
             <p className="nx-kicker">Estimate preview</p>
             <h4>Personalize and capture the lead to unlock live pricing.</h4>
           </div>
-          <span className={`nx-pill ${sandbox ? "freemium" : "live"}`}>{sandbox ? "Sandbox mode" : "Live mode"}</span>
+          <span className={`nx-pill ${sandbox || licensed === false ? "freemium" : "live"}`}>
+            {sandbox ? "Sandbox mode" : licensed === false ? "License inactive" : "Live mode"}
+          </span>
         </div>
         <div className="nx-summary-grid">
           <div className="nx-summary-card">